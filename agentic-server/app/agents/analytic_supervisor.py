@@ -6,18 +6,29 @@ import pandas as pd
 import json
 import hashlib
 from collections import Counter
+from itertools import chain
 import numpy as np
 import os
+import asyncio
 from typing_extensions import TypedDict
 
 from langgraph.graph import StateGraph, END
 from app.utils.logger import get_logger
 from app.services.data_fetcher import DataFetcher
-from app.schemas.analytics import AnalyticsSnapshot, AIReportFull
+from app.services.llm_gateway import Priority
+from app.services.chain_registry import chain_registry
+from app.services.label_canonicalizer import label_canonicalizer
+from app.services.theme_clustering import cluster_themes, format_theme_digest
+from app.services.frame_cache import FrameCache, CACHED_FRAMES, TIMESTAMP_COLUMN, daily_markers, naive_utc, slice_period
+from app.utils.sketches import SpaceSaving, HyperLogLog, merge_all
+from app.services.process_pool import analytics_pool, frames_from_ipc
+from app.services.report_frames import build_frames, combine_report_frames, fetch_and_build_frames
+from app.services.cohort_filters import filters_key, filter_ai_reports_frame
+from app.services.risk_trajectories import risk_trajectories, ANALYTICS_RISK_TRAJECTORIES, RISK_TRAJECTORY_MAX_LAG_HOURS, RISK_TRAJECTORY_MEAN_WINDOW
+from app.schemas.analytics import AnalyticsSnapshot
 from app.db.connect import get_db
 
 # Import Langchain components for NLP
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 
@@ -45,14 +56,45 @@ class AnalyticState(TypedDict):
     period_start: Optional[datetime]
     period_end: Optional[datetime]
     filters_used: Dict[str, Any]
+    # DataFetcher.cohort_predicates for filters_used, resolved once at ingestion.
+    cohort_predicates: Dict[str, Dict[str, Any]]
     raw_checkins: List[Dict[str, Any]]
     checkins_df: Optional[pd.DataFrame]
+    frames_from_cache: bool
+    # Snapshot windows inside [period_start, period_end): {"label", "period_start", "period_end", "snapshot_version"}.
+    # Empty means one snapshot for the whole period.
+    windows: List[Dict[str, Any]]
+    window_label: Optional[str]
+    window_snapshots: List[Dict[str, Any]]
 
 # ---------------- Analytic Agent Functions ---------------- #
 
+# "exact" counts everything; "sketch" uses fixed-memory SpaceSaving / HyperLogLog summaries
+# (see app/utils/sketches.py for error bounds) and stores their mergeable state in the snapshot.
+AGGREGATION_MODE = os.getenv("ANALYTICS_AGGREGATION_MODE", "exact").lower()
+# Trend bucket: "D", "W", or "auto" (daily up to 45 days, weekly beyond).
+TREND_BUCKET = os.getenv("ANALYTICS_TREND_BUCKET", "auto").upper()
+
+# Valence of the sentiment labels the report LLM produces, for averageSentimentScore (-1 to 1).
+# Labels not listed are left out of the average but still counted in sentimentTimeSeries.
+SENTIMENT_SCORES = {
+    "positive": 1.0, "happy": 1.0, "hopeful": 1.0, "optimistic": 1.0, "content": 0.75, "calm": 0.75, "relieved": 0.75,
+    "neutral": 0.0, "mixed": 0.0, "okay": 0.0,
+    "worried": -0.5, "nervous": -0.5, "anxious": -0.5, "stressed": -0.5, "frustrated": -0.5, "confused": -0.25,
+    "sad": -0.75, "lonely": -0.75, "overwhelmed": -0.75, "negative": -0.75, "angry": -0.75,
+    "depressed": -1.0, "hopeless": -1.0, "distressed": -1.0, "despairing": -1.0,
+}
+
 data_fetcher = DataFetcher()
+frame_cache = FrameCache()
+# MongoDB collection behind each cached frame, used to check cached days against the source.
+FRAME_COLLECTIONS = {"reports_df": "reports", "ai_reports_df": "aireports", "checkins_df": "studentcheckins"}
 analytics_collection = get_db()["analyticssnapshots"]
 
+def _cohort_frame_cache(state: AnalyticState) -> FrameCache:
+    """Frames cached for this request's cohort; campus-wide requests use the shared cache."""
+    return frame_cache.scoped(filters_key(state.get("filters_used") or {}))
+
 async def report_ingestion_agent(state: AnalyticState) -> AnalyticState:
     """
     Fetches raw reports (manual and AI-generated) from MongoDB.
@@ -63,79 +105,130 @@ async def report_ingestion_agent(state: AnalyticState) -> AnalyticState:
     period_end = state.get("period_end")
 
     try:
-        state["raw_reports"] = data_fetcher.fetch_all_reports(period_start=period_start, end_date=period_end)
-        state["raw_ai_reports"] = data_fetcher.fetch_all_ai_reports(period_start=period_start, end_date=period_end)
-        
-        state["raw_students"] = data_fetcher.fetch_all_students()
+        # Cohort filters become indexed Mongo predicates, so a cohort only ever scans its own slice.
+        cohort = data_fetcher.cohort_predicates(state.get("filters_used"))
+        state["cohort_predicates"] = cohort
+        cache = _cohort_frame_cache(state)
+        cached_frames = None
+        if cache.enabled:
+            cached_frames = cache.load_period(
+                period_start,
+                period_end,
+                source_markers=lambda name: data_fetcher.fetch_daily_markers(FRAME_COLLECTIONS[name], period_start, period_end, cohort=cohort),
+            )
+        if cached_frames is not None:
+            # Historical period already captured day-by-day; skip the Mongo round trip for reports and check-ins.
+            state["raw_reports"], state["raw_ai_reports"], state["raw_checkins"] = [], [], []
+            state["reports_df"] = cached_frames["reports_df"]
+            state["ai_reports_df"] = cached_frames["ai_reports_df"]
+            state["checkins_df"] = cached_frames["checkins_df"]
+            state["frames_from_cache"] = True
+            logger.info(
+                f"Loaded {len(state['reports_df'])} manual reports, {len(state['ai_reports_df'])} AI reports "
+                f"and {len(state['checkins_df'])} check-ins from the columnar frame cache."
+            )
+        elif analytics_pool.enabled:
+            # The process pool fetches and preprocesses reports and check-ins itself (see data_preprocessing_agent).
+            state["raw_reports"], state["raw_ai_reports"], state["raw_checkins"] = [], [], []
+            state["frames_from_cache"] = False
+            logger.info("Report and check-in fetch deferred to the analytics process pool.")
+        else:
+            state["raw_reports"] = data_fetcher.fetch_all_reports(start_date=period_start, end_date=period_end, cohort=cohort)
+            state["raw_ai_reports"] = data_fetcher.fetch_all_ai_reports(start_date=period_start, end_date=period_end, cohort=cohort)
+            state["raw_checkins"] = data_fetcher.fetch_all_checkins(start_date=period_start, end_date=period_end, cohort=cohort)
+            state["frames_from_cache"] = False
+            logger.info(f"Fetched {len(state['raw_reports'])} manual reports and {len(state['raw_ai_reports'])} AI reports.")
+            logger.info(f"Fetched {len(state['raw_checkins'])} student check-ins.")
+
+        state["raw_students"] = data_fetcher.fetch_all_students(cohort=cohort)
         state["raw_counsellors"] = data_fetcher.fetch_all_counsellors()
         state["raw_volunteers"] = data_fetcher.fetch_all_volunteers()
-        state["raw_checkins"] = data_fetcher.fetch_all_checkins(period_start=period_start, end_date=period_end)
 
-        logger.info(f"Fetched {len(state['raw_reports'])} manual reports and {len(state['raw_ai_reports'])} AI reports.")
         logger.info(f"Fetched {len(state['raw_students'])} students, {len(state['raw_counsellors'])} counsellors.")
-        logger.info(f"Fetched {len(state['raw_checkins'])} student check-ins.")
     except Exception as e:
         logger.error(f"Error in report_ingestion_agent: {e}", exc_info=True)
         raise
 
     return state
 
+def _value_counts(series: pd.Series, dropna: bool = True) -> Dict[Any, int]:
+    """value_counts as a dict, without the zero-count entries categoricals report for unused categories."""
+    counts = series.value_counts(dropna=dropna)
+    return counts[counts > 0].to_dict()
+
+def _safe_mean(df: pd.DataFrame, column: str) -> float:
+    """Mean of a (nullable) numeric column, 0.0 when the column is missing or entirely NA."""
+    if column not in df.columns:
+        return 0.0
+    mean = df[column].mean()
+    return 0.0 if pd.isna(mean) else float(mean)
+
+def _iter_list_column(df: pd.DataFrame, column: str):
+    if column not in df.columns:
+        return
+    for items in df[column].dropna():
+        if isinstance(items, list):
+            yield from items
+
+def _top_items(analytic_results: Dict[str, Any], sketch_key: str, df: pd.DataFrame, columns: List[str], n: int = 10) -> List[tuple]:
+    """
+    Most common items across list columns, streamed without building the full list of labels.
+    Free-text LLM labels are folded onto canonical labels first, so spelling variants count together.
+    """
+    items = (
+        label_canonicalizer.canonicalize(item, sketch_key)
+        for item in chain.from_iterable(_iter_list_column(df, column) for column in columns)
+    )
+    if AGGREGATION_MODE != "sketch":
+        return Counter(items).most_common(n)
+    sketch = SpaceSaving()
+    sketch.update_many(items)
+    analytic_results.setdefault('sketchState', {})[sketch_key] = sketch.to_dict()
+    return sketch.top(n)
+
 async def data_preprocessing_agent(state: AnalyticState) -> AnalyticState:
     """
     Converts raw data into Pandas DataFrames, parses nested JSON, and standardizes fields.
+    The CPU-heavy part (validation, JSON parsing, flattening, downcasting) runs in the analytics
+    process pool, which also does the Mongo fetch and hands back Arrow IPC frames; with the pool
+    disabled it runs on a worker thread over the documents fetched at ingestion.
     """
     logger.info("Analytic Agent: data_preprocessing_agent started.")
 
-    if state["raw_reports"]:
-        reports_df = pd.DataFrame(state["raw_reports"])
-        reports_df['createdAt'] = pd.to_datetime(reports_df['createdAt'])
-        reports_df['report_type'] = 'manual'
-        reports_df['owner_id'] = reports_df['owner'].astype(str)
-        reports_df['assigned_to_id'] = reports_df['assignedTo'].astype(str)
-        reports_df = reports_df.drop(columns=['owner', 'assignedTo'], errors='ignore')
-        state["reports_df"] = reports_df
-        logger.info(f"Processed {len(reports_df)} manual reports into DataFrame.")
-    else:
-        state["reports_df"] = pd.DataFrame()
-        logger.warning("No raw manual reports to preprocess.")
-
-    if state["raw_ai_reports"]:
-        ai_reports_list = [AIReportFull(**raw_report).dict(by_alias=True, exclude_none=True) for raw_report in state["raw_ai_reports"]]
-        ai_reports_df = pd.DataFrame(ai_reports_list)
-        ai_reports_df['createdAt'] = pd.to_datetime(ai_reports_df['createdAt'])
-        ai_reports_df['report_type'] = 'ai'
-        ai_reports_df['owner_id'] = ai_reports_df['student'].astype(str)
-        ai_reports_df = ai_reports_df.drop(columns=['student'], errors='ignore')
-
-        ai_reports_df['sentiment'] = ai_reports_df['standard_report'].apply(lambda x: x.get('risk_assessment', {}).get('sentiment') if isinstance(x, dict) else None)
-        ai_reports_df['risk_level'] = ai_reports_df['standard_report'].apply(lambda x: x.get('risk_assessment', {}).get('risk_level') if isinstance(x, dict) else None)
-        ai_reports_df['red_flags'] = ai_reports_df['standard_report'].apply(lambda x: x.get('risk_assessment', {}).get('red_flags') if isinstance(x, dict) else [])
-        ai_reports_df['phq_9_score'] = ai_reports_df['standard_report'].apply(lambda x: x.get('screening_scores', {}).get('phq_9_score') if isinstance(x, dict) else None)
-        ai_reports_df['gad_7_score'] = ai_reports_df['standard_report'].apply(lambda x: x.get('screening_scores', {}).get('gad_7_score') if isinstance(x, dict) else None)
-        
-        state["ai_reports_df"] = ai_reports_df
-        logger.info(f"Processed {len(ai_reports_df)} AI reports into DataFrame.")
-    else:
-        state["ai_reports_df"] = pd.DataFrame()
-        logger.warning("No raw AI reports to preprocess.")
+    filters = state.get("filters_used") or {}
+    if state.get("frames_from_cache"):
+        state["ai_reports_df"] = filter_ai_reports_frame(state["ai_reports_df"], filters)
+        state["combined_reports_df"] = combine_report_frames(state["reports_df"], state["ai_reports_df"])
+        logger.info("Using cached frames; skipping raw document preprocessing.")
+        return state
 
-    if not state["reports_df"].empty or not state["ai_reports_df"].empty:
-        state["combined_reports_df"] = pd.concat([state["reports_df"], state["ai_reports_df"]], ignore_index=True)
-    else:
-        state["combined_reports_df"] = pd.DataFrame()
-        logger.warning("No reports to combine.")
-    
-    if state["raw_checkins"]:
-        checkins_df = pd.DataFrame(state["raw_checkins"])
-        checkins_df['createdAt'] = pd.to_datetime(checkins_df['createdAt'])
-        checkins_df['student_id'] = checkins_df['student'].astype(str)
-        checkins_df = checkins_df.drop(columns=['student'], errors='ignore')
-        state["checkins_df"] = checkins_df
-        logger.info(f"Processed {len(checkins_df)} check-ins into DataFrame.")
+    memory_report = os.getenv("ANALYTICS_MEMORY_REPORT", "").lower() in ("1", "true", "yes")
+    if analytics_pool.enabled:
+        payloads = await analytics_pool.run(
+            fetch_and_build_frames, state.get("period_start"), state.get("period_end"), memory_report, state.get("cohort_predicates")
+        )
+        frames = frames_from_ipc(payloads)
     else:
-        state["checkins_df"] = pd.DataFrame()
-        logger.warning("No raw check-in data to preprocess.")
+        frames = await asyncio.to_thread(build_frames, state["raw_reports"], state["raw_ai_reports"], state["raw_checkins"], memory_report)
+    state["reports_df"] = frames["reports_df"]
+    state["ai_reports_df"] = frames["ai_reports_df"]
+    state["checkins_df"] = frames["checkins_df"]
 
+    try:
+        # Parquet writes are blocking file I/O; keep them off the event loop.
+        # Cached frames must match the Mongo day markers, so they are written before the risk-level filter.
+        await asyncio.to_thread(
+            _cohort_frame_cache(state).write_frames,
+            {name: state[name] for name in CACHED_FRAMES},
+            period_start=state.get("period_start"),
+            period_end=state.get("period_end"),
+        )
+    except Exception as e:
+        # The cache is an optimisation; a failed write must never fail the snapshot.
+        logger.warning(f"Failed to persist preprocessed frames to the frame cache: {e}", exc_info=True)
+
+    state["ai_reports_df"] = filter_ai_reports_frame(state["ai_reports_df"], filters)
+    state["combined_reports_df"] = combine_report_frames(state["reports_df"], state["ai_reports_df"])
     return state
 
 async def sentiment_risk_analyzer(state: AnalyticState) -> AnalyticState:
@@ -148,17 +241,78 @@ async def sentiment_risk_analyzer(state: AnalyticState) -> AnalyticState:
         state["analytic_results"] = analytic_results
         return state
 
-    analytic_results['sentimentDistribution'] = df['sentiment'].value_counts(dropna=True).to_dict()
-    analytic_results['riskLevelDistribution'] = df['risk_level'].value_counts(dropna=True).to_dict()
+    analytic_results['sentimentDistribution'] = _value_counts(df['sentiment']) if 'sentiment' in df.columns else {}
+    analytic_results['riskLevelDistribution'] = _value_counts(df['risk_level']) if 'risk_level' in df.columns else {}
     
-    all_red_flags = [flag for flags_list in df['red_flags'].dropna() if isinstance(flags_list, list) for flag in flags_list]
-    top_flags = Counter(all_red_flags).most_common(10)
+    top_flags = _top_items(analytic_results, 'redFlags', df, ['red_flags'])
     analytic_results['topRedFlags'] = [{"flag": flag, "count": count} for flag, count in top_flags]
 
     state["analytic_results"] = analytic_results
     logger.info("Sentiment and Risk analysis complete.")
     return state
 
+def _trend_frequency(state: AnalyticState) -> str:
+    if TREND_BUCKET in ("D", "W"):
+        return TREND_BUCKET
+    start, end = state.get("period_start"), state.get("period_end")
+    if start is not None and end is not None and (end - start) > timedelta(days=45):
+        return "W"
+    return "D"
+
+def _bucket_starts(timestamps: pd.Series, freq: str) -> pd.Series:
+    return timestamps.dt.floor("D") if freq == "D" else timestamps.dt.to_period("W").dt.start_time
+
+def _bucket_range(state: AnalyticState, buckets: pd.Series, freq: str) -> pd.DatetimeIndex:
+    """Every bucket in the period, so empty days/weeks are explicit zeros rather than gaps."""
+    start = naive_utc(state.get("period_start")) if state.get("period_start") else buckets.min()
+    end = naive_utc(state.get("period_end")) - pd.Timedelta(microseconds=1) if state.get("period_end") else buckets.max()
+    if buckets.dt.tz is not None:
+        start, end = start.tz_localize("UTC").tz_convert(buckets.dt.tz), end.tz_localize("UTC").tz_convert(buckets.dt.tz)
+    bounds = _bucket_starts(pd.Series([start, end]), freq)
+    return pd.date_range(bounds.iloc[0], bounds.iloc[1], freq="D" if freq == "D" else "W-MON")
+
+def _time_series(df: pd.DataFrame, column: str, buckets: pd.Series, index: pd.DatetimeIndex, freq: str) -> Dict[str, Any]:
+    """Counts per (bucket, label) from one groupby + unstack, as column arrays aligned with `index`."""
+    labels = df[column].astype("string")
+    mask = labels.notna()
+    table = (
+        labels[mask].groupby([buckets[mask], labels[mask]]).size()
+        .unstack(fill_value=0)
+        .reindex(index, fill_value=0)
+    )
+    return {
+        "bucket": freq,
+        "dates": [d.strftime("%Y-%m-%d") for d in index],
+        "series": {str(label): table[label].astype(int).tolist() for label in table.columns},
+    }
+
+async def sentiment_trend_analyzer(state: AnalyticState) -> AnalyticState:
+    """Sentiment and risk-level counts per day or week, plus the average sentiment valence per bucket."""
+    logger.info("Analytic Agent: sentiment_trend_analyzer started.")
+    analytic_results = state.get("analytic_results", {})
+    df = state["combined_reports_df"]
+
+    if df.empty or TIMESTAMP_COLUMN not in df.columns:
+        state["analytic_results"] = analytic_results
+        return state
+
+    freq = _trend_frequency(state)
+    buckets = _bucket_starts(df[TIMESTAMP_COLUMN], freq)
+    index = _bucket_range(state, buckets, freq)
+    if 'sentiment' in df.columns:
+        analytic_results['sentimentTimeSeries'] = _time_series(df, 'sentiment', buckets, index, freq)
+        scores = df['sentiment'].astype("string").str.strip().str.lower().map(SENTIMENT_SCORES)
+        averages = scores.groupby(buckets).mean().dropna()
+        analytic_results['sentimentOverTime'] = [
+            {"date": date.to_pydatetime(), "averageSentimentScore": round(float(score), 3)} for date, score in averages.items()
+        ]
+    if 'risk_level' in df.columns:
+        analytic_results['riskLevelTimeSeries'] = _time_series(df, 'risk_level', buckets, index, freq)
+
+    state["analytic_results"] = analytic_results
+    logger.info(f"Sentiment trends complete ({len(index)} {'daily' if freq == 'D' else 'weekly'} buckets).")
+    return state
+
 async def screening_score_aggregator(state: AnalyticState) -> AnalyticState:
     logger.info("Analytic Agent: screening_score_aggregator started.")
     analytic_results = state.get("analytic_results", {})
@@ -168,17 +322,18 @@ async def screening_score_aggregator(state: AnalyticState) -> AnalyticState:
         state["analytic_results"] = analytic_results
         return state
 
-    analytic_results['avgPHQ9'] = df['phq_9_score'].mean() if 'phq_9_score' in df.columns else 0.0
-    analytic_results['avgGAD7'] = df['gad_7_score'].mean() if 'gad_7_score' in df.columns else 0.0
-    analytic_results['avgGHQ'] = df['ghq'].mean() if 'ghq' in df.columns else 0.0
+    analytic_results['avgPHQ9'] = _safe_mean(df, 'phq_9_score')
+    analytic_results['avgGAD7'] = _safe_mean(df, 'gad_7_score')
+    analytic_results['avgGHQ'] = _safe_mean(df, 'ghq')
 
+    # Manual reports carry no scores; the Int8 NA rows are left out rather than emitted as a NaN key.
     if 'phq_9_score' in df.columns:
         phq9_bins = pd.cut(df['phq_9_score'], bins=[-1, 4, 9, 14, 19, 27], labels=['Minimal', 'Mild', 'Moderate', 'Mod-Severe', 'Severe'])
-        analytic_results['phq9Distribution'] = phq9_bins.value_counts(dropna=False).to_dict()
+        analytic_results['phq9Distribution'] = phq9_bins.value_counts(dropna=True).to_dict()
     
     if 'gad_7_score' in df.columns:
         gad7_bins = pd.cut(df['gad_7_score'], bins=[-1, 4, 9, 14, 21], labels=['Minimal', 'Mild', 'Moderate', 'Severe'])
-        analytic_results['gad7Distribution'] = gad7_bins.value_counts(dropna=False).to_dict()
+        analytic_results['gad7Distribution'] = gad7_bins.value_counts(dropna=True).to_dict()
 
     state["analytic_results"] = analytic_results
     logger.info("Screening score aggregation complete.")
@@ -193,19 +348,12 @@ async def stressor_concern_extractor(state: AnalyticState) -> AnalyticState:
         state["analytic_results"] = analytic_results
         return state
 
-    all_stressors = []
-    all_concerns = []
-    
-    if 'standard_report' in df.columns:
-        df['standard_report'].dropna().apply(lambda x: all_stressors.extend(x.get('analytics', {}).get('key_stressors_identified', [])) if isinstance(x, dict) else None)
-        df['standard_report'].dropna().apply(lambda x: all_concerns.extend(x.get('summary', {}).get('student_expressed_concerns', [])) if isinstance(x, dict) else None)
-    if 'demo_report' in df.columns:
-        df['demo_report'].dropna().apply(lambda x: all_concerns.extend(x.get('student_expressed_concerns', [])) if isinstance(x, dict) else None)
-    if 'tags' in df.columns:
-        df['tags'].dropna().apply(lambda x: all_stressors.extend(x) if isinstance(x, list) else None)
+    # AI reports contribute stressors flattened at preprocessing time; manual reports contribute their tags.
+    top_stressors = _top_items(analytic_results, 'stressors', df, ['key_stressors', 'tags'])
+    top_concerns = _top_items(analytic_results, 'studentConcerns', df, ['student_concerns'])
 
-    analytic_results['topStressors'] = [{"stressor": s, "count": c} for s, c in Counter(all_stressors).most_common(10)]
-    analytic_results['topStudentConcerns'] = [{"concern": c, "count": count} for c, count in Counter(all_concerns).most_common(10)]
+    analytic_results['topStressors'] = [{"stressor": s, "count": c} for s, c in top_stressors]
+    analytic_results['topStudentConcerns'] = [{"concern": c, "count": count} for c, count in top_concerns]
 
     state["analytic_results"] = analytic_results
     logger.info("Stressor and concern extraction complete.")
@@ -221,11 +369,9 @@ async def resource_topic_aggregator(state: AnalyticState) -> AnalyticState:
         state["analytic_results"] = analytic_results
         return state
 
-    all_resource_topics = []
-    if 'demo_report' in df.columns:
-         df['demo_report'].dropna().apply(lambda x: all_resource_topics.extend(x.get('suggested_resource_topics', [])) if isinstance(x, dict) else None)
+    top_topics = _top_items(analytic_results, 'resourceTopics', df, ['suggested_resource_topics'])
 
-    analytic_results['topSuggestedResourceTopics'] = [{"topic": t, "count": c} for t, c in Counter(all_resource_topics).most_common(10)]
+    analytic_results['topSuggestedResourceTopics'] = [{"topic": t, "count": c} for t, c in top_topics]
     state["analytic_results"] = analytic_results
     logger.info("Resource topic aggregation complete.")
     return state
@@ -239,7 +385,7 @@ async def resolution_efficiency_metrics(state: AnalyticState) -> AnalyticState:
         state["analytic_results"] = analytic_results
         return state
 
-    analytic_results['reportsByStatus'] = df['status'].value_counts(dropna=False).to_dict()
+    analytic_results['reportsByStatus'] = _value_counts(df['status'], dropna=False)
     resolved_reports = df[df['status'] == 'resolved'].copy()
     if not resolved_reports.empty:
         resolved_reports['resolvedAt'] = pd.to_datetime(resolved_reports['resolvedAt'])
@@ -248,9 +394,9 @@ async def resolution_efficiency_metrics(state: AnalyticState) -> AnalyticState:
     else:
         analytic_results['avgReportResolutionTimeDays'] = 0.0
 
-    if 'assigned_to_id' in df.columns and not state["raw_counsellors"].empty:
+    if 'assigned_to_id' in df.columns and state["raw_counsellors"]:
         counsellors_df = pd.DataFrame(state["raw_counsellors"])
-        resolved_counts = df[df['status'] == 'resolved']['assigned_to_id'].value_counts().reset_index()
+        resolved_counts = df[df['status'] == 'resolved']['assigned_to_id'].astype(object).value_counts().reset_index()
         resolved_counts.columns = ['counsellorId', 'resolvedCount']
         
         if not resolved_counts.empty:
@@ -266,6 +412,26 @@ async def resolution_efficiency_metrics(state: AnalyticState) -> AnalyticState:
     logger.info("Resolution efficiency metrics complete.")
     return state
 
+def _sketch_engagement(analytic_results: Dict[str, Any], active: pd.DataFrame) -> None:
+    """Distinct active students per day via HyperLogLog; weeks, months and the period merge the daily sketches."""
+    daily: Dict[Any, HyperLogLog] = {}
+    for date, ids in active.groupby(active['lastActive'].dt.date)['_id']:
+        daily[date] = HyperLogLog()
+        daily[date].add_many(ids)
+
+    def rollup(freq: str) -> Dict[str, int]:
+        buckets: Dict[str, List[HyperLogLog]] = {}
+        for date, sketch in daily.items():
+            buckets.setdefault(str(pd.Period(date, freq=freq)), []).append(sketch)
+        return {key: merge_all(s.copy() for s in sketches).count() for key, sketches in buckets.items()}
+
+    total = merge_all(s.copy() for s in daily.values()) or HyperLogLog()
+    analytic_results['totalStudentsEngaged'] = total.count()
+    analytic_results['activeStudentsDaily'] = {str(date): sketch.count() for date, sketch in daily.items()}
+    analytic_results['activeStudentsWeekly'] = rollup('W')
+    analytic_results['activeStudentsMonthly'] = rollup('M')
+    analytic_results.setdefault('sketchState', {})['studentsEngaged'] = total.to_dict()
+
 async def user_engagement_metrics(state: AnalyticState) -> AnalyticState:
     logger.info("Analytic Agent: user_engagement_metrics started.")
     analytic_results = state.get("analytic_results", {})
@@ -282,12 +448,17 @@ async def user_engagement_metrics(state: AnalyticState) -> AnalyticState:
     students_df['lastActive'] = pd.to_datetime(students_df['lastActive'])
     period_end = state.get("period_end") or datetime.now(timezone.utc)
     period_start = state.get("period_start") or (period_end - timedelta(days=30))
-    active_students_in_period = students_df[(students_df['lastActive'] >= period_start) & (students_df['lastActive'] <= period_end)]
+    # slice_period reconciles naive Mongo timestamps with tz-aware request bounds.
+    students_df = students_df.sort_values('lastActive', kind="stable")
+    active_students_in_period = slice_period(students_df, period_start, period_end, column='lastActive')
 
-    analytic_results['totalStudentsEngaged'] = active_students_in_period['_id'].nunique()
-    analytic_results['activeStudentsDaily'] = {str(date): count for date, count in active_students_in_period.groupby(active_students_in_period['lastActive'].dt.date)['_id'].nunique().items()}
-    analytic_results['activeStudentsWeekly'] = {str(period): count for period, count in active_students_in_period.groupby(active_students_in_period['lastActive'].dt.to_period('W'))['_id'].nunique().items()}
-    analytic_results['activeStudentsMonthly'] = {str(period): count for period, count in active_students_in_period.groupby(active_students_in_period['lastActive'].dt.to_period('M'))['_id'].nunique().items()}
+    if AGGREGATION_MODE == "sketch":
+        _sketch_engagement(analytic_results, active_students_in_period)
+    else:
+        analytic_results['totalStudentsEngaged'] = active_students_in_period['_id'].nunique()
+        analytic_results['activeStudentsDaily'] = {str(date): count for date, count in active_students_in_period.groupby(active_students_in_period['lastActive'].dt.date)['_id'].nunique().items()}
+        analytic_results['activeStudentsWeekly'] = {str(period): count for period, count in active_students_in_period.groupby(active_students_in_period['lastActive'].dt.to_period('W'))['_id'].nunique().items()}
+        analytic_results['activeStudentsMonthly'] = {str(period): count for period, count in active_students_in_period.groupby(active_students_in_period['lastActive'].dt.to_period('M'))['_id'].nunique().items()}
 
     state["analytic_results"] = analytic_results
     logger.info("User engagement metrics complete.")
@@ -296,7 +467,12 @@ async def user_engagement_metrics(state: AnalyticState) -> AnalyticState:
 class EmergingThemesOutput(BaseModel):
     emerging_themes: List[str] = Field(..., description="List of 3-5 distinct, emerging mental health themes or trends observed in the provided text samples.")
 
-llm_analytic = ChatGoogleGenerativeAI(model=os.getenv("LLM_MODEL")) 
+EMERGING_THEMES_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "You are an expert mental health analyst. The anonymous student reports for this period have been grouped into clusters of similar reports. Each cluster lists its size, share of all reports, frequent keywords and a few representative reports. Identify 3-5 distinct, emerging mental health themes or trends. Weigh cluster sizes, but do not ignore small clusters that signal a new or serious concern. Output as a JSON list of themes."),
+    ("user", "Analyze these report clusters:\n\n{cluster_digest}")
+])
+
+chain_registry.register("emerging_themes", "v1", EMERGING_THEMES_PROMPT, EmergingThemesOutput)
 
 async def emerging_theme_detector_agent(state: AnalyticState) -> AnalyticState:
     logger.info("Analytic Agent: emerging_theme_detector_agent started.")
@@ -308,22 +484,17 @@ async def emerging_theme_detector_agent(state: AnalyticState) -> AnalyticState:
         state["analytic_results"] = analytic_results
         return state
 
-    sample_contents = df['content'].dropna().sample(n=min(50, len(df.dropna())), replace=False).tolist()
-    
-    if not sample_contents:
+    # Cluster the whole period locally and send only a per-cluster digest, so prompt size stays fixed.
+    clusters = await analytics_pool.run(cluster_themes, df['content'].dropna().astype(str).tolist())
+
+    if not clusters:
         analytic_results['emergingThemes'] = []
         state["analytic_results"] = analytic_results
         return state
 
-    prompt_template = ChatPromptTemplate.from_messages([
-        ("system", "You are an expert mental health analyst. Read the following anonymous student report summaries and identify 3-5 distinct, emerging mental health themes or trends. Focus on patterns. Output as a JSON list of themes."),
-        ("user", "Analyze these reports:\n\n---\n\n{reports_sample}")
-    ])
     
     try:
-        chain = prompt_template | llm_analytic.with_structured_output(EmergingThemesOutput)
-        reports_sample_text = "\n\n---\n\n".join(map(str, sample_contents))
-        result = await chain.ainvoke({"reports_sample": reports_sample_text})
+        result = await chain_registry.ainvoke("emerging_themes", {"cluster_digest": format_theme_digest(clusters)}, priority=Priority.BACKGROUND)
         analytic_results['emergingThemes'] = result.emerging_themes
         logger.info(f"LLM detected emerging themes: {result.emerging_themes}")
     except Exception as e:
@@ -333,6 +504,19 @@ async def emerging_theme_detector_agent(state: AnalyticState) -> AnalyticState:
     state["analytic_results"] = analytic_results
     return state
 
+def _raw_data_hash(state: AnalyticState) -> str:
+    """
+    Hash of the period and cohort filters plus each frame's per-day row count and latest updatedAt.
+    Built from the frames, so it is the same whether they came from MongoDB or the frame cache.
+    """
+    data_to_hash = json.dumps({
+        "markers": {name: daily_markers(state.get(name)) for name in CACHED_FRAMES},
+        "filters": state.get("filters_used") or {},
+        "period_start": state.get("period_start"),
+        "period_end": state.get("period_end")
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(data_to_hash.encode('utf-8')).hexdigest()
+
 async def snapshot_generator(state: AnalyticState) -> AnalyticState:
     logger.info("Analytic Agent: snapshot_generator started.")
     analytic_results = state.get("analytic_results", {})
@@ -340,17 +524,18 @@ async def snapshot_generator(state: AnalyticState) -> AnalyticState:
         snapshotVersion=state["snapshot_version"],
         periodStart=state.get("period_start"),
         periodEnd=state.get("period_end"),
+        windowLabel=state.get("window_label"),
         filtersUsed=state.get("filters_used", {}),
+        filtersKey=filters_key(state.get("filters_used") or {}),
         **analytic_results
     )
     
-    data_to_hash = json.dumps({
-        "raw_reports": state["raw_reports"],
-        "raw_ai_reports": state["raw_ai_reports"],
-        "period_start": state.get("period_start"),
-        "period_end": state.get("period_end")
-    }, sort_keys=True, default=str)
-    final_snapshot_data.rawDataHash = hashlib.sha256(data_to_hash.encode('utf-8')).hexdigest()
+    final_snapshot_data.rawDataHash = await asyncio.to_thread(_raw_data_hash, state)
+
+    try:
+        label_canonicalizer.save()
+    except OSError as e:
+        logger.warning(f"Failed to persist the label canonicalization cache: {e}")
 
     state["analytic_results"] = final_snapshot_data.dict(by_alias=True, exclude_none=True)
     logger.info("Analytics snapshot generated.")
@@ -358,22 +543,73 @@ async def snapshot_generator(state: AnalyticState) -> AnalyticState:
 
 async def db_saver_agent(state: AnalyticState) -> AnalyticState:
     logger.info("Analytic Agent: db_saver_agent started.")
-    if not state.get("analytic_results"):
+    snapshots = state.get("window_snapshots") or ([state["analytic_results"]] if state.get("analytic_results") else [])
+    if not snapshots:
         return state
     try:
-        insert_result = analytics_collection.insert_one(state["analytic_results"])
-        state["analytic_results"]["_id"] = str(insert_result.inserted_id)
-        logger.info(f"Analytics snapshot saved with ID: {insert_result.inserted_id}")
+        # Every window's snapshot goes out in a single bulk write.
+        insert_result = analytics_collection.insert_many(snapshots)
+        for snapshot, inserted_id in zip(snapshots, insert_result.inserted_ids):
+            snapshot["_id"] = str(inserted_id)
+        state["window_snapshots"] = snapshots
+        state["analytic_results"] = snapshots[0]
+        logger.info(f"Saved {len(snapshots)} analytics snapshot(s) with IDs: {[s['_id'] for s in snapshots]}")
     except Exception as e:
         logger.error(f"Error saving analytic results to DB: {e}", exc_info=True)
         raise
     return state
 
+def _uses_trajectory_index(state: AnalyticState) -> bool:
+    if not ANALYTICS_RISK_TRAJECTORIES:
+        return False
+    period_end = state.get("period_end")
+    if period_end is None:
+        return True
+    if period_end.tzinfo is None:
+        period_end = period_end.replace(tzinfo=timezone.utc)
+    return period_end >= datetime.now(timezone.utc) - timedelta(hours=RISK_TRAJECTORY_MAX_LAG_HOURS)
+
+def _trajectory_suggestions(state: AnalyticState, checkins_df: Optional[pd.DataFrame]) -> List[Dict[str, Any]]:
+    """Outreach from the per-student risk trajectory index: one indexed query instead of regrouping every check-in."""
+    risk_trajectories.catch_up()
+    candidates = set()
+    if checkins_df is not None and not checkins_df.empty:
+        counts = checkins_df['student_id'].astype(str).value_counts()
+        candidates.update(counts[counts >= RISK_TRAJECTORY_MEAN_WINDOW].index)
+    ai_reports_df = state.get("ai_reports_df")
+    if ai_reports_df is not None and not ai_reports_df.empty and 'owner_id' in ai_reports_df.columns:
+        candidates.update(ai_reports_df['owner_id'].dropna().astype(str).unique())
+    if not candidates:
+        return []
+
+    suggestions = []
+    for doc in risk_trajectories.outreach_candidates(candidates):
+        student_id = doc["_id"]
+        if doc.get("meanWindow", 0) >= RISK_TRAJECTORY_MEAN_WINDOW:
+            if doc.get("moodMean") is not None and doc["moodMean"] <= 2:
+                suggestions.append({ "studentId": student_id, "riskScore": 0.6, "justification": f"Low mood (avg {doc['moodMean']:.1f}/5)." })
+            if doc.get("stressMean") is not None and doc["stressMean"] >= 4:
+                suggestions.append({ "studentId": student_id, "riskScore": 0.7, "justification": f"High stress (avg {doc['stressMean']:.1f}/5)." })
+        worsening = [f"{name} +{trend}" for name, trend in (("PHQ-9", doc.get("phq9Trend")), ("GAD-7", doc.get("gad7Trend"))) if trend and trend > 0]
+        if str(doc.get("latestRiskLevel", "")).lower() == "high" and worsening:
+            suggestions.append({ "studentId": student_id, "riskScore": 0.8, "justification": f"Latest AI report rates risk High; scores rising ({', '.join(worsening)})." })
+    return suggestions
+
 async def predictive_risk_analyzer(state: AnalyticState) -> AnalyticState:
     logger.info("Analytic Agent: predictive_risk_analyzer started.")
     analytic_results = state.get("analytic_results", {})
     checkins_df = state.get("checkins_df")
 
+    if _uses_trajectory_index(state):
+        try:
+            proactive_outreach_suggestions = await asyncio.to_thread(_trajectory_suggestions, state, checkins_df)
+            analytic_results['proactiveOutreachSuggestions'] = proactive_outreach_suggestions
+            state["analytic_results"] = analytic_results
+            logger.info(f"Generated {len(proactive_outreach_suggestions)} outreach suggestions from the risk trajectory index.")
+            return state
+        except Exception as e:
+            logger.warning(f"Risk trajectory index unavailable ({e}); recomputing from check-ins.", exc_info=True)
+
     if checkins_df is None or checkins_df.empty:
         analytic_results['proactiveOutreachSuggestions'] = []
         state["analytic_results"] = analytic_results
@@ -395,11 +631,11 @@ async def predictive_risk_analyzer(state: AnalyticState) -> AnalyticState:
 
 # ---------------- Graph Orchestration ---------------- #
 
-def build_analytic_graph():
+def build_window_graph():
+    """The per-window analytics: every node reads frames already sliced to one window."""
     workflow = StateGraph(AnalyticState)
-    workflow.add_node("ingestion", report_ingestion_agent)
-    workflow.add_node("preprocessing", data_preprocessing_agent)
     workflow.add_node("sentiment_risk", sentiment_risk_analyzer)
+    workflow.add_node("sentiment_trends", sentiment_trend_analyzer)
     workflow.add_node("screening_scores", screening_score_aggregator)
     workflow.add_node("stressors_concerns", stressor_concern_extractor)
     workflow.add_node("resource_topics", resource_topic_aggregator)
@@ -408,12 +644,10 @@ def build_analytic_graph():
     workflow.add_node("predictive_risk", predictive_risk_analyzer)
     workflow.add_node("emerging_themes", emerging_theme_detector_agent)
     workflow.add_node("snapshot_generation", snapshot_generator)
-    workflow.add_node("db_saver", db_saver_agent)
 
-    workflow.set_entry_point("ingestion")
-    workflow.add_edge("ingestion", "preprocessing")
-    workflow.add_edge("preprocessing", "sentiment_risk")
-    workflow.add_edge("sentiment_risk", "screening_scores")
+    workflow.set_entry_point("sentiment_risk")
+    workflow.add_edge("sentiment_risk", "sentiment_trends")
+    workflow.add_edge("sentiment_trends", "screening_scores")
     workflow.add_edge("screening_scores", "stressors_concerns")
     workflow.add_edge("stressors_concerns", "resource_topics")
     workflow.add_edge("resource_topics", "resolution_metrics")
@@ -421,9 +655,66 @@ def build_analytic_graph():
     workflow.add_edge("user_engagement", "predictive_risk")
     workflow.add_edge("predictive_risk", "emerging_themes")
     workflow.add_edge("emerging_themes", "snapshot_generation")
-    workflow.add_edge("snapshot_generation", "db_saver")
+    workflow.add_edge("snapshot_generation", END)
+
+    return workflow.compile()
+
+window_graph_app = build_window_graph()
+
+WINDOW_FRAMES = ["reports_df", "ai_reports_df", "combined_reports_df", "checkins_df"]
+
+def _window_state(state: AnalyticState, window: Dict[str, Any]) -> AnalyticState:
+    window_state: AnalyticState = {
+        **state,
+        "analytic_results": {},
+        "snapshot_version": window["snapshot_version"],
+        "period_start": window.get("period_start"),
+        "period_end": window.get("period_end"),
+        "window_label": window.get("label"),
+        "windows": [],
+        "window_snapshots": [],
+    }
+    for name in WINDOW_FRAMES:
+        window_state[name] = slice_period(state.get(name), window.get("period_start"), window.get("period_end"))
+    return window_state
+
+async def window_analytics_agent(state: AnalyticState) -> AnalyticState:
+    """
+    Runs the window subgraph once per requested window over the frames preprocessed for the widest
+    range. Frames are sorted by createdAt once, so each window is a binary-searched row slice rather
+    than a fresh fetch; windows run concurrently so their clustering and LLM calls overlap.
+    """
+    windows = state.get("windows") or [{
+        "label": state.get("window_label"),
+        "period_start": state.get("period_start"),
+        "period_end": state.get("period_end"),
+        "snapshot_version": state["snapshot_version"],
+    }]
+    logger.info(f"Analytic Agent: window_analytics_agent computing {len(windows)} window(s).")
+
+    for name in WINDOW_FRAMES:
+        df = state.get(name)
+        if df is not None and not df.empty and TIMESTAMP_COLUMN in df.columns:
+            state[name] = df.sort_values(TIMESTAMP_COLUMN, kind="stable").reset_index(drop=True)
+
+    results = await asyncio.gather(*(window_graph_app.ainvoke(_window_state(state, window)) for window in windows))
+    state["window_snapshots"] = [result["analytic_results"] for result in results if result.get("analytic_results")]
+    state["analytic_results"] = state["window_snapshots"][0] if state["window_snapshots"] else {}
+    return state
+
+def build_analytic_graph():
+    workflow = StateGraph(AnalyticState)
+    workflow.add_node("ingestion", report_ingestion_agent)
+    workflow.add_node("preprocessing", data_preprocessing_agent)
+    workflow.add_node("window_analytics", window_analytics_agent)
+    workflow.add_node("db_saver", db_saver_agent)
+
+    workflow.set_entry_point("ingestion")
+    workflow.add_edge("ingestion", "preprocessing")
+    workflow.add_edge("preprocessing", "window_analytics")
+    workflow.add_edge("window_analytics", "db_saver")
     workflow.add_edge("db_saver", END)
 
     return workflow.compile()
 
-analytic_graph_app = build_analytic_graph()
\ No newline at end of file
+analytic_graph_app = build_analytic_graph()
@@ -1,86 +1,120 @@
 # agentic-server/app/agents/pathway_generator.py
 import os
-import httpx
-import json
 from typing import List, Dict, Any
 
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
 
 from ..schemas.learning_pathway import LearningPathwayOutput, PathwayStep
 from ..utils.logger import get_logger
+from ..services.chain_registry import chain_registry
+from ..services.recommended_resources import recommended_resources
+from ..services.resource_index import tokenize, to_retriever_resource
 
 logger = get_logger(__name__)
 
-# Get the Node.js backend URL from environment variables
-BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:5000/api")
+# Steps per pathway; candidates are preselected and ranked locally, the LLM only orders them.
+PATHWAY_MAX_STEPS = int(os.getenv("PATHWAY_MAX_STEPS", "5"))
+DEFAULT_PATHWAY_TITLE = "Resources for You"
 
-# Initialize the LLM for structuring the pathway
-llm = ChatGoogleGenerativeAI(model=os.getenv("LLM_MODEL"))
+class PathwayPlan(BaseModel):
+    """What the LLM decides: a title and the order of the candidate resources."""
+    title: str = Field(..., description="An empathetic and encouraging title for the pathway, e.g., 'A Path to Calmer Nights and Focused Days'.")
+    order: List[str] = Field(..., description="Candidate IDs (e.g. 'r2') in the order the student should work through them.")
 
 # Define the system prompt for the LLM
 PROMPT_TEMPLATE = ChatPromptTemplate.from_messages([
     ("system", """
-    You are a compassionate curriculum designer for mental wellness. Your task is to create a personalized, step-by-step "Learning Pathway" for a student based on their key stressors and a list of key_stressors_identified.
+    You are a compassionate curriculum designer for mental wellness. You are given a student's key stressors and a short list of vetted resources, each with an ID.
 
     **Instructions:**
     1.  **Create an Empathetic Title:** Based on the student's key stressors, create a warm and encouraging title for the pathway. For example, if stressors are "exam anxiety" and "sleep problems," a good title would be "A Pathway to Restful Sleep and Confident Exams."
-    2.  **Logically Sequence the Resources:** Review the provided list of topic. Based on that give authentic response links of videos do not add just example resources and etc etc in depth analysis.
-    3.  **Ensure Correct Formatting:** Your final output must be a JSON object that strictly adheres to the provided `LearningPathwayOutput` schema. Do not add any extra text or explanations outside of the JSON structure.
+    2.  **Sequence the Resources:** Return the resource IDs in the order the student should work through them, starting with the most approachable. Use only the given IDs, each once.
+    3.  **Ensure Correct Formatting:** Output only the `PathwayPlan` JSON (title and order). Do not repeat titles, URLs or descriptions.
     """),
     ("user", """
     **Student's Key Stressors:**
     {key_stressors}
 
-    **Available Resources (JSON format) basically that is key_stressors_identified:**
-    ```json
-    {available_resources}
-    ```
-
-    Please generate the `LearningPathwayOutput` JSON based on these inputs.
+    **Resources (ID | type | title | categories):**
+    {candidates}
     """)
 ])
 
+chain_registry.register("pathway", "v2", PROMPT_TEMPLATE, PathwayPlan)
+
+def _rank_candidates(by_topic: Dict[str, List[Dict[str, Any]]], stressors: List[str], limit: int) -> List[Dict[str, Any]]:
+    """
+    Dedupes the per-topic backend results and keeps the `limit` best: resources recommended for
+    more topics first, then those sharing more terms with the stressors and topics.
+    """
+    wanted = set(tokenize(" ".join(stressors + list(by_topic))))
+    resources: Dict[str, Dict[str, Any]] = {}
+    topic_hits: Dict[str, int] = {}
+    for items in by_topic.values():
+        for item in items:
+            rid = str(item.get("_id") or "")
+            if not rid or not (item.get("url") or (item.get("file") or {}).get("url")):
+                continue
+            resources.setdefault(rid, item)
+            topic_hits[rid] = topic_hits.get(rid, 0) + 1
+
+    def _score(rid: str):
+        item = resources[rid]
+        text = " ".join([item.get("title") or "", item.get("description") or "", *(item.get("category") or [])])
+        return (topic_hits[rid], len(wanted & set(tokenize(text))))
+
+    ranked = sorted(resources, key=_score, reverse=True)  # stable: ties keep backend order
+    return [resources[rid] for rid in ranked[:limit]]
+
+def _to_step(item: Dict[str, Any]) -> PathwayStep:
+    mapped = to_retriever_resource(item, "")
+    return PathwayStep(
+        resource=str(item["_id"]),
+        title=item.get("title") or mapped["title"],
+        description=item.get("description") or None,
+        type=item.get("type") or "article",
+        url=mapped["url"],
+    )
+
+def _apply_order(candidates: List[Dict[str, Any]], order: List[str]) -> List[Dict[str, Any]]:
+    """Candidates in the LLM's order; unknown or repeated IDs are dropped and omitted ones appended."""
+    by_ref = {f"r{i}": item for i, item in enumerate(candidates, start=1)}
+    ordered = [by_ref.pop(ref.strip()) for ref in order if ref.strip() in by_ref]
+    return ordered + list(by_ref.values())
+
 async def learning_path_generator_agent(stressors: List[str], topics: List[str], language: str = "en") -> Dict[str, Any]:
     """
-    Generates a personalized learning pathway for a student.
+    Generates a personalized learning pathway for a student from real backend resources.
     """
     logger.info(f"Starting pathway generation for stressors: {stressors}, topics: {topics}")
 
-    # 1. Fetch pre-vetted resources from the Node.js backend
-    
-    # try:
-    #     async with httpx.AsyncClient() as client:
-    #         logger.info(f"Querying Node.js backend for resources: {topics}")
-    #         response = await client.get(
-    #             f"{BACKEND_API_URL}/resources/recommended",
-    #             params={"topics": ",".join(topics), "language": language},
-    #             timeout=10.0
-    #         )
-    #         response.raise_for_status()
-    #         available_resources = response.json().get("data", [])
-    #         logger.info(f"Received {len(available_resources)} resources from backend.")
-    # except Exception as e:
-    #     logger.error(f"Failed to fetch resources from backend: {e}", exc_info=True)
-    #     raise ValueError("Could not retrieve resources to build the pathway.") from e
-
-    # if not available_resources:
-    #     logger.warning("No resources found for the given topics. Cannot generate a pathway.")
-    #     return {"title": "Resources for You", "steps": []}
-
-    # 2. Use the LLM to structure the pathway
+    # 1. Candidates from the cached per-topic snapshot of /resources/recommended
+    by_topic = await recommended_resources.for_topics(topics, language)
+    candidates = _rank_candidates(by_topic, stressors, PATHWAY_MAX_STEPS)
+    logger.info(f"Preselected {len(candidates)} candidate resources from {sum(len(v) for v in by_topic.values())} recommended.")
+
+    if not candidates:
+        logger.warning("No resources found for the given topics. Cannot generate a pathway.")
+        return {"title": DEFAULT_PATHWAY_TITLE, "steps": []}
+
+    # 2. The LLM only picks a title and the order of the candidate IDs
+    lines = [
+        f"r{i} | {item.get('type') or 'article'} | {item.get('title') or 'Untitled'} | {', '.join(item.get('category') or [])}"
+        for i, item in enumerate(candidates, start=1)
+    ]
     try:
-        logger.info("Invoking LLM to structure the learning pathway.")
-        pathway_chain = PROMPT_TEMPLATE | llm.with_structured_output(LearningPathwayOutput)
-        
-        pathway_result: LearningPathwayOutput = await pathway_chain.ainvoke({
+        logger.info("Invoking LLM to order the learning pathway.")
+        plan: PathwayPlan = await chain_registry.ainvoke("pathway", {
             "key_stressors": ", ".join(stressors),
-            "available_resources": json.dumps(topics, indent=2)
+            "candidates": "\n".join(lines),
         })
-
-        logger.info(f"Successfully generated pathway titled: '{pathway_result.title}'")
-        return pathway_result.model_dump()
-
+        title, ordered = plan.title, _apply_order(candidates, plan.order)
     except Exception as e:
-        logger.error(f"LLM failed to generate pathway: {e}", exc_info=True)
-        raise ValueError("AI model failed to structure the learning pathway.") from e
\ No newline at end of file
+        # Every step is a real resource either way; without the LLM they keep the local ranking.
+        logger.error(f"LLM failed to order the pathway, using the ranked candidates: {e}", exc_info=True)
+        title, ordered = DEFAULT_PATHWAY_TITLE, candidates
+
+    pathway = LearningPathwayOutput(title=title, steps=[_to_step(item) for item in ordered])
+    logger.info(f"Successfully generated pathway titled: '{pathway.title}' with {len(pathway.steps)} steps")
+    return pathway.model_dump()
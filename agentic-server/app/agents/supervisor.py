@@ -4,16 +4,21 @@
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, Callable
+import asyncio
 from datetime import datetime
 import os
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
 from ..config import GOOGLE_API_KEY
-from ..tools.search_tools import all_tools
+from ..tools.search_tools import resilient_tools
+from ..tools.resilience import ResilientTool, CircuitOpenError
+from ..tools.link_checker import link_checker, canonical_url
 from ..schemas.demo_report import DemoReport, HelpfulResources as DemoResources, Resource as DemoResource
 from ..schemas.standard_report import StandardReport, RiskAssessment, ScreeningScores, CounselorRecommendations, RecommendedResource, ClinicalAnalytics
-from ..utils.logger import get_logger
+from ..utils.logger import get_logger, log_payload
+from ..services.chain_registry import chain_registry
+from ..services.conversation_compactor import compact_conversation
+from ..services.resource_index import resource_index, to_retriever_resource
 import re
 from urllib.parse import urlparse
 import httpx # NEW: For making HTTP requests to your backend
@@ -28,9 +33,9 @@ logger = get_logger(__name__)
 # NEW: Retrieve your Node.js backend API URL from environment variables
 BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:5000/api")
 
+# Overall wall-clock budget for resource retrieval; the report is built from whatever arrived in time.
+RETRIEVAL_BUDGET_SECONDS = float(os.getenv("RETRIEVAL_BUDGET_SECONDS", "12"))
 
-# Use a more capable model for analysis and generation
-llm = ChatGoogleGenerativeAI(model=os.getenv("LLM_MODEL"))
 
 # ---------------- Pydantic Output Models for Agents ---------------- #
 
@@ -52,7 +57,7 @@ def _parse_urls_from_text(text: str):
 
 def _parse_youtube_result(raw) -> List[Dict[str, Any]]:
     """Normalize YouTube tool outputs into [{title,url,description,type,source_tool}]"""
-    print("[parse_youtube] raw type:", type(raw))
+    logger.debug(f"[parse_youtube] raw type: {type(raw)}")
     results: List[Dict[str, Any]] = []
 
     # Common: agent returns dict with 'output' and 'intermediate_steps'
@@ -127,13 +132,13 @@ def _parse_youtube_result(raw) -> List[Dict[str, Any]]:
                     "source_tool": "youtube_search",
                 })
 
-    print(f"[parse_youtube] parsed {len(results)} items")
+    logger.debug(f"[parse_youtube] parsed {len(results)} items")
     return results
 
 
 def _parse_tavily_result(raw) -> List[Dict[str, Any]]:
     """Normalize Tavily outputs into [{title,url,description,type,source_tool}]"""
-    print("[parse_tavily] raw type:", type(raw))
+    logger.debug(f"[parse_tavily] raw type: {type(raw)}")
     results: List[Dict[str, Any]] = []
 
     if isinstance(raw, dict):
@@ -188,7 +193,7 @@ def _parse_tavily_result(raw) -> List[Dict[str, Any]]:
                 "source_tool": "tavily_search",
             })
 
-    print(f"[parse_tavily] parsed {len(results)} items")
+    logger.debug(f"[parse_tavily] parsed {len(results)} items")
     return results
 
 
@@ -213,10 +218,44 @@ class SummaryOutput(BaseModel):
     student_expressed_concerns: List[str]
     suggested_resource_topics: List[str]
 
+# ---------------- Prompts (compiled once into the chain registry) ---------------- #
+
+SENTIMENT_RISK_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a clinical psychologist analyzing a student's conversation for sentiment and risk factors.
+         Analyze the conversation and provide your assessment based on the following criteria:
+         - Sentiment: Predominant feeling (e.g., Anxious, Depressed, Overwhelmed, Stressed).
+         - Emotional Intensity: How strong are the emotions? (Low, Moderate, High).
+         - Risk Level: Assess the immediate risk. (Low, Medium, High).
+         - Red Flags: Identify specific keywords or themes of concern (e.g., hopelessness, isolation, panic attacks, worthlessness, severe sleep deprivation)."""),
+    ("user", "Here is the conversation history:\n\n{conversation}")
+])
+
+SCREENING_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are a psychological assessment expert. Based on the student's conversation, estimate their scores on the PHQ-9 (for depression) and GAD-7 (for anxiety) scales.
+         These are estimations, not a formal diagnosis.
+         Provide the estimated scores and a brief clinical interpretation."""),
+    ("user", "Here is the conversation history:\n\n{conversation}")
+])
+
+SUMMARIZER_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are an expert summarizer. Analyze the conversation and create multiple summaries:
+         1.  `chat_summary_clinical`: A concise, objective summary for a counselor.
+         2.  `chat_summary_student`: An empathetic summary for the student, using "you" language.
+         3.  `key_stressors`: A list of the primary factors causing distress.
+         4.  `student_expressed_concerns`: A list of the main problems the student explicitly mentioned.
+         5.  `suggested_resource_topics`: A list of 3-4 specific topics to search for resources on (e.g., 'time management for students', 'guided meditation for sleep anxiety', 'overcoming fear of failure')."""),
+    ("user", "Here is the conversation history:\n\n{conversation}")
+])
+
+chain_registry.register("sentiment_risk", "v1", SENTIMENT_RISK_PROMPT, SentimentRiskOutput)
+chain_registry.register("screening", "v1", SCREENING_PROMPT, ScreeningScoresOutput)
+chain_registry.register("summarizer", "v1", SUMMARIZER_PROMPT, SummaryOutput)
+
 # ---------------- Agent State ---------------- #
 
 class AgentState(TypedDict):
     conversation_history: str
+    analysis_conversation: Optional[str]  # deduped / summarized form the LLM agents read
     sentiment_risk: Optional[SentimentRiskOutput]
     screening_scores: Optional[ScreeningScoresOutput]
     summary: Optional[SummaryOutput]
@@ -225,20 +264,17 @@ class AgentState(TypedDict):
 
 # ---------------- Agent Functions (Now with LLM) ---------------- #
 
+def _analysis_text(state: AgentState) -> str:
+    return state.get("analysis_conversation") or state["conversation_history"]
+
+async def compactor_agent(state: AgentState) -> Dict[str, Any]:
+    logger.info("Running Conversation Compactor...")
+    state["analysis_conversation"] = await compact_conversation(state["conversation_history"])
+    return state
+
 async def sentiment_risk_agent(state: AgentState) -> Dict[str, Any]:
     logger.info("Running Sentiment & Risk Analyzer Agent...")
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a clinical psychologist analyzing a student's conversation for sentiment and risk factors.
-         Analyze the conversation and provide your assessment based on the following criteria:
-         - Sentiment: Predominant feeling (e.g., Anxious, Depressed, Overwhelmed, Stressed).
-         - Emotional Intensity: How strong are the emotions? (Low, Moderate, High).
-         - Risk Level: Assess the immediate risk. (Low, Medium, High).
-         - Red Flags: Identify specific keywords or themes of concern (e.g., hopelessness, isolation, panic attacks, worthlessness, severe sleep deprivation)."""),
-        ("user", "Here is the conversation history:\n\n{conversation}")
-    ])
-    
-    analyzer_chain = prompt | llm.with_structured_output(SentimentRiskOutput)
-    result = await analyzer_chain.ainvoke({"conversation": state["conversation_history"]})
+    result = await chain_registry.ainvoke("sentiment_risk", {"conversation": _analysis_text(state)}, key=_analysis_text(state))
     
     state["sentiment_risk"] = result
     logger.info(f"Sentiment Analysis complete: {result}")
@@ -246,15 +282,7 @@ async def sentiment_risk_agent(state: AgentState) -> Dict[str, Any]:
 
 async def screening_agent(state: AgentState) -> Dict[str, Any]:
     logger.info("Running Screening Agent...")
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are a psychological assessment expert. Based on the student's conversation, estimate their scores on the PHQ-9 (for depression) and GAD-7 (for anxiety) scales.
-         These are estimations, not a formal diagnosis.
-         Provide the estimated scores and a brief clinical interpretation."""),
-        ("user", "Here is the conversation history:\n\n{conversation}")
-    ])
-
-    screener_chain = prompt | llm.with_structured_output(ScreeningScoresOutput)
-    result = await screener_chain.ainvoke({"conversation": state["conversation_history"]})
+    result = await chain_registry.ainvoke("screening", {"conversation": _analysis_text(state)}, key=_analysis_text(state))
     
     state["screening_scores"] = result
     logger.info(f"Screening Scores estimated: {result}")
@@ -262,52 +290,15 @@ async def screening_agent(state: AgentState) -> Dict[str, Any]:
 
 async def conversation_summarizer_agent(state: AgentState) -> Dict[str, Any]:
     logger.info("Running Conversation Summarizer Agent...")
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", """You are an expert summarizer. Analyze the conversation and create multiple summaries:
-         1.  `chat_summary_clinical`: A concise, objective summary for a counselor.
-         2.  `chat_summary_student`: An empathetic summary for the student, using "you" language.
-         3.  `key_stressors`: A list of the primary factors causing distress.
-         4.  `student_expressed_concerns`: A list of the main problems the student explicitly mentioned.
-         5.  `suggested_resource_topics`: A list of 3-4 specific topics to search for resources on (e.g., 'time management for students', 'guided meditation for sleep anxiety', 'overcoming fear of failure')."""),
-        ("user", "Here is the conversation history:\n\n{conversation}")
-    ])
-
-    summarizer_chain = prompt | llm.with_structured_output(SummaryOutput)
-    result = await summarizer_chain.ainvoke({"conversation": state["conversation_history"]})
+    result = await chain_registry.ainvoke("summarizer", {"conversation": _analysis_text(state)}, key=_analysis_text(state))
 
     state["summary"] = result
     logger.info(f"Summarization complete.")
     return state
 
-# NEW/UPDATED: Resource Retrieval Agent
-async def resource_retrieval_agent(state: AgentState) -> Dict[str, Any]:
-    logger.info("Running Resource Retrieval Agent...")
-    print("\n[retriever] START ------------------------------------")
-    topics = state["summary"].suggested_resource_topics
-    # TODO: Dynamically get student's preferred language from user profile if available
-    student_language = "en" # Placeholder for now
-
-    all_resources: List[Dict[str, Any]] = []
-    seen_urls: set[str] = set()
-
-    # Helper to insert with dedupe + prints. Modified to accept file_url.
-    def _add_resources(tag: str, items: List[Dict[str, Any]], topic: str):
-        print(f"[retriever] adding {len(items)} {tag} items for topic '{topic}'")
-        added = 0
-        for r in items:
-            url_to_check = (r.get("file_url") or r.get("url") or "").strip() # Prioritize file_url
-            if not url_to_check:
-                continue
-            if url_to_check in seen_urls:
-                print(f"[retriever] skip duplicate: {url_to_check}")
-                continue
-            r["source_topic"] = topic
-            all_resources.append(r)
-            seen_urls.add(url_to_check)
-            added += 1
-        print(f"[retriever] added {added}/{len(items)} new items (unique so far: {len(seen_urls)})")
-
-    # 1. NEW: Retrieve pre-vetted resources from your backend
+async def _fetch_internal_resources(topics: List[str], student_language: str) -> List[Dict[str, Any]]:
+    """Pre-vetted resources from the backend, mapped to the retriever's resource shape. Errors yield []."""
+    internal_parsed: List[Dict[str, Any]] = []
     try:
         logger.info(f"[retriever][internal] Querying backend for topics: {topics}, lang: {student_language}")
         async with httpx.AsyncClient() as client:
@@ -319,31 +310,10 @@ async def resource_retrieval_agent(state: AgentState) -> Dict[str, Any]:
             response.raise_for_status()
             internal_resources_raw = response.json().get("data", [])
             
-            internal_parsed: List[Dict[str, Any]] = []
             for item in internal_resources_raw:
-                resource_url = item.get("url")
-                file_public_url = None
-                if item.get("file") and item["file"].get("url"):
-                    # Construct full public URL for locally uploaded files
-                    file_public_url = f"{BACKEND_API_URL.replace('/api', '')}{item['file']['url']}"
-                    resource_url = file_public_url # Use file_url as primary if present
-
-                # Map backend resource types to types expected by report generator
-                mapped_type = "article"
-                if item.get("type") in ["video", "audio"]:
-                    mapped_type = "video" # Group audio/video together for demo report
-                
-                if resource_url:
-                    internal_parsed.append({
-                        "title": item.get("title") or "Untitled Internal Resource",
-                        "url": resource_url,
-                        "file_url": file_public_url, # Keep file_url separate if needed later
-                        "description": item.get("description") or "",
-                        "type": mapped_type, # 'video' or 'article' based on mapping
-                        "source_tool": "internal_vetted_db",
-                        "source_topic": item.get("category", [])[0] if item.get("category") else topics[0] # Use first category or main topic
-                    })
-            _add_resources("internal_db", internal_parsed, "Internal Vetted")
+                resource = to_retriever_resource(item, topics[0])
+                if resource is not None:
+                    internal_parsed.append(resource)
         logger.info(f"[retriever][internal] Retrieved {len(internal_parsed)} resources from internal DB.")
     except httpx.HTTPStatusError as e:
         logger.error(f"[retriever][internal] HTTP error querying backend: {e.response.status_code} - {e.response.text}")
@@ -351,81 +321,139 @@ async def resource_retrieval_agent(state: AgentState) -> Dict[str, Any]:
         logger.error(f"[retriever][internal] Request error querying backend: {e}")
     except Exception as e:
         logger.error(f"[retriever][internal] General error querying backend: {e}", exc_info=True)
+    return internal_parsed
 
+async def _search_tool(tool: ResilientTool, query: Any, parser: Callable[[Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """One external search call, parsed. Timeouts, open circuits and tool errors yield []."""
+    logger.debug(f"[retriever][{tool.name}] query: {query}")
+    try:
+        raw = await tool.ainvoke(query)
+    except CircuitOpenError as e:
+        logger.info(f"[retriever][{tool.name}] skipped: {e}")
+        return []
+    except Exception as e:
+        logger.error(f"[retriever][{tool.name}] retrieval error for {query!r}: {e}")
+        return []
+    log_payload(logger, f"[retriever][{tool.name}] RAW", raw)
+    parsed = parser(raw)
+    log_payload(logger, f"[retriever][{tool.name}] PARSED", parsed)
+    return parsed
 
-    # 2. EXISTING: Query external tools (can be made conditional, e.g., if internal_parsed is empty)
-    
-    tool_map = {t.name: t for t in all_tools}
-    print(f"[retriever] available tools: {list(tool_map.keys())}")
-
-    yt_tool = tool_map.get("youtube_search")
-    tavily_tool = tool_map.get("tavily_search")
+# NEW/UPDATED: Resource Retrieval Agent
+async def resource_retrieval_agent(state: AgentState) -> Dict[str, Any]:
+    logger.info("Running Resource Retrieval Agent...")
+    topics = state["summary"].suggested_resource_topics
+    # TODO: Dynamically get student's preferred language from user profile if available
+    student_language = "en" # Placeholder for now
 
-    # Query per topic
-    for idx, topic in enumerate(topics):
-        print(f"\n[retriever] === Topic {idx+1}/{len(topics)}: '{topic}' ===")
+    all_resources: List[Dict[str, Any]] = []
+    seen_urls: set[str] = set()
 
-        # ---- YouTube (videos) ----
+    # Helper to insert with dedupe + debug logging. Modified to accept file_url.
+    def _add_resources(tag: str, items: List[Dict[str, Any]], topic: str):
+        logger.debug(f"[retriever] adding {len(items)} {tag} items for topic '{topic}'")
+        added = 0
+        for r in items:
+            if r.get("source_tool") != "internal_vetted_db":
+                r["url"] = canonical_url(r.get("url") or "")  # tracking params, youtu.be vs youtube.com, ...
+            url_to_check = canonical_url(r.get("file_url") or r.get("url") or "") # Prioritize file_url
+            if not url_to_check:
+                continue
+            if url_to_check in seen_urls:
+                logger.debug(f"[retriever] skip duplicate: {url_to_check}")
+                continue
+            r["source_topic"] = topic
+            all_resources.append(r)
+            seen_urls.add(url_to_check)
+            added += 1
+        logger.debug(f"[retriever] added {added}/{len(items)} new items (unique so far: {len(seen_urls)})")
+
+    # Topics with enough good matches in the local resource index are answered from it alone;
+    # only the rest go to live web search. Until the index has synced, the backend is queried instead.
+    local_hits: Dict[str, List[Dict[str, Any]]] = {}
+    if resource_index.ready:
+        local_hits = {topic: resource_index.search(topic, student_language) for topic in topics}
+        for topic, hits in local_hits.items():
+            _add_resources("resource_index", hits, topic)
+        web_topics = [topic for topic in topics if not resource_index.covers(local_hits[topic])]
+        logger.info(f"[retriever][index] {len(topics) - len(web_topics)}/{len(topics)} topic(s) answered from the local index.")
+        jobs = []
+    else:
+        web_topics = topics
+        jobs = [("internal_db", "Internal Vetted", _fetch_internal_resources(topics, student_language))]
+
+    # All sources are queried concurrently under one time budget; whatever has arrived when it
+    # runs out is used and the rest is cancelled, so a hung tool cannot hold up the report.
+
+    yt_tool = resilient_tools.get("youtube_search")
+    tavily_tool = resilient_tools.get("tavily_search")
+    if yt_tool is None and web_topics:
+        logger.warning("[retriever][youtube] tool not available")
+    if tavily_tool is None and web_topics:
+        logger.warning("[retriever][tavily] tool not available")
+
+    for topic in web_topics:
         if yt_tool is not None:
-            yt_query = f"{topic},5"  # required format: "query,NUM"
-            print(f"[retriever][youtube] query: {yt_query}")
-            try:
-                yt_raw = await yt_tool.ainvoke(yt_query)
-                print("[retriever][youtube] RAW:", yt_raw)
-                yt_parsed = _parse_youtube_result(yt_raw)
-                print("[retriever][youtube] PARSED:", yt_parsed)
-                _add_resources("youtube", yt_parsed, topic)
-            except Exception as e:
-                logger.error(f"YouTube retrieval error for '{topic}': {e}")
-                print(f"[retriever][youtube] ERROR: {e}")
-        else:
-            print("[retriever][youtube] tool not available")
-
-        # ---- Tavily (articles) ----
+            jobs.append(("youtube", topic, _search_tool(yt_tool, f"{topic},5", _parse_youtube_result)))  # required format: "query,NUM"
         if tavily_tool is not None:
-            tavily_query = {"query": topic, "include_images": False}
-            print(f"[retriever][tavily] query: {tavily_query}")
-            try:
-                tavily_raw = await tavily_tool.ainvoke(tavily_query)
-                print("[retriever][tavily] RAW:", tavily_raw)
-                tavily_parsed = _parse_tavily_result(tavily_raw)
-                print("[retriever][tavily] PARSED:", tavily_parsed)
-                _add_resources("tavily", tavily_parsed, topic)
-            except Exception as e:
-                logger.error(f"Tavily retrieval error for '{topic}': {e}")
-                print(f"[retriever][tavily] ERROR: {e}")
-        else:
-            print("[retriever][tavily] tool not available")
-
-    print(f"\n[retriever] total unique resources collected: {len(all_resources)}")
+            jobs.append(("tavily", topic, _search_tool(tavily_tool, {"query": topic, "include_images": False}, _parse_tavily_result)))
+
+    tasks = [asyncio.create_task(coro) for _, _, coro in jobs]
+    done, pending = await asyncio.wait(tasks, timeout=RETRIEVAL_BUDGET_SECONDS) if tasks else (set(), set())
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"[retriever] time budget of {RETRIEVAL_BUDGET_SECONDS:g}s exhausted; proceeding without {len(pending)}/{len(tasks)} source call(s).")
+
+    # Merge in job order (internal first) so dedupe prefers vetted resources, as before.
+    web_results: Dict[str, List[Dict[str, Any]]] = {}
+    for (tag, topic, _), task in zip(jobs, tasks):
+        if task in done and not task.cancelled() and task.exception() is None:
+            _add_resources(tag, task.result(), topic)
+            if tag != "internal_db":
+                web_results.setdefault(topic, []).extend(task.result())
+
+    # Links from web search (directly or via the index) are checked before they reach the report;
+    # admin-vetted internal resources are not.
+    checked = await link_checker.filter_alive([r for r in all_resources if r.get("source_tool") != "internal_vetted_db"])
+    live_urls = {r["url"] for r in checked}
+    all_resources = [r for r in all_resources if r.get("source_tool") == "internal_vetted_db" or r["url"] in live_urls]
+
+    # Web results are recorded so the next index sync can answer these topics locally.
+    if web_results and resource_index.ready:
+        try:
+            for topic, items in web_results.items():
+                live_items = [r for r in items if r.get("url") in live_urls]
+                await asyncio.to_thread(resource_index.remember, topic, live_items, student_language)
+        except Exception as e:
+            logger.warning(f"[retriever][index] could not record web results: {e}")
+
     # Persist as-is (no static fallbacks)
     state["retrieved_resources"] = all_resources
-    logger.info("Resource Retrieval complete.")
-    print("[retriever] END --------------------------------------\n")
+    logger.info(f"Resource Retrieval complete: {len(all_resources)} unique resources collected.")
     return state
 
 # ---------------- Report Generator Agent ---------------- #
 
 def report_generator(state: AgentState) -> Dict[str, Any]:
     logger.info("Running Report Generator Agent...")
-    print("\n[report] START ---------------------------------------")
 
     summary: SummaryOutput = state["summary"]
     risk: SentimentRiskOutput = state["sentiment_risk"]
     scores: ScreeningScoresOutput = state["screening_scores"]
 
-    print("[report] summary:", summary)
-    print("[report] risk:", risk)
-    print("[report] scores:", scores)
+    log_payload(logger, "[report] summary", summary)
+    log_payload(logger, "[report] risk", risk)
+    log_payload(logger, "[report] scores", scores)
 
     raw_resources: List[Dict[str, Any]] = state.get("retrieved_resources") or []
-    print(f"[report] raw_resources count: {len(raw_resources)}")
-    print("[report] raw_resources sample (up to 3):", raw_resources[:3])
+    logger.debug(f"[report] raw_resources count: {len(raw_resources)}")
+    log_payload(logger, "[report] raw_resources sample (up to 3)", raw_resources[:3])
 
     # Group resources
     videos_raw = [r for r in raw_resources if r.get("type") == "video"]
     articles_raw = [r for r in raw_resources if r.get("type") == "article"] # This will now include 'document' and 'audio' if mapped this way
-    print(f"[report] videos_raw: {len(videos_raw)}  articles_raw: {len(articles_raw)}")
+    logger.debug(f"[report] videos_raw: {len(videos_raw)}  articles_raw: {len(articles_raw)}")
 
     # Convert to DemoResource objects
     def _to_demo_resource(r: Dict[str, Any]) -> DemoResource:
@@ -438,13 +466,9 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
     videos = [_to_demo_resource(r) for r in videos_raw]
     articles = [_to_demo_resource(r) for r in articles_raw]
 
-    print(f"[report] videos for demo: {len(videos)}")
-    for i, v in enumerate(videos[:3]):
-        print(f"[report] video[{i}]:", v)
-
-    print(f"[report] articles for demo: {len(articles)}")
-    for i, a in enumerate(articles[:3]):
-        print(f"[report] article[{i}]:", a)
+    logger.debug(f"[report] videos for demo: {len(videos)}, articles for demo: {len(articles)}")
+    log_payload(logger, "[report] videos (up to 3)", videos[:3])
+    log_payload(logger, "[report] articles (up to 3)", articles[:3])
 
     # Build HelpfulResources from dynamic data ONLY (no static)
     demo_resources = DemoResources(
@@ -455,7 +479,7 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
 
     # Dynamic key takeaways from stressors
     key_takes = [f"Addressing feelings around {s.lower()}" for s in summary.key_stressors]
-    print("[report] key_takeaways:", key_takes)
+    log_payload(logger, "[report] key_takeaways", key_takes)
 
     # Dynamic suggested first steps based on what's available
     first_steps: List[str] = []
@@ -466,7 +490,7 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
     # Always include a self-reg step; still dynamic wording
     first_steps.append("Try a 2-minute breathing break when emotions spike.")
 
-    print("[report] suggested_first_steps:", first_steps)
+    log_payload(logger, "[report] suggested_first_steps", first_steps)
 
     # ---- Build Demo Report (Student-Facing) ----
     demo_report = DemoReport(
@@ -478,12 +502,12 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
             "You took a real step by talking about this. Be gentle with yourself; small actions count."
         ),
     )
-    print("[report] demo_report constructed.")
+    logger.debug("[report] demo_report constructed.")
 
     # ---- Counselor-facing: derive recommendations from retrieved resources ----
     # Use top articles (up to 5) as recommended resources; fall back to videos if no articles
     counselor_source_pool = articles_raw if articles_raw else videos_raw
-    print(f"[report] counselor_source_pool size: {len(counselor_source_pool)} (articles first, else videos)")
+    logger.debug(f"[report] counselor_source_pool size: {len(counselor_source_pool)} (articles first, else videos)")
 
     recs = []
     for r in counselor_source_pool[:5]:
@@ -496,7 +520,7 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
                 source_tool=(r.get("source_tool") or "unknown"),
             )
         )
-    print(f"[report] counselor recommended_resources: {len(recs)}")
+    logger.debug(f"[report] counselor recommended_resources: {len(recs)}")
 
     # Dynamic suggested next steps from stressors + available resources
     dynamic_steps: List[str] = []
@@ -511,7 +535,7 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
         f"Monitor symptoms consistent with PHQ-9={scores.phq_9_score}, GAD-7={scores.gad_7_score}; consider follow-up screening in 2–4 weeks."
     )
 
-    print("[report] counselor suggested_next_steps:", dynamic_steps)
+    log_payload(logger, "[report] counselor suggested_next_steps", dynamic_steps)
 
     standard_report = StandardReport(
         chat_summary=summary.chat_summary_clinical,
@@ -532,26 +556,27 @@ def report_generator(state: AgentState) -> Dict[str, Any]:
         ),
         report_generated_at=datetime.utcnow(),
     )
-    print("[report] standard_report constructed.")
+    logger.debug("[report] standard_report constructed.")
 
     state["final_report"] = {
         "demo_report": demo_report.dict(),
         "standard_report": standard_report.dict(),
     }
-    print("[report] final_report keys:", list(state["final_report"].keys()))
-    print("[report] END -----------------------------------------\n")
+    logger.info("Report Generator complete.")
     return state
 
 # ---------------- Graph Orchestration (Same as before) ---------------- #
 def build_graph():
     workflow = StateGraph(AgentState)
+    workflow.add_node("compactor", compactor_agent)
     workflow.add_node("sentiment_risk", sentiment_risk_agent)
     workflow.add_node("screening", screening_agent)
     workflow.add_node("summarizer", conversation_summarizer_agent)
     workflow.add_node("retriever", resource_retrieval_agent)
     workflow.add_node("report_generator", report_generator)
 
-    workflow.set_entry_point("sentiment_risk")
+    workflow.set_entry_point("compactor")
+    workflow.add_edge("compactor", "sentiment_risk")
     workflow.add_edge("sentiment_risk", "screening")
     workflow.add_edge("screening", "summarizer")
     workflow.add_edge("summarizer", "retriever")
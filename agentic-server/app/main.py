@@ -1,23 +1,41 @@
 # app/main.py
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException,status
+from fastapi import FastAPI, HTTPException,status, Request, Depends, Header
+from fastapi.responses import PlainTextResponse
 import os
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import uuid
+import hmac
+import time
+import asyncio
 import pandas as pd
 
-from .services.report_service import generate_student_report
-from .utils.logger import get_logger
-from .services.pathway_service import generate_learning_pathway
+from .services.report_service import generate_student_report, report_flight
+from .utils.logger import get_logger, log_payload, request_id_var
+from .services.pathway_service import generate_learning_pathway, pathway_flight
 from .schemas.learning_pathway import PathwayGenerationRequest, LearningPathwayOutput
 
 
 from .db.connect import connect_db, close_db, get_db
-from .agents.analytic_supervisor import analytic_graph_app, AnalyticState
+from .agents.analytic_supervisor import analytic_graph_app, AnalyticState, data_fetcher
 from .schemas.analytics import AnalyticsRequest, AnalyticsResponse, AnalyticsSnapshot
+from .services.llm_gateway import llm_gateway
+from .services.chain_registry import chain_registry
+from .services.process_pool import analytics_pool
+from .services.live_analytics import live_analytics, LIVE_SNAPSHOT_TYPE
+from .services.risk_trajectories import risk_trajectories
+from .services.resource_index import resource_index
+from .services.recommended_resources import recommended_resources
+from .services.pathway_cache import pathway_cache
+from .tools.link_checker import link_checker
+from .services.fixtures import fixture_store
+from .services import profiling
+from .utils.responses import ORJSONResponse
+from .utils.compression import CompressionMiddleware
+from .tools.search_tools import resilient_tools
 
 
 
@@ -33,8 +51,24 @@ async def lifespan(app: FastAPI):
         global mongo_client
         mongo_client = connect_db()
         logger.info("Analytic Server: MongoDB connection established.")
+        if os.getenv("ANALYTICS_ENSURE_INDEXES", "true").lower() in ("1", "true", "yes"):
+            try:
+                data_fetcher.ensure_indexes()
+                risk_trajectories.ensure_indexes()
+            except Exception as e:
+                # Cohort queries still work without them, just with wider scans.
+                logger.warning(f"Analytic Server: could not create cohort indexes: {e}")
+        live_analytics.start()
+        resource_index.start()
+        pathway_cache.start()
         yield
         logger.info("Analytic Server: Application shutting down. Closing MongoDB connection...")
+        await live_analytics.stop()
+        await resource_index.stop()
+        await recommended_resources.close()
+        await link_checker.close()
+        await pathway_cache.stop()
+        analytics_pool.shutdown()
         close_db()
         logger.info("Analytic Server: MongoDB connection closed.")
     except Exception as e:
@@ -50,6 +84,49 @@ app = FastAPI(
 
 logger = get_logger(__name__)
 
+def _is_profiling_admin(token: Optional[str]) -> bool:
+    return profiling.PROFILING_ENABLED and bool(profiling.PROFILING_ADMIN_TOKEN) and hmac.compare_digest(token or "", profiling.PROFILING_ADMIN_TOKEN)
+
+def require_profiling_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Profiling endpoints do not exist unless enabled, and need the admin token when they do."""
+    if not profiling.PROFILING_ENABLED or not profiling.PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not _is_profiling_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required.")
+
+# Registered before request_id_middleware so it runs inside it and can reuse the request ID.
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """Samples the stacks while serving a request sent with `X-Profile: 1` and the admin token."""
+    if not profiling.PROFILING_ENABLED or "x-profile" not in request.headers or not _is_profiling_admin(request.headers.get("X-Admin-Token")):
+        return await call_next(request)
+    sampler = profiling.request_profiles.begin()
+    if sampler is None:
+        return await call_next(request)
+    profile_id = request_id_var.get()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        profiling.request_profiles.end(profile_id, request.url.path, sampler, time.perf_counter() - started)
+    response.headers["X-Profile-ID"] = profile_id
+    return response
+
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tags every log record for this request with its ID (taken from X-Request-ID when the caller sends one)."""
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex[:12]
+    token = request_id_var.set(request_id)
+    try:
+        response = await call_next(request)
+    finally:
+        request_id_var.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+# Added after the middlewares above so it wraps them and compresses the final body.
+app.add_middleware(CompressionMiddleware)
+
 class ChatHistoryRequest(BaseModel):
     conversation_history: str
     
@@ -66,6 +143,22 @@ def _generate_snapshot_version(prefix: str = "Manual", period_start: Optional[da
     return f"{prefix}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6]}"
 
 
+def _resolve_windows(request: AnalyticsRequest, period_end: datetime) -> List[Dict[str, Any]]:
+    """Explicit windows followed by rolling ones (ending at period_end), without duplicates; naive bounds are taken as UTC."""
+    def utc(value: datetime) -> datetime:
+        return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+    windows = [(w.label, w.period_start, w.period_end) for w in request.windows]
+    windows += [(f"{days}d", period_end - timedelta(days=days), period_end) for days in request.rolling_window_days]
+    resolved, seen = [], set()
+    for label, start, end in ((label, utc(start), utc(end)) for label, start, end in windows):
+        if (start, end) in seen:
+            continue
+        seen.add((start, end))
+        resolved.append({"label": label, "period_start": start, "period_end": end})
+    return resolved
+
+
 # --- Endpoints ---
 
 @app.get("/", tags=["Health Check"])
@@ -73,7 +166,92 @@ async def read_root():
     """Basic health check endpoint."""
     return {"status": "Analytic API is running"}
 
-@app.post("/generate-analytics", response_model=AnalyticsResponse, tags=["Analytics Generation"])
+@app.get("/metrics/llm", tags=["Health Check"])
+async def get_llm_metrics():
+    """Queue depth, wait times and retry counters of the shared LLM gateway."""
+    return llm_gateway.metrics()
+
+@app.get("/metrics/chains", tags=["Health Check"])
+async def get_chain_metrics():
+    """Per-variant call counts, failures, latency and estimated token cost of the registered LLM chains."""
+    return chain_registry.metrics()
+
+@app.get("/metrics/tools", tags=["Health Check"])
+async def get_tool_metrics():
+    """Circuit-breaker state and recent error rate of each external search tool."""
+    return {name: tool.breaker.status() for name, tool in resilient_tools.items()}
+
+@app.get("/metrics/fixtures", tags=["Health Check"])
+async def get_fixture_metrics():
+    """Record/replay mode and how many LLM/tool calls were replayed, recorded, missing or failed on purpose."""
+    return fixture_store.metrics()
+
+@app.get("/metrics/links", tags=["Health Check"])
+async def get_link_metrics():
+    """Link liveness checks made, verdict cache hits, and how many links were found dead."""
+    return link_checker.metrics()
+
+@app.get("/metrics/resource-index", tags=["Health Check"])
+async def get_resource_index_metrics():
+    """Size and last sync of the local resource index, and how many topics it answered without web search."""
+    return resource_index.metrics()
+
+@app.get("/metrics/coalescing", tags=["Health Check"])
+async def get_coalescing_metrics():
+    """How many report/pathway requests were served by an in-flight or just-finished identical run."""
+    return {"report": report_flight.metrics(), "pathway": pathway_flight.metrics(), "recommended_resources": recommended_resources.metrics()}
+
+@app.get("/metrics/pathway-cache", tags=["Health Check"])
+async def get_pathway_cache_metrics():
+    """Hit rate of the memoised pathways and the generation time the hits saved."""
+    return pathway_cache.metrics()
+
+@app.post("/admin/profiling/sample", response_class=PlainTextResponse, tags=["Profiling"], dependencies=[Depends(require_profiling_admin)])
+async def profile_window(seconds: float = 10.0, mode: str = "sample", interval_ms: float = profiling.PROFILING_INTERVAL_MS):
+    """
+    Profiles the live process for `seconds` (capped at PROFILING_MAX_SECONDS). mode=sample returns
+    folded stacks of all threads for flamegraph tools; mode=cprofile returns pstats text for the
+    event-loop thread.
+    """
+    if mode == "cprofile":
+        return await profiling.cprofile_for(seconds)
+    if mode != "sample":
+        raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'.")
+    return await profiling.sample_for(seconds, interval=max(interval_ms, 1.0) / 1000)
+
+@app.get("/admin/profiling/requests", tags=["Profiling"], dependencies=[Depends(require_profiling_admin)])
+async def list_request_profiles():
+    """Requests profiled via the X-Profile header, newest first."""
+    return profiling.request_profiles.list()
+
+@app.get("/admin/profiling/requests/{profile_id}", response_class=PlainTextResponse, tags=["Profiling"], dependencies=[Depends(require_profiling_admin)])
+async def get_request_profile(profile_id: str):
+    """Folded stacks sampled while the request with this X-Profile-ID was served."""
+    profile = profiling.request_profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="No profile with this ID (it may have been evicted).")
+    return profile["folded"]
+
+@app.post("/admin/profiling/tracemalloc/start", tags=["Profiling"], dependencies=[Depends(require_profiling_admin)])
+async def start_tracemalloc(frames: int = 10):
+    """Starts tracing allocations (slows allocation-heavy code until stopped)."""
+    return profiling.tracemalloc_start(frames)
+
+@app.post("/admin/profiling/tracemalloc/stop", tags=["Profiling"], dependencies=[Depends(require_profiling_admin)])
+async def stop_tracemalloc():
+    return profiling.tracemalloc_stop()
+
+@app.get("/admin/profiling/tracemalloc", tags=["Profiling"], dependencies=[Depends(require_profiling_admin)])
+async def get_tracemalloc_top(limit: int = 25, scope: str = "analytics", group_by: str = "traceback"):
+    """Top live allocations; scope=analytics keeps those made through pandas/numpy/pyarrow and the analytics pipeline."""
+    if scope not in ("analytics", "all") or group_by not in ("traceback", "lineno", "filename"):
+        raise HTTPException(status_code=400, detail="scope must be analytics|all and group_by traceback|lineno|filename.")
+    try:
+        return await asyncio.to_thread(profiling.tracemalloc_top, limit, scope, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/generate-analytics", response_model=AnalyticsResponse, response_class=ORJSONResponse, tags=["Analytics Generation"])
 async def trigger_analytics_generation(request: AnalyticsRequest = AnalyticsRequest()):
     """
     Triggers the multi-agent workflow to generate a new analytics snapshot.
@@ -87,7 +265,18 @@ async def trigger_analytics_generation(request: AnalyticsRequest = AnalyticsRequ
 
     # Generate a unique snapshot version
     version_prefix = os.getenv("ANALYTIC_SNAPSHOT_VERSION_PREFIX", "Daily")
-    snapshot_version = _generate_snapshot_version(
+    windows = _resolve_windows(request, period_end)
+    for window in windows:
+        window["snapshot_version"] = _generate_snapshot_version(
+            prefix=f"{version_prefix}-{window['label']}" if window["label"] else version_prefix,
+            period_start=window["period_start"],
+            period_end=window["period_end"]
+        )
+    if windows:
+        # Ingest the widest range once; every window is sliced from it.
+        period_start = min(w["period_start"] for w in windows)
+        period_end = max(w["period_end"] for w in windows)
+    snapshot_version = windows[0]["snapshot_version"] if windows else _generate_snapshot_version(
         prefix=version_prefix, 
         period_start=period_start, 
         period_end=period_end
@@ -106,7 +295,12 @@ async def trigger_analytics_generation(request: AnalyticsRequest = AnalyticsRequ
         "snapshot_version": snapshot_version,
         "period_start": period_start,
         "period_end": period_end,
-        "filters_used": request.filters,
+        "filters_used": request.filters.dict(exclude_defaults=True),
+        "cohort_predicates": {},
+        "frames_from_cache": False,
+        "windows": windows,
+        "window_label": None,
+        "window_snapshots": [],
     }
 
     try:
@@ -115,13 +309,17 @@ async def trigger_analytics_generation(request: AnalyticsRequest = AnalyticsRequ
         if final_state and final_state.get("analytic_results"):
             # The _id field is added by db_saver_agent
             snapshot_id = final_state["analytic_results"].get("_id") 
+            snapshots = final_state.get("window_snapshots") or [final_state["analytic_results"]]
             logger.info(f"Analytics snapshot {snapshot_version} generated successfully with ID: {snapshot_id}")
-            return AnalyticsResponse(
+            return ORJSONResponse(AnalyticsResponse(
                 success=True,
-                message=f"Analytics snapshot '{snapshot_version}' generated successfully.",
+                message=f"Analytics snapshot '{snapshot_version}' generated successfully." if len(snapshots) == 1
+                    else f"{len(snapshots)} analytics snapshots generated successfully.",
                 snapshot_id=snapshot_id,
-                snapshot_version=snapshot_version
-            )
+                snapshot_version=snapshot_version,
+                snapshot_ids=[s.get("_id") for s in snapshots if s.get("_id")],
+                snapshot_versions=[s.get("snapshotVersion") for s in snapshots if s.get("snapshotVersion")]
+            ))
         else:
             logger.error("Analytics generation completed, but no results found in final state.")
             raise HTTPException(
@@ -136,7 +334,7 @@ async def trigger_analytics_generation(request: AnalyticsRequest = AnalyticsRequ
             detail=f"Internal Server Error during analytics generation: {str(e)}"
         )
 
-@app.get("/analytics/latest", response_model=AnalyticsResponse, tags=["Analytics Retrieval"])
+@app.get("/analytics/latest", response_model=AnalyticsResponse, response_class=ORJSONResponse, tags=["Analytics Retrieval"])
 async def get_latest_analytics_snapshot():
     """
     Retrieves the most recent analytics snapshot.
@@ -147,7 +345,7 @@ async def get_latest_analytics_snapshot():
         analytics_collection = db["analyticssnapshots"]
         
         latest_snapshot_doc = analytics_collection.find_one(
-            {},
+            {"snapshotType": {"$ne": LIVE_SNAPSHOT_TYPE}},
             sort=[("snapshotTimestamp", -1)] # Sort by latest timestamp
         )
 
@@ -157,13 +355,13 @@ async def get_latest_analytics_snapshot():
             # Pydantic will handle nested types from dict
             latest_snapshot = AnalyticsSnapshot(**latest_snapshot_doc)
             logger.info(f"Retrieved latest snapshot: {latest_snapshot.snapshotVersion}")
-            return AnalyticsResponse(
+            return ORJSONResponse(AnalyticsResponse(
                 success=True,
                 message="Latest analytics snapshot retrieved.",
                 data=latest_snapshot,
                 snapshot_id=latest_snapshot.snapshotTimestamp,
                 snapshot_version=latest_snapshot.snapshotVersion
-            )
+            ))
         else:
             logger.warning("No analytics snapshots found.")
             raise HTTPException(
@@ -177,7 +375,30 @@ async def get_latest_analytics_snapshot():
             detail=f"Internal Server Error: {str(e)}"
         )
 
-@app.get("/analytics/versions", response_model=List[Dict[str, Any]], tags=["Analytics Retrieval"])
+@app.get("/analytics/live", response_model=Dict[str, Any], response_class=ORJSONResponse, tags=["Analytics Retrieval"])
+async def get_live_analytics():
+    """
+    Rolling-window counters kept current from report and check-in inserts (LIVE_ANALYTICS_SOURCE),
+    or the last checkpoint when live mode is off in this process.
+    """
+    if live_analytics.enabled:
+        return ORJSONResponse(live_analytics.current())
+    checkpoint = get_db()["analyticssnapshots"].find_one({"snapshotType": LIVE_SNAPSHOT_TYPE}, {"liveState": 0})
+    if not checkpoint:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Live analytics are disabled and no checkpoint exists.")
+    checkpoint["_id"] = str(checkpoint["_id"])
+    return ORJSONResponse(checkpoint)
+
+@app.get("/students/{student_id}/risk-trajectory", response_model=Dict[str, Any], response_class=ORJSONResponse, tags=["Analytics Retrieval"])
+async def get_student_risk_trajectory(student_id: str):
+    """A student's recent check-ins, AI report risk levels and scores, with rolling means and trends."""
+    await asyncio.to_thread(risk_trajectories.catch_up)
+    trajectory = await asyncio.to_thread(risk_trajectories.get, student_id)
+    if not trajectory:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No risk trajectory for student {student_id}.")
+    return ORJSONResponse(trajectory)
+
+@app.get("/analytics/versions", response_model=List[Dict[str, Any]], response_class=ORJSONResponse, tags=["Analytics Retrieval"])
 async def get_all_snapshot_versions():
     """
     Retrieves a list of all available analytics snapshot versions and their timestamps.
@@ -188,14 +409,14 @@ async def get_all_snapshot_versions():
         analytics_collection = db["analyticssnapshots"]
         
         # Project only necessary fields to keep payload small
-        versions = list(analytics_collection.find({}, {"snapshotVersion": 1, "snapshotTimestamp": 1, "periodStart": 1, "periodEnd": 1}).sort("snapshotTimestamp", -1))
+        versions = list(analytics_collection.find({"snapshotType": {"$ne": LIVE_SNAPSHOT_TYPE}}, {"snapshotVersion": 1, "snapshotTimestamp": 1, "periodStart": 1, "periodEnd": 1}).sort("snapshotTimestamp", -1))
         
         # Convert ObjectId to string
         for version in versions:
             version['_id'] = str(version['_id'])
 
         logger.info(f"Retrieved {len(versions)} snapshot versions.")
-        return versions
+        return ORJSONResponse(versions)
     except Exception as e:
         logger.error(f"Error retrieving snapshot versions: {e}", exc_info=True)
         raise HTTPException(
@@ -204,7 +425,7 @@ async def get_all_snapshot_versions():
         )
 
 
-@app.get("/analytics/{snapshot_id}", response_model=AnalyticsResponse, tags=["Analytics Retrieval"])
+@app.get("/analytics/{snapshot_id}", response_model=AnalyticsResponse, response_class=ORJSONResponse, tags=["Analytics Retrieval"])
 async def get_analytics_by_id(snapshot_id: str):
     """
     Retrieves a specific analytics snapshot by its MongoDB ID.
@@ -221,13 +442,13 @@ async def get_analytics_by_id(snapshot_id: str):
             snapshot_doc['_id'] = str(snapshot_doc['_id'])
             snapshot = AnalyticsSnapshot(**snapshot_doc)
             logger.info(f"Retrieved snapshot {snapshot.snapshotVersion} by ID: {snapshot_id}")
-            return AnalyticsResponse(
+            return ORJSONResponse(AnalyticsResponse(
                 success=True,
                 message=f"Analytics snapshot '{snapshot.snapshotVersion}' retrieved.",
                 data=snapshot,
                 snapshot_id=snapshot_id,
                 snapshot_version=snapshot.snapshotVersion
-            )
+            ))
         else:
             logger.warning(f"Analytics snapshot with ID {snapshot_id} not found.")
             raise HTTPException(
@@ -242,7 +463,7 @@ async def get_analytics_by_id(snapshot_id: str):
         )
 
 
-@app.post("/generate-report", tags=["Reports"])
+@app.post("/generate-report", response_class=ORJSONResponse, tags=["Reports"])
 async def create_report(request: ChatHistoryRequest) -> Dict:
     """
     Accepts a student's conversation history and returns a comprehensive
@@ -254,7 +475,7 @@ async def create_report(request: ChatHistoryRequest) -> Dict:
             raise HTTPException(status_code=400, detail="Conversation history cannot be empty.")
             
         reports = await generate_student_report(request.conversation_history)
-        return reports
+        return ORJSONResponse(reports)
     except Exception as e:
         logger.error(f"An error occurred during report generation: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
@@ -274,7 +495,7 @@ async def create_learning_pathway(request: PathwayGenerationRequest):
             language=request.student_language
         )
         
-        print(f"pathway from the {pathway}")
+        log_payload(logger, "Generated pathway", pathway)
         return pathway
     except ValueError as ve:
         logger.error(f"Validation error during pathway generation: {ve}")
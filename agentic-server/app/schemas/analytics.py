@@ -1,9 +1,9 @@
 # agentic-server/app/schemas/analytics.py
 
-from pydantic import BaseModel, Field, conlist, field_validator
+from pydantic import AliasChoices, BaseModel, Field, conlist, field_validator
 from typing import List, Dict, Any, Optional
 from datetime import datetime
-import json
+import orjson
 
 # --- Helper Schemas for Nested Data ---
 
@@ -23,6 +23,12 @@ class SentimentTrendItem(BaseModel):
     date: datetime
     averageSentimentScore: float
 
+class TimeSeries(BaseModel):
+    """Column-oriented counts per time bucket: series[label][i] is the count for dates[i]."""
+    bucket: str  # "D" (daily) or "W" (weeks starting Monday)
+    dates: List[str] = Field(default_factory=list)
+    series: Dict[str, List[int]] = Field(default_factory=dict)
+
 # --- Main AnalyticsSnapshot Schema ---
 
 class AnalyticsSnapshot(BaseModel):
@@ -35,6 +41,8 @@ class AnalyticsSnapshot(BaseModel):
     snapshotVersion: str = Field(...)
     periodStart: Optional[datetime] = None
     periodEnd: Optional[datetime] = None
+    # Set when the snapshot is one of several windows computed in a single request, e.g. "7d".
+    windowLabel: Optional[str] = None
     
     # --- High-Level Metrics ---
     totalReports: int = Field(default=0, ge=0)
@@ -77,10 +85,19 @@ class AnalyticsSnapshot(BaseModel):
     # --- Additional Advanced Metrics ---
     emergingThemes: List[str] = Field(default_factory=list)
     sentimentOverTime: List[SentimentTrendItem] = Field(default_factory=list)
+    sentimentTimeSeries: Optional[TimeSeries] = None
+    riskLevelTimeSeries: Optional[TimeSeries] = None
 
     # --- Raw data hashes/versioning for audit ---
+    # sha256 of the period and, per frame, each createdAt day's row count and latest updatedAt.
+    # Changes whenever a document in the period is added, removed or updated.
     rawDataHash: Optional[str] = None
     filtersUsed: Dict[str, Any] = Field(default_factory=dict)
+    # Short hash of filtersUsed; snapshots of the same cohort share it ("" for campus-wide).
+    filtersKey: str = ""
+    # Serialized SpaceSaving/HyperLogLog state, present only when ANALYTICS_AGGREGATION_MODE=sketch,
+    # so snapshots for adjacent periods can be merged without re-reading the reports.
+    sketchState: Optional[Dict[str, Any]] = None
     
     proactiveOutreachSuggestions: List[Dict[str, Any]] = Field(default_factory=list)
 
@@ -92,10 +109,59 @@ class AnalyticsSnapshot(BaseModel):
 
 # --- Request/Input Schemas for triggering analytics ---
 
+class CohortFilters(BaseModel):
+    """
+    Cohort a snapshot is restricted to. Each field takes one value or a list (matched with OR);
+    fields are combined with AND. Student fields select the cohort's students, whose reports and
+    check-ins are then fetched; risk_level restricts the reports themselves.
+    """
+    department: List[str] = Field(default_factory=list)
+    academicYear: List[int] = Field(default_factory=list, validation_alias=AliasChoices("academicYear", "year"))
+    gender: List[str] = Field(default_factory=list)
+    counsellor: List[str] = Field(default_factory=list, description="Counsellor IDs the students are connected to.")
+    risk_level: List[str] = Field(default_factory=list, validation_alias=AliasChoices("risk_level", "riskLevel"))
+
+    @field_validator('*', mode='before')
+    @classmethod
+    def as_sorted_list(cls, v: Any) -> Any:
+        """Scalars become one-item lists; lists are de-duplicated and sorted so equal cohorts compare equal."""
+        if v is None:
+            return []
+        values = v if isinstance(v, (list, tuple, set)) else [v]
+        return sorted(set(values), key=str)
+
+    @field_validator('gender', 'risk_level')
+    @classmethod
+    def lowercase(cls, v: List[str]) -> List[str]:
+        return sorted({item.strip().lower() for item in v})
+
+    def is_empty(self) -> bool:
+        return not any(getattr(self, name) for name in type(self).model_fields)
+
+    class Config:
+        extra = "forbid"
+        populate_by_name = True
+
+class AnalyticsWindow(BaseModel):
+    label: Optional[str] = None
+    period_start: datetime
+    period_end: datetime
+
 class AnalyticsRequest(BaseModel):
     period_start: Optional[datetime] = None
     period_end: Optional[datetime] = None
-    filters: Dict[str, Any] = Field(default_factory=dict)
+    filters: CohortFilters = Field(default_factory=CohortFilters)
+    # Several snapshots from one ingestion pass: explicit windows, and/or rolling windows of these
+    # many days ending at period_end (e.g. [1, 7, 30]). The widest range is fetched once.
+    windows: List[AnalyticsWindow] = Field(default_factory=list)
+    rolling_window_days: List[int] = Field(default_factory=list)
+
+    @field_validator('rolling_window_days')
+    @classmethod
+    def positive_days(cls, v: List[int]) -> List[int]:
+        if any(days <= 0 for days in v):
+            raise ValueError("rolling_window_days must be positive.")
+        return v
 
 class AnalyticsResponse(BaseModel):
     success: bool
@@ -103,6 +169,9 @@ class AnalyticsResponse(BaseModel):
     snapshot_id: Optional[str] = None
     snapshot_version: Optional[str] = None
     data: Optional[AnalyticsSnapshot] = None
+    # One entry per window when the request asked for several.
+    snapshot_ids: List[str] = Field(default_factory=list)
+    snapshot_versions: List[str] = Field(default_factory=list)
 
 # --- Helper schemas for parsing raw AI report content ---
 
@@ -160,7 +229,7 @@ class AIReportFull(BaseModel):
         
         if isinstance(v, dict) and content_key in v and isinstance(v[content_key], str):
             try:
-                return json.loads(v[content_key])
-            except json.JSONDecodeError:
+                return orjson.loads(v[content_key])
+            except orjson.JSONDecodeError:
                 return {}
         return v
\ No newline at end of file
@@ -0,0 +1,126 @@
+# agentic-server/app/services/chain_registry.py
+
+import os
+import time
+import random
+import hashlib
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Type
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel
+
+from app.services.llm_gateway import get_llm, llm_gateway, estimate_tokens, Priority
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Pins a chain to one variant regardless of weights, e.g. "summarizer=v2,pathway=v1".
+CHAIN_VARIANT_OVERRIDES = os.getenv("CHAIN_VARIANT_OVERRIDES", "")
+
+
+def _parse_overrides(spec: str) -> Dict[str, str]:
+    pinned = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, version = item.partition("=")
+        if name and version:
+            pinned[name.strip()] = version.strip()
+    return pinned
+
+
+class ChainVariant:
+    """One compiled prompt | structured-output chain plus its running call statistics."""
+
+    def __init__(self, name: str, version: str, prompt: ChatPromptTemplate, output_schema: Type[BaseModel], llm: Any, weight: float):
+        self.name = name
+        self.version = version
+        self.weight = weight
+        self.chain = prompt | llm.with_structured_output(output_schema)
+        # Fixed instruction text of the template; input-dependent tokens are estimated per call.
+        self.template_tokens = sum(len(getattr(getattr(m, "prompt", None), "template", "")) for m in prompt.messages) // 4
+        self.calls = 0
+        self.failures = 0
+        self.estimated_tokens = 0
+        self.latencies: Deque[float] = deque(maxlen=500)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+
+        def pct(p: float) -> float:
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 3) if latencies else 0.0
+
+        return {
+            "weight": self.weight,
+            "calls": self.calls,
+            "failures": self.failures,
+            "template_tokens": self.template_tokens,
+            "avg_estimated_tokens": round(self.estimated_tokens / self.calls, 1) if self.calls else 0.0,
+            "latency_seconds": {"p50": pct(0.50), "p95": pct(0.95), "samples": len(latencies)},
+        }
+
+
+class ChainRegistry:
+    """
+    Compiles each named chain once, at registration (module import), instead of rebuilding the
+    prompt and the structured-output binding on every request. A name may have several versioned
+    variants; each call picks one by weight (deterministically when a key such as a content hash
+    is given, so retries land on the same variant), or the one pinned in CHAIN_VARIANT_OVERRIDES.
+    Per-variant latency and estimated token cost are kept for comparing variants.
+    """
+
+    def __init__(self, overrides: Optional[Dict[str, str]] = None):
+        self._variants: Dict[str, List[ChainVariant]] = {}
+        self._overrides = overrides if overrides is not None else _parse_overrides(CHAIN_VARIANT_OVERRIDES)
+
+    def register(self, name: str, version: str, prompt: ChatPromptTemplate, output_schema: Type[BaseModel], weight: float = 1.0, llm: Any = None) -> ChainVariant:
+        variants = self._variants.setdefault(name, [])
+        if any(v.version == version for v in variants):
+            raise ValueError(f"Chain '{name}' already has a variant '{version}'.")
+        variant = ChainVariant(name, version, prompt, output_schema, llm or get_llm(), weight)
+        variants.append(variant)
+        logger.info(f"ChainRegistry: compiled '{name}@{version}' (~{variant.template_tokens} template tokens).")
+        return variant
+
+    def select(self, name: str, key: Optional[str] = None) -> ChainVariant:
+        variants = self._variants.get(name)
+        if not variants:
+            raise KeyError(f"No chain registered under '{name}'.")
+        pinned = self._overrides.get(name)
+        if pinned:
+            for variant in variants:
+                if variant.version == pinned:
+                    return variant
+            logger.warning(f"ChainRegistry: pinned variant '{name}@{pinned}' is not registered; using weights.")
+        if len(variants) == 1:
+            return variants[0]
+        total = sum(v.weight for v in variants)
+        if key is None:
+            point = random.uniform(0, total)
+        else:
+            digest = hashlib.sha256(f"{name}:{key}".encode("utf-8")).digest()
+            point = int.from_bytes(digest[:8], "big") / 2 ** 64 * total
+        for variant in variants:
+            point -= variant.weight
+            if point < 0:
+                return variant
+        return variants[-1]
+
+    async def ainvoke(self, name: str, inputs: Dict[str, Any], priority: Priority = Priority.INTERACTIVE, key: Optional[str] = None) -> Any:
+        """Runs the selected variant of `name` through the LLM gateway and records its cost."""
+        variant = self.select(name, key)
+        variant.calls += 1
+        variant.estimated_tokens += estimate_tokens(inputs) + variant.template_tokens
+        started = time.monotonic()
+        try:
+            return await llm_gateway.ainvoke(variant.chain, inputs, priority=priority, name=f"{name}@{variant.version}")
+        except Exception:
+            variant.failures += 1
+            raise
+        finally:
+            variant.latencies.append(time.monotonic() - started)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {name: {v.version: v.stats() for v in variants} for name, variants in self._variants.items()}
+
+
+chain_registry = ChainRegistry()
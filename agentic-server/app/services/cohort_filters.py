@@ -0,0 +1,66 @@
+# agentic-server/app/services/cohort_filters.py
+
+from typing import Any, Dict, List
+
+import pandas as pd
+from bson import ObjectId
+
+from app.services.single_flight import content_key
+
+# CohortFilters field -> students collection field.
+STUDENT_FILTER_FIELDS = {
+    "department": "department",
+    "academicYear": "academicYear",
+    "gender": "gender",
+    "counsellor": "counsellorConnected",
+}
+
+# Manual reports have no risk level, only a priority; "urgent" counts as high risk.
+RISK_LEVEL_PRIORITIES = {"low": ["low"], "medium": ["medium"], "high": ["high", "urgent"], "critical": ["urgent"]}
+
+# Indexes backing the cohort predicates: (collection, keys).
+COHORT_INDEXES = [
+    ("students", [("department", 1), ("academicYear", 1)]),
+    ("students", [("counsellorConnected", 1)]),
+    ("reports", [("owner", 1), ("createdAt", 1)]),
+    ("reports", [("priority", 1), ("createdAt", 1)]),
+    ("aireports", [("student", 1), ("createdAt", 1)]),
+    ("studentcheckins", [("student", 1), ("createdAt", 1)]),
+]
+
+
+def filters_key(filters: Dict[str, Any]) -> str:
+    """Short stable key for a normalised filter set; "" for campus-wide."""
+    return content_key(filters)[:16] if filters else ""
+
+
+def _object_id(value: str) -> Any:
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+
+def student_query(filters: Dict[str, Any]) -> Dict[str, Any]:
+    """Students collection predicate for the cohort's student fields; {} when none are set."""
+    query: Dict[str, Any] = {}
+    for name, field in STUDENT_FILTER_FIELDS.items():
+        values: List[Any] = filters.get(name) or []
+        if name == "counsellor":
+            values = [_object_id(v) for v in values]
+        if values:
+            query[field] = {"$in": values}
+    return query
+
+
+def report_priorities(filters: Dict[str, Any]) -> List[str]:
+    return sorted({p for level in filters.get("risk_level") or [] for p in RISK_LEVEL_PRIORITIES.get(level, [level])})
+
+
+def filter_ai_reports_frame(ai_reports_df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Applies the risk-level filter to AI reports. Their risk level lives inside the JSON string Mongo
+    stores, so unlike every other cohort predicate it can only be applied after parsing.
+    """
+    levels = filters.get("risk_level")
+    if not levels or ai_reports_df is None or ai_reports_df.empty or "risk_level" not in ai_reports_df.columns:
+        return ai_reports_df
+    mask = ai_reports_df["risk_level"].astype("string").str.lower().isin(levels).fillna(False).astype(bool)
+    return ai_reports_df[mask].reset_index(drop=True)
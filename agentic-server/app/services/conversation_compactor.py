@@ -0,0 +1,173 @@
+# agentic-server/app/services/conversation_compactor.py
+
+import os
+import re
+import asyncio
+from typing import List, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+from pydantic import BaseModel, Field
+
+from app.services.chain_registry import chain_registry
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Conversations at or below this many tokens (after dedupe) are analysed as-is.
+COMPACTION_TOKEN_BUDGET = int(os.getenv("COMPACTION_TOKEN_BUDGET", "6000"))
+# Size of each chunk handed to the chunk summarizer.
+COMPACTION_CHUNK_TOKENS = int(os.getenv("COMPACTION_CHUNK_TOKENS", "2000"))
+COMPACTION_MAX_LEVELS = int(os.getenv("COMPACTION_MAX_LEVELS", "3"))
+
+_SPEAKER_RE = re.compile(r"^\s*(student|chatbot|user|assistant|bot|counsel+or)\s*:", re.IGNORECASE | re.MULTILINE)
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]+")
+
+# Turns mentioning any of these are risk-relevant and always kept verbatim.
+_RISK_RE = re.compile(
+    r"suicid|kill (my|him|her)self|killing myself|end (it|my life|things)|take my (own )?life|want to die|"
+    r"better off dead|no reason to live|don'?t want to (live|be here|wake up)|can'?t go on|self[- ]?harm|"
+    r"hurt(ing)? myself|cutting|overdos|pills|hopeless|worthless|no way out|give up on everything|"
+    r"abuse|abused|assault|unsafe at home|panic attack|haven'?t (slept|eaten)|starving myself|"
+    r"goodbye forever|nobody would (care|miss)",
+    re.IGNORECASE,
+)
+
+# Chatbot filler that carries no information about the student.
+_BOILERPLATE = {
+    "hello how can i help you today", "hi how can i help you today", "how can i help you today",
+    "i am here to listen", "i m here to listen", "i m here for you", "i am here for you",
+    "thank you for sharing", "thanks for sharing", "tell me more", "can you tell me more",
+    "i understand", "i see", "ok", "okay", "hmm", "thanks", "thank you",
+}
+
+TURN_SEPARATOR = "\n\n"
+
+
+def count_tokens(text: str) -> int:
+    """Local token estimate: each word costs ~1 token per 4 characters, punctuation 1."""
+    return sum((len(piece) + 3) // 4 for piece in _PIECE_RE.findall(text))
+
+
+def split_turns(conversation: str) -> List[str]:
+    """Splits on speaker prefixes ("Student: ...", "Chatbot: ..."), falling back to blank lines."""
+    starts = [m.start() for m in _SPEAKER_RE.finditer(conversation)]
+    if not starts:
+        return [p.strip() for p in conversation.split(TURN_SEPARATOR) if p.strip()]
+    if starts[0] > 0 and conversation[:starts[0]].strip():
+        starts.insert(0, 0)
+    starts.append(len(conversation))
+    return [conversation[a:b].strip() for a, b in zip(starts, starts[1:]) if conversation[a:b].strip()]
+
+
+def is_risk_relevant(turn: str) -> bool:
+    return bool(_RISK_RE.search(turn))
+
+
+def _body(turn: str) -> str:
+    return _NORMALIZE_RE.sub(" ", _SPEAKER_RE.sub("", turn, count=1).lower()).strip()
+
+
+def dedupe_turns(turns: List[str]) -> List[str]:
+    """Drops boilerplate and repeated turns (keeping the first), never a risk-relevant turn."""
+    kept, seen = [], set()
+    for turn in turns:
+        if is_risk_relevant(turn):
+            kept.append(turn)
+            continue
+        body = _body(turn)
+        if not body or body in _BOILERPLATE or body in seen:
+            continue
+        seen.add(body)
+        kept.append(turn)
+    return kept
+
+
+class ChunkSummaryOutput(BaseModel):
+    summary: str = Field(..., description="Concise third-person summary of this part of the conversation.")
+
+
+CHUNK_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You are summarizing one part of a long conversation between a student and a mental health support chatbot, so that it can later be analyzed as a whole.
+    Keep every stressor, concern, symptom (sleep, appetite, mood, anxiety), life event, coping strategy and change in the student's emotional state, with concrete details such as exams, people and timeframes.
+    Do not interpret, diagnose or add advice. Write in the third person ("The student ...")."""),
+    ("user", "Conversation part:\n\n{chunk}")
+])
+
+chain_registry.register("conversation_chunk_summary", "v1", CHUNK_SUMMARY_PROMPT, ChunkSummaryOutput)
+
+
+# A compacted conversation is a sequence of (is_verbatim, text) segments in conversation order.
+Segment = Tuple[bool, str]
+
+
+def _chunk(segments: List[Segment], chunk_tokens: int) -> List[Segment]:
+    """Groups consecutive non-verbatim segments into chunks of about `chunk_tokens`; verbatim ones stay as they are."""
+    grouped: List[Segment] = []
+    buffer: List[str] = []
+    size = 0
+    for verbatim, text in segments:
+        tokens = count_tokens(text)
+        if verbatim or (buffer and size + tokens > chunk_tokens):
+            if buffer:
+                grouped.append((False, TURN_SEPARATOR.join(buffer)))
+                buffer, size = [], 0
+        if verbatim:
+            grouped.append((True, text))
+        else:
+            buffer.append(text)
+            size += tokens
+    if buffer:
+        grouped.append((False, TURN_SEPARATOR.join(buffer)))
+    return grouped
+
+
+def _render(segments: List[Segment]) -> str:
+    return TURN_SEPARATOR.join(text if verbatim else f"[Summary of earlier turns] {text}" for verbatim, text in segments)
+
+
+async def _summarize(text: str) -> str:
+    result = await chain_registry.ainvoke("conversation_chunk_summary", {"chunk": text}, key=text)
+    return result.summary
+
+
+async def compact_conversation(conversation: str, budget: Optional[int] = None, chunk_tokens: Optional[int] = None) -> str:
+    """
+    Returns the conversation to analyse. Boilerplate and repeated turns are always dropped; if the
+    rest still exceeds `budget` tokens, non-risk turns are chunked and summarized in parallel, and
+    the summaries are re-chunked and summarized again (up to COMPACTION_MAX_LEVELS) until the digest
+    fits. Risk-relevant turns stay verbatim and in place throughout.
+    """
+    budget = budget or COMPACTION_TOKEN_BUDGET
+    chunk_tokens = chunk_tokens or COMPACTION_CHUNK_TOKENS
+    turns = split_turns(conversation)
+    kept = dedupe_turns(turns)
+    compacted = TURN_SEPARATOR.join(kept)
+    original_tokens = count_tokens(conversation)
+    tokens = count_tokens(compacted)
+    if tokens <= budget:
+        if len(kept) < len(turns):
+            logger.info(f"Compactor: dropped {len(turns) - len(kept)} repeated/boilerplate turns ({original_tokens} -> {tokens} tokens).")
+        return compacted
+
+    segments: List[Segment] = [(is_risk_relevant(turn), turn) for turn in kept]
+    try:
+        for level in range(1, COMPACTION_MAX_LEVELS + 1):
+            segments = _chunk(segments, chunk_tokens)
+            pending = [i for i, (verbatim, _) in enumerate(segments) if not verbatim]
+            summaries = await asyncio.gather(*(_summarize(segments[i][1]) for i in pending))
+            for i, summary in zip(pending, summaries):
+                segments[i] = (False, summary)
+            tokens = count_tokens(_render(segments))
+            logger.info(f"Compactor: level {level} summarized {len(pending)} chunks -> {tokens} tokens.")
+            if tokens <= budget or len(pending) <= 1:
+                break
+    except Exception as e:
+        # Analysing the full deduped conversation is slower but still correct.
+        logger.error(f"Compactor: chunk summarization failed, using the deduped conversation: {e}", exc_info=True)
+        return compacted
+
+    digest = _render(segments)
+    verbatim_turns = sum(1 for verbatim, _ in segments if verbatim)
+    logger.info(f"Compactor: {original_tokens} -> {count_tokens(digest)} tokens, {verbatim_turns} risk-relevant turns kept verbatim.")
+    return digest
@@ -2,6 +2,8 @@
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 from app.db.connect import get_db
+from app.services.frame_cache import marker_time
+from app.services.cohort_filters import COHORT_INDEXES, report_priorities, student_query
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
@@ -26,37 +28,65 @@ class DataFetcher:
         # Add other ObjectId fields as necessary
         return doc
 
-    def fetch_all_reports(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Fetches all manual reports, optionally filtered by date range."""
-        query = {}
+    def ensure_indexes(self) -> None:
+        """Creates the indexes the cohort predicates rely on; a no-op for indexes that already exist."""
+        for collection, keys in COHORT_INDEXES:
+            self.db[collection].create_index(keys)
+        logger.info(f"Ensured {len(COHORT_INDEXES)} cohort indexes.")
+
+    def cohort_predicates(self, filters: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-collection predicates restricting a fetch to a cohort (normalised CohortFilters), keyed by
+        collection name. Student fields are resolved once to the matching student IDs, which the
+        owner/student indexes of reports, AI reports and check-ins then serve. Empty for campus-wide.
+        """
+        predicates: Dict[str, Dict[str, Any]] = {}
+        if not filters:
+            return predicates
+        students = student_query(filters)
+        if students:
+            student_ids = [doc["_id"] for doc in self.students_collection.find(students, {"_id": 1})]
+            logger.info(f"Cohort {filters} resolved to {len(student_ids)} students.")
+            predicates["students"] = students
+            predicates["reports"] = {"owner": {"$in": student_ids}}
+            predicates["aireports"] = {"student": {"$in": student_ids}}
+            predicates["studentcheckins"] = {"student": {"$in": student_ids}}
+        priorities = report_priorities(filters)
+        if priorities:
+            predicates.setdefault("reports", {})["priority"] = {"$in": priorities}
+        return predicates
+
+    @staticmethod
+    def _date_range_query(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, predicate: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """createdAt filter for the half-open period [start_date, end_date); the frame cache uses the same convention."""
+        query: Dict[str, Any] = dict(predicate or {})
         if start_date or end_date:
             query['createdAt'] = {}
             if start_date:
                 query['createdAt']['$gte'] = start_date
             if end_date:
-                query['createdAt']['$lte'] = end_date
-        
+                query['createdAt']['$lt'] = end_date
+        return query
+
+    def fetch_all_reports(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, cohort: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Fetches all manual reports, optionally filtered by date range [start_date, end_date) and cohort."""
+        query = self._date_range_query(start_date, end_date, (cohort or {}).get("reports"))
+
         logger.info(f"Fetching manual reports with query: {query}")
         reports = list(self.reports_collection.find(query))
         return [self._convert_object_id_to_str(report) for report in reports]
 
-    def fetch_all_ai_reports(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Fetches all AI reports, optionally filtered by date range."""
-        query = {}
-        if start_date or end_date:
-            query['createdAt'] = {}
-            if start_date:
-                query['createdAt']['$gte'] = start_date
-            if end_date:
-                query['createdAt']['$lte'] = end_date
+    def fetch_all_ai_reports(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, cohort: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Fetches all AI reports, optionally filtered by date range [start_date, end_date) and cohort."""
+        query = self._date_range_query(start_date, end_date, (cohort or {}).get("aireports"))
 
         logger.info(f"Fetching AI reports with query: {query}")
         ai_reports = list(self.aireports_collection.find(query))
         return [self._convert_object_id_to_str(report) for report in ai_reports]
 
-    def fetch_all_students(self) -> List[Dict[str, Any]]:
-        """Fetches all student data."""
-        students = list(self.students_collection.find({}))
+    def fetch_all_students(self, cohort: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Fetches all student data, or the cohort's students."""
+        students = list(self.students_collection.find((cohort or {}).get("students", {})))
         return [self._convert_object_id_to_str(student) for student in students]
 
     def fetch_all_counsellors(self) -> List[Dict[str, Any]]:
@@ -68,17 +98,29 @@ class DataFetcher:
         """Fetches all volunteer data."""
         volunteers = list(self.volunteers_collection.find({}))
         return [self._convert_object_id_to_str(volunteer) for volunteer in volunteers]
-    
-    def fetch_all_checkins(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Dict[str, Any]]:
-        """Fetches all student check-ins, optionally filtered by date range."""
-        query = {}
-        if start_date or end_date:
-            query['createdAt'] = {}
-            if start_date:
-                query['createdAt']['$gte'] = start_date
-            if end_date:
-                query['createdAt']['$lte'] = end_date
-        
+
+    def fetch_all_checkins(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, cohort: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Fetches all student check-ins, optionally filtered by date range [start_date, end_date) and cohort."""
+        query = self._date_range_query(start_date, end_date, (cohort or {}).get("studentcheckins"))
+
         logger.info(f"Fetching student check-ins with query: {query}")
         checkins = list(self.db["studentcheckins"].find(query))
-        return [self._convert_object_id_to_str(checkin) for checkin in checkins]
\ No newline at end of file
+        return [self._convert_object_id_to_str(checkin) for checkin in checkins]
+
+    def fetch_daily_markers(self, collection_name: str, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None, cohort: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-day document count and latest updatedAt for a collection, keyed by createdAt day (UTC).
+        A cheap server-side aggregation the frame cache uses to spot days that changed after they were cached.
+        """
+        pipeline = [
+            {"$match": self._date_range_query(start_date, end_date, (cohort or {}).get(collection_name))},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}},
+                "rows": {"$sum": 1},
+                "max_updated_at": {"$max": "$updatedAt"},
+            }},
+        ]
+        return {
+            doc["_id"]: {"rows": int(doc["rows"]), "max_updated_at": marker_time(doc.get("max_updated_at"))}
+            for doc in self.db[collection_name].aggregate(pipeline)
+        }
@@ -0,0 +1,143 @@
+# agentic-server/app/services/fixtures.py
+
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import importlib
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from pydantic import BaseModel
+
+from app.services.single_flight import content_key
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# off: live calls. record: fixtures on disk are replayed, anything missing is called live and
+# stored. replay: fixtures only, a missing one is an error (no provider is contacted).
+FIXTURES_MODE = os.getenv("FIXTURES_MODE", "off").lower()
+FIXTURES_DIR = os.getenv("FIXTURES_DIR", "fixtures")
+# Replayed calls sleep for their recorded latency times this factor (0 = instant), +/- jitter.
+FIXTURES_LATENCY_SCALE = float(os.getenv("FIXTURES_LATENCY_SCALE", "1.0"))
+FIXTURES_LATENCY_JITTER = float(os.getenv("FIXTURES_LATENCY_JITTER", "0.1"))
+# Share of replayed calls that fail with a retryable provider-style error instead.
+FIXTURES_ERROR_RATE = float(os.getenv("FIXTURES_ERROR_RATE", "0.0"))
+FIXTURES_SEED = os.getenv("FIXTURES_SEED")
+
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9_.@-]+")
+
+
+class FixtureMissingError(LookupError):
+    """Raised in replay mode for a call that was never recorded."""
+
+
+class InjectedFixtureError(RuntimeError):
+    """A replayed call failing on purpose; worded like a provider outage so the usual retries apply."""
+
+
+def _encode(result: Any) -> Dict[str, Any]:
+    if isinstance(result, BaseModel):
+        cls = type(result)
+        return {"model": f"{cls.__module__}:{cls.__qualname__}", "data": result.model_dump(mode="json")}
+    return {"model": None, "data": json.loads(json.dumps(result, default=str))}
+
+
+def _decode(payload: Dict[str, Any]) -> Any:
+    if not payload.get("model"):
+        return payload["data"]
+    module_name, _, qualname = payload["model"].partition(":")
+    cls: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        cls = getattr(cls, part)
+    return cls.model_validate(payload["data"])
+
+
+class FixtureStore:
+    """
+    Record/replay for outbound LLM chain and search tool calls, so the report, pathway and
+    analytics pipelines can be load-tested without provider quota. A call is identified by its
+    kind ("llm" or "tool"), name ("summarizer@v1", "tavily_search") and a hash of its inputs, and
+    stored as one JSON file under FIXTURES_DIR/<kind>/<name>/ together with its observed latency.
+    Replay can scale that latency and inject failures at FIXTURES_ERROR_RATE.
+    """
+
+    def __init__(self, mode: str = FIXTURES_MODE, root_dir: str = FIXTURES_DIR, latency_scale: float = FIXTURES_LATENCY_SCALE,
+                 jitter: float = FIXTURES_LATENCY_JITTER, error_rate: float = FIXTURES_ERROR_RATE, seed: Optional[str] = FIXTURES_SEED):
+        if mode not in ("off", "record", "replay"):
+            raise ValueError(f"FIXTURES_MODE must be off, record or replay, not '{mode}'.")
+        self.mode = mode
+        self.root_dir = root_dir
+        self.latency_scale = latency_scale
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._counters: Dict[str, int] = {"replayed": 0, "recorded": 0, "missing": 0, "injected_errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def path(self, kind: str, name: str, inputs: Any) -> str:
+        key = content_key(kind, name, inputs)[:32]
+        return os.path.join(self.root_dir, kind, _UNSAFE_CHARS.sub("_", name), f"{key}.json")
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: str, fixture: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(fixture, f, ensure_ascii=False, indent=1, default=str)
+        os.replace(tmp_path, path)
+
+    async def _replay(self, name: str, fixture: Dict[str, Any]) -> Any:
+        delay = fixture.get("latency_seconds", 0.0) * self.latency_scale
+        if delay > 0:
+            await asyncio.sleep(max(0.0, delay * (1 + self._random.uniform(-self.jitter, self.jitter))))
+        if self.error_rate and self._random.random() < self.error_rate:
+            self._counters["injected_errors"] += 1
+            raise InjectedFixtureError(f"503 UNAVAILABLE: injected failure replaying '{name}'.")
+        self._counters["replayed"] += 1
+        return _decode(fixture["result"])
+
+    async def call(self, kind: str, name: str, inputs: Any, live: Callable[[], Awaitable[Any]]) -> Any:
+        """`live()` in off mode; otherwise the stored result for (kind, name, inputs), recording it first if allowed."""
+        if not self.enabled:
+            return await live()
+        path = self.path(kind, name, inputs)
+        fixture = await asyncio.to_thread(self._read, path)
+        if fixture is not None:
+            return await self._replay(name, fixture)
+        if self.mode == "replay":
+            self._counters["missing"] += 1
+            raise FixtureMissingError(f"No {kind} fixture for '{name}' at {path}; record it with FIXTURES_MODE=record.")
+
+        started = time.monotonic()
+        result = await live()
+        fixture = {
+            "kind": kind,
+            "name": name,
+            "inputs": inputs,
+            "latency_seconds": round(time.monotonic() - started, 4),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "result": _encode(result),
+        }
+        await asyncio.to_thread(self._write, path, fixture)
+        self._counters["recorded"] += 1
+        logger.info(f"FixtureStore: recorded {kind} '{name}' ({fixture['latency_seconds']:.2f}s).")
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "root_dir": self.root_dir, **self._counters}
+
+
+fixture_store = FixtureStore()
@@ -0,0 +1,459 @@
+# agentic-server/app/services/frame_cache.py
+
+import os
+import json
+import shutil
+import tempfile
+import threading
+import functools
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Any, Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as pa_ds
+import pyarrow.parquet as pq
+from pyarrow.fs import LocalFileSystem
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Frames produced by data_preprocessing_agent that are worth persisting.
+CACHED_FRAMES = ("reports_df", "ai_reports_df", "checkins_df")
+
+# Bump whenever data_preprocessing_agent changes the columns or dtypes of the cached frames;
+# manifests written under another version are treated as a cache miss and rewritten.
+FRAME_SCHEMA_VERSION = 2
+
+# Low-cardinality string columns stored as Arrow dictionaries / pandas categoricals.
+CATEGORICAL_COLUMNS = ("sentiment", "risk_level", "status")
+
+PARTITION_COLUMN = "day"
+TIMESTAMP_COLUMN = "createdAt"
+UPDATED_COLUMN = "updatedAt"
+MANIFEST_FILE = "_manifest.json"  # Leading underscore keeps it out of the Arrow dataset scan.
+
+_DICTIONARY_TYPE = pa.dictionary(pa.int32(), pa.string())
+_DAY_PARTITIONING = pa_ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive")
+
+# Parquet files carry no pandas metadata once schemas are unified; map the nullable ints back explicitly.
+_PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(),
+}
+
+# One lock per frame directory, shared by every FrameCache (scoped caches are separate instances).
+# Analytics requests write and read frames on worker threads; a frame's manifest read-modify-write
+# and its partition rewrites must not interleave with another writer or with a reader.
+_FRAME_LOCKS: Dict[str, threading.RLock] = {}
+_FRAME_LOCKS_GUARD = threading.Lock()
+
+
+def _frame_lock(frame_dir: str) -> threading.RLock:
+    key = os.path.abspath(frame_dir)
+    with _FRAME_LOCKS_GUARD:
+        return _FRAME_LOCKS.setdefault(key, threading.RLock())
+
+
+def _holding_frame_lock(method):
+    """Runs a FrameCache method whose first argument is a frame name under that frame's lock."""
+    @functools.wraps(method)
+    def wrapper(self, name, *args, **kwargs):
+        with _frame_lock(self._frame_dir(name)):
+            return method(self, name, *args, **kwargs)
+    return wrapper
+
+
+# Per-day source markers: {"YYYY-MM-DD": {"rows": int, "max_updated_at": iso string or None}}.
+DayMarkers = Dict[str, Dict[str, Any]]
+
+
+def naive_utc(value: Optional[datetime]) -> Optional[pd.Timestamp]:
+    """MongoDB hands back naive UTC datetimes; normalise request bounds to match."""
+    if value is None:
+        return None
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(timezone.utc).tz_localize(None)
+    return ts
+
+
+def slice_period(df: Optional[pd.DataFrame], period_start: Optional[datetime], period_end: Optional[datetime], column: str = TIMESTAMP_COLUMN) -> Optional[pd.DataFrame]:
+    """
+    Rows of `df` with `column` in [period_start, period_end), found by binary search, so `df`
+    must already be sorted by `column`. Frames without the column are returned unchanged.
+    """
+    if df is None or df.empty or column not in df.columns:
+        return df
+    values = df[column]
+    tz = getattr(values.dt, "tz", None)
+
+    def bound(value: Optional[datetime]) -> Optional[pd.Timestamp]:
+        if value is None:
+            return None
+        ts = naive_utc(value)
+        return ts.tz_localize(timezone.utc).tz_convert(tz) if tz is not None else ts
+
+    start, end = bound(period_start), bound(period_end)
+    lo = 0 if start is None else int(values.searchsorted(start, side="left"))
+    hi = len(df) if end is None else int(values.searchsorted(end, side="left"))
+    return df.iloc[lo:max(lo, hi)]
+
+
+def _day_key(day: pd.Timestamp) -> str:
+    return day.strftime("%Y-%m-%d")
+
+
+def marker_time(value: Any) -> Optional[str]:
+    """Millisecond ISO string for an updatedAt marker, matching what MongoDB stores and returns."""
+    ts = naive_utc(value) if value is not None and not pd.isna(value) else None
+    return ts.isoformat(timespec="milliseconds") if ts is not None else None
+
+
+def daily_markers(df: Optional[pd.DataFrame]) -> DayMarkers:
+    """Row count and latest updatedAt per createdAt day, the same markers DataFetcher.fetch_daily_markers returns."""
+    if df is None or df.empty or TIMESTAMP_COLUMN not in df.columns:
+        return {}
+    days = pd.to_datetime(df[TIMESTAMP_COLUMN]).dt.strftime("%Y-%m-%d")
+    rows = days.value_counts()
+    if UPDATED_COLUMN in df.columns:
+        latest = pd.to_datetime(df[UPDATED_COLUMN]).groupby(days).max()
+    else:
+        latest = pd.Series(dtype="datetime64[ns]")
+    return {
+        day: {"rows": int(count), "max_updated_at": marker_time(latest.get(day))}
+        for day, count in rows.items()
+    }
+
+
+def _same_day(cached: Optional[Dict[str, Any]], source: Optional[Dict[str, Any]]) -> bool:
+    """Compares a manifest day entry with a source marker; a missing marker means the day has no rows."""
+    if cached is None:
+        return False
+    source = source or {"rows": 0, "max_updated_at": None}
+    return cached.get("rows") == source.get("rows") and cached.get("max_updated_at") == source.get("max_updated_at")
+
+
+def to_arrow_table(df: pd.DataFrame) -> Tuple[pa.Table, List[str]]:
+    """
+    Makes a preprocessed frame Arrow-compatible: nested dicts are stored as JSON strings,
+    stray non-string scalars (e.g. ObjectId) as strings, and the low-cardinality columns as dictionaries.
+    """
+    df = df.copy()
+    json_columns: List[str] = []
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = df[col].astype("category")
+            continue
+        if df[col].dtype != object:
+            continue
+        non_null = df[col].dropna()
+        if non_null.map(lambda v: isinstance(v, dict)).any():
+            df[col] = df[col].map(lambda v: json.dumps(v, default=str) if isinstance(v, (dict, list)) else v)
+            json_columns.append(col)
+            continue
+        try:
+            pa.array(df[col], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            df[col] = df[col].map(lambda v: json.dumps(v, default=str) if v is not None else None)
+            json_columns.append(col)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # One dictionary type for every partition, whatever index width or (all-null) category dtype pandas picked.
+    for i, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type) and field.type != _DICTIONARY_TYPE:
+            table = table.set_column(i, field.name, table.column(i).cast(_DICTIONARY_TYPE))
+    return table, json_columns
+
+
+class FrameCache:
+    """
+    Day-partitioned Parquet cache for the preprocessed analytics DataFrames.
+
+    Layout: <root>/<frame_name>/day=YYYY-MM-DD/*.parquet plus a per-frame manifest
+    recording which days have been fully captured (including days with no rows),
+    so readers can tell "no data" apart from "not cached". Each day entry keeps the
+    row count and latest updatedAt it was built from, so a reader can check it
+    against MongoDB before trusting it.
+
+    Periods are half-open, [period_start, period_end), the same convention DataFetcher uses.
+    """
+
+    def __init__(self, root_dir: Optional[str] = None, schema_version: int = FRAME_SCHEMA_VERSION):
+        self.root_dir = root_dir if root_dir is not None else os.getenv("ANALYTICS_FRAME_CACHE_DIR", "")
+        self.schema_version = schema_version
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root_dir)
+
+    def scoped(self, key: str) -> "FrameCache":
+        """The cache for one cohort (see cohort_filters.filters_key), kept apart from the campus-wide frames."""
+        if not key or not self.enabled:
+            return self
+        return FrameCache(os.path.join(self.root_dir, f"cohort={key}"), self.schema_version)
+
+    # ---------------- Manifest ---------------- #
+
+    def _frame_dir(self, name: str) -> str:
+        return os.path.join(self.root_dir, name)
+
+    def _empty_manifest(self) -> Dict[str, Any]:
+        return {"schema_version": self.schema_version, "days": {}, "json_columns": []}
+
+    def _read_manifest(self, name: str) -> Dict[str, Any]:
+        """The frame's manifest; a missing, unreadable or other-version manifest reads as empty."""
+        path = os.path.join(self._frame_dir(name), MANIFEST_FILE)
+        if not os.path.exists(path):
+            return self._empty_manifest()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"FrameCache: unreadable manifest for '{name}' ({e}); treating as empty.")
+            return self._empty_manifest()
+        if not isinstance(manifest, dict) or manifest.get("schema_version") != self.schema_version:
+            return self._empty_manifest()
+        manifest.setdefault("days", {})
+        manifest.setdefault("json_columns", [])
+        return manifest
+
+    def _write_manifest(self, name: str, manifest: Dict[str, Any]) -> None:
+        frame_dir = self._frame_dir(name)
+        fd, tmp_path = tempfile.mkstemp(dir=frame_dir, prefix="_manifest-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(manifest, f, sort_keys=True)
+            os.replace(tmp_path, os.path.join(frame_dir, MANIFEST_FILE))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    # ---------------- Day arithmetic ---------------- #
+
+    @staticmethod
+    def _complete_days(period_start: Optional[pd.Timestamp], period_end: Optional[pd.Timestamp], df: pd.DataFrame) -> List[pd.Timestamp]:
+        """Days whose full 24h span lies inside [period_start, period_end). Partial edge days are never cached."""
+        if df.empty and (period_start is None or period_end is None):
+            return []
+        first = period_start.ceil("D") if period_start is not None else df[TIMESTAMP_COLUMN].min().floor("D")
+        last_exclusive = period_end.floor("D") if period_end is not None else df[TIMESTAMP_COLUMN].max().floor("D")
+        if period_end is None:
+            # Without an upper bound the newest day may still be receiving documents.
+            last_exclusive = min(last_exclusive, pd.Timestamp.now(tz="UTC").tz_localize(None).floor("D"))
+        return list(pd.date_range(first, last_exclusive - timedelta(days=1), freq="D"))
+
+    @staticmethod
+    def _needed_days(period_start: pd.Timestamp, period_end: pd.Timestamp) -> List[pd.Timestamp]:
+        """Days intersecting [period_start, period_end)."""
+        return list(pd.date_range(period_start.floor("D"), (period_end - pd.Timedelta(microseconds=1)).floor("D"), freq="D"))
+
+    # ---------------- Write path ---------------- #
+
+    @_holding_frame_lock
+    def write_frame(self, name: str, df: pd.DataFrame, period_start: Optional[datetime] = None, period_end: Optional[datetime] = None) -> int:
+        """
+        Persists the complete days of `df` that fall inside the period, replacing any previously
+        cached partitions for those days. Days whose manifest markers already match the frame are
+        left alone. Holds the frame's lock throughout, so concurrent writers and readers of the same
+        frame take turns. Blocking file I/O: call it off the event loop. Returns the number of days written.
+        """
+        if not self.enabled:
+            return 0
+        if not df.empty and TIMESTAMP_COLUMN not in df.columns:
+            logger.warning(f"FrameCache: '{name}' has no {TIMESTAMP_COLUMN} column; skipping.")
+            return 0
+
+        start, end = naive_utc(period_start), naive_utc(period_end)
+        days = self._complete_days(start, end, df)
+        if not days:
+            return 0
+
+        frame_dir = self._frame_dir(name)
+        manifest = self._read_manifest(name)
+        if not manifest["days"] and os.path.isdir(frame_dir):
+            # Nothing trustworthy on disk (other schema version, corrupt or missing manifest): start over.
+            shutil.rmtree(frame_dir, ignore_errors=True)
+        os.makedirs(frame_dir, exist_ok=True)
+
+        markers = daily_markers(df)
+        day_keys = [key for key in map(_day_key, days) if not _same_day(manifest["days"].get(key), markers.get(key))]
+        if not day_keys:
+            logger.info(f"FrameCache: '{name}' already cached and unchanged for all {len(days)} complete day(s).")
+            return 0
+
+        if not df.empty:
+            df = df.assign(**{PARTITION_COLUMN: df[TIMESTAMP_COLUMN].dt.strftime("%Y-%m-%d")})
+            df = df[df[PARTITION_COLUMN].isin(day_keys)]
+
+        if not df.empty:
+            table, json_columns = to_arrow_table(df)
+            pq.write_to_dataset(
+                table,
+                root_path=frame_dir,
+                partition_cols=[PARTITION_COLUMN],
+                existing_data_behavior="delete_matching",
+            )
+            manifest["json_columns"] = sorted(set(manifest["json_columns"]) | set(json_columns))
+
+        written_at = datetime.now(timezone.utc).isoformat()
+        for key in day_keys:
+            marker = markers.get(key, {"rows": 0, "max_updated_at": None})
+            if marker["rows"] == 0:
+                # The day is now known to be empty; drop whatever an earlier run left behind.
+                shutil.rmtree(os.path.join(frame_dir, f"{PARTITION_COLUMN}={key}"), ignore_errors=True)
+            manifest["days"][key] = {**marker, "written_at": written_at}
+
+        self._write_manifest(name, manifest)
+        logger.info(f"FrameCache: wrote {len(day_keys)} of {len(days)} complete day(s) of '{name}' ({len(df)} rows).")
+        return len(day_keys)
+
+    def write_frames(self, frames: Dict[str, pd.DataFrame], period_start: Optional[datetime] = None, period_end: Optional[datetime] = None) -> None:
+        for name, df in frames.items():
+            if df is None:
+                continue
+            self.write_frame(name, df, period_start=period_start, period_end=period_end)
+
+    # ---------------- Read path ---------------- #
+
+    @_holding_frame_lock
+    def covers(self, name: str, period_start: Optional[datetime], period_end: Optional[datetime], source_markers: Optional[DayMarkers] = None) -> bool:
+        """
+        True when every day intersecting [period_start, period_end) has been captured for `name`
+        and, if `source_markers` is given, still matches the source's per-day count and latest updatedAt.
+        """
+        if not self.enabled or period_start is None or period_end is None:
+            return False
+        cached_days = self._read_manifest(name)["days"]
+        needed = [_day_key(d) for d in self._needed_days(naive_utc(period_start), naive_utc(period_end))]
+        if not needed or not all(key in cached_days for key in needed):
+            return False
+        if source_markers is None:
+            return True
+        stale = [key for key in needed if not _same_day(cached_days[key], source_markers.get(key))]
+        if stale:
+            logger.info(f"FrameCache: '{name}' is stale for {len(stale)} day(s) (first: {stale[0]}).")
+        return not stale
+
+    @_holding_frame_lock
+    def read_table(self, name: str, period_start: Optional[datetime] = None, period_end: Optional[datetime] = None, columns: Optional[List[str]] = None) -> Optional[pa.Table]:
+        """
+        Memory-mapped Arrow read of `name`, pruned to the requested columns and to the day
+        partitions overlapping [period_start, period_end). Partitions are read under one schema
+        unified across their files, so a column that is all-null on some days does not break the scan.
+        Returns None if no partition files match; read errors propagate.
+        """
+        frame_dir = self._frame_dir(name)
+        if not self.enabled or not os.path.isdir(frame_dir):
+            return None
+
+        filesystem = LocalFileSystem(use_mmap=True)
+        dataset = pa_ds.dataset(frame_dir, format="parquet", partitioning=_DAY_PARTITIONING, filesystem=filesystem)
+
+        day = pa_ds.field(PARTITION_COLUMN)
+        day_filter = None
+        start, end = naive_utc(period_start), naive_utc(period_end)
+        if start is not None:
+            day_filter = day >= _day_key(start.floor("D"))
+        if end is not None:
+            upper = day <= _day_key((end - pd.Timedelta(microseconds=1)).floor("D"))
+            day_filter = upper if day_filter is None else day_filter & upper
+
+        fragments = list(dataset.get_fragments(filter=day_filter))
+        if not fragments:
+            return None
+        unified = pa.unify_schemas([fragment.physical_schema for fragment in fragments], promote_options="permissive")
+        unified = unified.append(pa.field(PARTITION_COLUMN, pa.string())).remove_metadata()
+        dataset = pa_ds.dataset(frame_dir, schema=unified, format="parquet", partitioning=_DAY_PARTITIONING, filesystem=filesystem)
+
+        read_columns = None
+        if columns is not None:
+            read_columns = [c for c in dict.fromkeys([*columns, TIMESTAMP_COLUMN]) if c in unified.names]
+        return dataset.to_table(columns=read_columns, filter=day_filter)
+
+    @_holding_frame_lock
+    def read_frame(self, name: str, period_start: Optional[datetime] = None, period_end: Optional[datetime] = None, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Pandas view of `read_table`, trimmed to [period_start, period_end) and with JSON columns decoded.
+        An empty frame means the cached days hold no rows; missing or mismatched files raise.
+        """
+        manifest = self._read_manifest(name)
+        table = self.read_table(name, period_start=period_start, period_end=period_end, columns=columns)
+        if table is None:
+            start, end = naive_utc(period_start), naive_utc(period_end)
+            if start is not None and end is not None:
+                expected = sum(manifest["days"].get(_day_key(d), {}).get("rows", 0) for d in self._needed_days(start, end))
+                if expected:
+                    raise FileNotFoundError(f"FrameCache: manifest for '{name}' lists {expected} row(s) but no partition files were found.")
+            return pd.DataFrame()
+        if TIMESTAMP_COLUMN not in table.column_names:
+            raise ValueError(f"FrameCache: cached '{name}' has no {TIMESTAMP_COLUMN} column.")
+
+        df = table.to_pandas(types_mapper=_PANDAS_TYPES.get)
+        # Arrow list columns come back as ndarrays; the analytics nodes expect plain lists.
+        for field in table.schema:
+            if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+                df[field.name] = df[field.name].map(lambda v: v.tolist() if hasattr(v, "tolist") else v)
+
+        if PARTITION_COLUMN in df.columns:
+            cached_rows = {key: entry.get("rows", 0) for key, entry in manifest["days"].items()}
+            found_rows = df[PARTITION_COLUMN].value_counts().to_dict()
+            mismatched = [key for key, rows in found_rows.items() if cached_rows.get(key) != rows]
+            if mismatched:
+                raise ValueError(f"FrameCache: '{name}' partition row counts disagree with the manifest for {len(mismatched)} day(s).")
+
+        start, end = naive_utc(period_start), naive_utc(period_end)
+        if start is not None:
+            df = df[df[TIMESTAMP_COLUMN] >= start]
+        if end is not None:
+            df = df[df[TIMESTAMP_COLUMN] < end]
+
+        for col in manifest["json_columns"]:
+            if col in df.columns:
+                df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+
+        df = df.drop(columns=[PARTITION_COLUMN], errors="ignore")
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df.reset_index(drop=True)
+
+    def load_period(
+        self,
+        period_start: Optional[datetime],
+        period_end: Optional[datetime],
+        source_markers: Optional[Callable[[str], DayMarkers]] = None,
+    ) -> Optional[Dict[str, pd.DataFrame]]:
+        """
+        All cached frames for [period_start, period_end), or None unless every one of them fully covers it.
+        `source_markers(name)` returns the source's current per-day markers for a frame; it is only
+        called once the manifests cover the period, and any day that differs makes the load a miss.
+        Any read failure is also a miss, so the caller can always fall back to MongoDB; the failing
+        frame's manifest is dropped so the next write rebuilds it instead of trusting it again.
+        """
+        try:
+            if not all(self.covers(name, period_start, period_end) for name in CACHED_FRAMES):
+                return None
+            if source_markers is not None:
+                if not all(self.covers(name, period_start, period_end, source_markers(name)) for name in CACHED_FRAMES):
+                    return None
+        except Exception as e:
+            logger.warning(f"FrameCache: could not validate cached frames ({e}); falling back to MongoDB.", exc_info=True)
+            return None
+
+        frames: Dict[str, pd.DataFrame] = {}
+        for name in CACHED_FRAMES:
+            try:
+                frames[name] = self.read_frame(name, period_start=period_start, period_end=period_end)
+            except Exception as e:
+                logger.warning(f"FrameCache: failed to read cached '{name}' ({e}); invalidating it and falling back to MongoDB.", exc_info=True)
+                self.invalidate(name)
+                return None
+        return frames
+
+    @_holding_frame_lock
+    def invalidate(self, name: str) -> None:
+        """Forgets everything cached for `name`."""
+        if self.enabled:
+            shutil.rmtree(self._frame_dir(name), ignore_errors=True)
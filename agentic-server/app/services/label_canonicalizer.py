@@ -0,0 +1,137 @@
+# agentic-server/app/services/label_canonicalizer.py
+
+import os
+import re
+import json
+import difflib
+import threading
+from typing import Dict, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Bumped when matching rules change, so memos built under the old rules are relearned.
+CACHE_VERSION = 2
+FUZZY_CUTOFF = float(os.getenv("ANALYTICS_LABEL_FUZZY_CUTOFF", "0.88"))
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an the and or of about with to in on for from at by my their his her its is are was being "
+    "related regarding due over around feeling feelings".split()
+)
+_IRREGULAR = {
+    "children": "child", "people": "person", "women": "woman", "men": "man",
+    "anxieties": "anxiety", "worries": "worry", "studies": "study",
+}
+_KEEP_S = ("ss", "us", "is", "ous")
+# A label and its negation are close strings but opposite findings ("no suicidal thoughts").
+# "t" is what is left of "n't" once the label is split into words.
+_NEGATIONS = frozenset("no not non never without denies denied deny denying none nor t".split())
+
+
+def _lemma(word: str) -> str:
+    """Cheap rule-based singularisation; good enough to fold "exams"/"exam", "worries"/"worry"."""
+    if word in _IRREGULAR:
+        return _IRREGULAR[word]
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith(("ches", "shes", "xes", "sses")):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(_KEEP_S):
+        return word[:-1]
+    return word
+
+
+def _is_negated(key: str) -> bool:
+    return not _NEGATIONS.isdisjoint(key.split())
+
+
+def normalize_label(label: str) -> str:
+    """Order-insensitive key: lowercased, lemmatised content words, sorted. "Stress about exams" -> "exam stress"."""
+    words = [_lemma(w) for w in _WORD_RE.findall(label.lower())]
+    content = [w for w in words if w not in _STOPWORDS] or words
+    return " ".join(sorted(set(content)))
+
+
+class LabelCanonicalizer:
+    """
+    Maps free-text LLM labels (stressors, concerns, red flags, topics) onto canonical labels.
+
+    Each namespace keeps a memo of raw label -> canonical label and the canonical labels seen so
+    far, keyed by their normalized form. An unseen label is normalized, then fuzzily matched
+    against the namespace's existing keys, never across negation ("no suicidal thoughts" stays apart
+    from "Suicidal thoughts"); only that first sighting pays for the matching. The memo is persisted
+    to ANALYTICS_LABEL_CACHE_PATH (in-memory only when unset) so it survives restarts and keeps
+    canonical labels stable across snapshots.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, fuzzy_cutoff: float = FUZZY_CUTOFF):
+        self.cache_path = cache_path if cache_path is not None else os.getenv("ANALYTICS_LABEL_CACHE_PATH", "")
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._lock = threading.Lock()
+        self._dirty = False
+        # namespace -> {"labels": {raw: canonical}, "canonical": {normalized key: canonical}}
+        self._namespaces: Dict[str, Dict[str, Dict[str, str]]] = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if payload.get("version") != CACHE_VERSION:
+                logger.info(f"LabelCanonicalizer: discarding cache at {self.cache_path} from an older version.")
+                return {}
+            return payload.get("namespaces", {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"LabelCanonicalizer: ignoring unreadable cache at {self.cache_path}: {e}")
+            return {}
+
+    def canonicalize(self, label: str, namespace: str = "default") -> str:
+        if not isinstance(label, str):
+            return label
+        space = self._namespaces.get(namespace)
+        if space is not None:
+            known = space["labels"].get(label)
+            if known is not None:
+                return known
+
+        with self._lock:
+            space = self._namespaces.setdefault(namespace, {"labels": {}, "canonical": {}})
+            if label in space["labels"]:
+                return space["labels"][label]
+            key = normalize_label(label)
+            canonical = space["canonical"].get(key)
+            if canonical is None and key:
+                negated = _is_negated(key)
+                for match in difflib.get_close_matches(key, list(space["canonical"]), n=5, cutoff=self.fuzzy_cutoff):
+                    if _is_negated(match) == negated:
+                        canonical = space["canonical"][match]
+                        break
+            if canonical is None:
+                cleaned = " ".join(label.split())
+                canonical = cleaned[:1].upper() + cleaned[1:]
+            # The alias is recorded too, so later variants close to this spelling match directly.
+            space["canonical"].setdefault(key, canonical)
+            space["labels"][label] = canonical
+            self._dirty = True
+            return canonical
+
+    def save(self) -> None:
+        """Persists the memo if anything new was learned since the last save."""
+        if not self.cache_path or not self._dirty:
+            return
+        with self._lock:
+            payload = json.dumps({"version": CACHE_VERSION, "namespaces": self._namespaces}, sort_keys=True)
+            self._dirty = False
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self.cache_path)
+
+
+label_canonicalizer = LabelCanonicalizer()
@@ -0,0 +1,465 @@
+# agentic-server/app/services/live_analytics.py
+
+import os
+import time
+import asyncio
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+from app.db.connect import get_db
+from app.schemas.analytics import AnalyticsSnapshot
+from app.services.label_canonicalizer import label_canonicalizer
+from app.services.report_frames import embedded_json
+from app.services.risk_trajectories import risk_trajectories, ANALYTICS_RISK_TRAJECTORIES
+from app.utils.frames import nested_get, as_list
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# "off", "change_stream" (needs a replica set), "poll" (tails createdAt; works on a standalone
+# server or a local stand-in) or "auto" (change streams when the server supports them, else poll).
+LIVE_ANALYTICS_SOURCE = os.getenv("LIVE_ANALYTICS_SOURCE", "off").lower()
+LIVE_ANALYTICS_WINDOW_HOURS = float(os.getenv("LIVE_ANALYTICS_WINDOW_HOURS", "24"))
+LIVE_ANALYTICS_BUCKET_MINUTES = int(os.getenv("LIVE_ANALYTICS_BUCKET_MINUTES", "15"))
+LIVE_ANALYTICS_POLL_SECONDS = float(os.getenv("LIVE_ANALYTICS_POLL_SECONDS", "2"))
+LIVE_ANALYTICS_CHECKPOINT_SECONDS = float(os.getenv("LIVE_ANALYTICS_CHECKPOINT_SECONDS", "60"))
+LIVE_ANALYTICS_BATCH_SIZE = int(os.getenv("LIVE_ANALYTICS_BATCH_SIZE", "500"))
+
+LIVE_COLLECTIONS = ("aireports", "reports", "studentcheckins")
+LIVE_SNAPSHOT_TYPE = "live"
+
+# (collection, full document)
+ChangeEvent = Tuple[str, Dict[str, Any]]
+
+
+def _utc_naive(value: Any) -> Optional[datetime]:
+    """MongoDB stores naive UTC datetimes; aggregates work in the same terms."""
+    if not isinstance(value, datetime):
+        return None
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class _Bucket:
+    """Everything that arrived in one LIVE_ANALYTICS_BUCKET_MINUTES slot of event time."""
+
+    __slots__ = ("risk", "sentiment", "red_flags", "students", "counts", "mood_sum", "stress_sum")
+
+    def __init__(self):
+        self.risk: Counter = Counter()
+        self.sentiment: Counter = Counter()
+        self.red_flags: Counter = Counter()
+        self.students: set = set()
+        self.counts: Counter = Counter()
+        self.mood_sum = 0.0
+        self.stress_sum = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "risk": dict(self.risk), "sentiment": dict(self.sentiment), "red_flags": dict(self.red_flags),
+            "students": sorted(self.students), "counts": dict(self.counts),
+            "mood_sum": self.mood_sum, "stress_sum": self.stress_sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "_Bucket":
+        bucket = cls()
+        bucket.risk.update(data.get("risk", {}))
+        bucket.sentiment.update(data.get("sentiment", {}))
+        bucket.red_flags.update(data.get("red_flags", {}))
+        bucket.students.update(data.get("students", []))
+        bucket.counts.update(data.get("counts", {}))
+        bucket.mood_sum = float(data.get("mood_sum", 0.0))
+        bucket.stress_sum = float(data.get("stress_sum", 0.0))
+        return bucket
+
+
+class RollingAggregates:
+    """
+    Rolling-window counters over report and check-in events, bucketed by event time. Running
+    totals are kept alongside the buckets: an event adds to its bucket and the totals, and an
+    expiring bucket is subtracted from them, so both updates and reads cost per event, not per
+    period. Active students are counted by the number of live buckets they appear in.
+    """
+
+    def __init__(self, window: timedelta = timedelta(hours=LIVE_ANALYTICS_WINDOW_HOURS), bucket_minutes: int = LIVE_ANALYTICS_BUCKET_MINUTES):
+        self.window = window
+        self.bucket_seconds = bucket_minutes * 60
+        self.reset()
+
+    def reset(self) -> None:
+        self._buckets: Dict[int, _Bucket] = {}
+        self._totals = _Bucket()
+        self._student_buckets: Counter = Counter()
+        self.events_applied = 0
+
+    def _bucket_key(self, at: datetime) -> int:
+        return int(at.replace(tzinfo=timezone.utc).timestamp()) // self.bucket_seconds
+
+    def _horizon(self, now: datetime) -> int:
+        return self._bucket_key(now - self.window)
+
+    def expire(self, now: Optional[datetime] = None) -> None:
+        horizon = self._horizon(now or _now())
+        for key in [k for k in self._buckets if k < horizon]:
+            self._subtract(self._buckets.pop(key))
+
+    def _subtract(self, bucket: _Bucket) -> None:
+        totals = self._totals
+        totals.risk.subtract(bucket.risk)
+        totals.sentiment.subtract(bucket.sentiment)
+        totals.red_flags.subtract(bucket.red_flags)
+        totals.counts.subtract(bucket.counts)
+        totals.mood_sum -= bucket.mood_sum
+        totals.stress_sum -= bucket.stress_sum
+        for student in bucket.students:
+            self._student_buckets[student] -= 1
+            if self._student_buckets[student] <= 0:
+                del self._student_buckets[student]
+        # Drop zeroed keys so the counters stay as small as the window.
+        for counter in (totals.risk, totals.sentiment, totals.red_flags, totals.counts):
+            for key in [k for k, v in counter.items() if v <= 0]:
+                del counter[key]
+
+    def _bucket_for(self, at: Optional[datetime], now: datetime) -> Optional[_Bucket]:
+        if at is None:
+            return None
+        key = self._bucket_key(at)
+        if key < self._horizon(now):
+            return None
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    def _add_student(self, bucket: _Bucket, student: Any) -> None:
+        if student is None:
+            return
+        student = str(student)
+        if student not in bucket.students:
+            bucket.students.add(student)
+            self._student_buckets[student] += 1
+
+    def apply(self, collection: str, doc: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        """Folds one inserted document into the window; False when it is outside the window or not relevant."""
+        now = now or _now()
+        bucket = self._bucket_for(_utc_naive(doc.get("createdAt")), now)
+        if bucket is None:
+            return False
+        totals = self._totals
+
+        if collection == "aireports":
+            standard = embedded_json(doc.get("standard_report"), "standard_content")
+            risk = nested_get(standard, "risk_assessment", "risk_level")
+            sentiment = nested_get(standard, "risk_assessment", "sentiment")
+            if risk:
+                bucket.risk[risk] += 1
+                totals.risk[risk] += 1
+            if sentiment:
+                bucket.sentiment[sentiment] += 1
+                totals.sentiment[sentiment] += 1
+            for flag in as_list(nested_get(standard, "risk_assessment", "red_flags")):
+                flag = label_canonicalizer.canonicalize(flag, "redFlags")
+                bucket.red_flags[flag] += 1
+                totals.red_flags[flag] += 1
+            self._add_student(bucket, doc.get("student"))
+        elif collection == "reports":
+            self._add_student(bucket, doc.get("owner"))
+        elif collection == "studentcheckins":
+            mood, stress = doc.get("moodScore"), doc.get("stressLevel")
+            if isinstance(mood, (int, float)) and isinstance(stress, (int, float)):
+                bucket.mood_sum += mood
+                bucket.stress_sum += stress
+                totals.mood_sum += mood
+                totals.stress_sum += stress
+            self._add_student(bucket, doc.get("student"))
+        else:
+            return False
+
+        bucket.counts[collection] += 1
+        totals.counts[collection] += 1
+        self.events_applied += 1
+        return True
+
+    def snapshot(self, now: Optional[datetime] = None) -> AnalyticsSnapshot:
+        now = now or _now()
+        self.expire(now)
+        totals = self._totals
+        ai_reports, manual_reports, checkins = (totals.counts.get(c, 0) for c in LIVE_COLLECTIONS)
+        return AnalyticsSnapshot(
+            snapshotVersion=f"Live-{now.strftime('%Y%m%d%H%M%S')}",
+            snapshotTimestamp=now,
+            periodStart=now - self.window,
+            periodEnd=now,
+            totalReports=ai_reports + manual_reports,
+            totalAIReports=ai_reports,
+            totalManualReports=manual_reports,
+            totalStudentsEngaged=len(self._student_buckets),
+            riskLevelDistribution=dict(totals.risk),
+            sentimentDistribution=dict(totals.sentiment),
+            topRedFlags=[{"flag": flag, "count": count} for flag, count in totals.red_flags.most_common(10)],
+            snapshotType=LIVE_SNAPSHOT_TYPE,
+            totalCheckins=checkins,
+            avgMoodScore=round(totals.mood_sum / checkins, 2) if checkins else 0.0,
+            avgStressLevel=round(totals.stress_sum / checkins, 2) if checkins else 0.0,
+        )
+
+    def to_state(self) -> List[Dict[str, Any]]:
+        return [{"key": key, **bucket.to_dict()} for key, bucket in sorted(self._buckets.items())]
+
+    def load_state(self, buckets: Iterable[Dict[str, Any]], now: Optional[datetime] = None) -> None:
+        """Rebuilds the window (and its totals) from a checkpoint, dropping buckets that have since expired."""
+        self.reset()
+        horizon = self._horizon(now or _now())
+        for data in buckets:
+            if data["key"] < horizon:
+                continue
+            bucket = _Bucket.from_dict(data)
+            self._buckets[data["key"]] = bucket
+            self._totals.risk.update(bucket.risk)
+            self._totals.sentiment.update(bucket.sentiment)
+            self._totals.red_flags.update(bucket.red_flags)
+            self._totals.counts.update(bucket.counts)
+            self._totals.mood_sum += bucket.mood_sum
+            self._totals.stress_sum += bucket.stress_sum
+            self._student_buckets.update(bucket.students)
+
+
+class ChangeStreamSource:
+    """Insert events from a MongoDB change stream on the live collections (replica sets only)."""
+
+    name = "change_stream"
+
+    def __init__(self, db, resume_token: Optional[Dict[str, Any]] = None):
+        self.db = db
+        self.resume_token = resume_token
+        self._stream = None
+
+    def open(self) -> None:
+        if not callable(getattr(type(self.db), "watch", None)):
+            raise NotImplementedError(f"{type(self.db).__name__} does not support change streams")
+        pipeline = [{"$match": {"operationType": "insert", "ns.coll": {"$in": list(LIVE_COLLECTIONS)}}}]
+        self._stream = self.db.watch(pipeline, resume_after=self.resume_token, max_await_time_ms=int(LIVE_ANALYTICS_POLL_SECONDS * 1000))
+        self.resume_token = self._stream.resume_token
+
+    def poll(self) -> List[ChangeEvent]:
+        """Blocking; waits up to LIVE_ANALYTICS_POLL_SECONDS for the next batch. Run it on a thread."""
+        if self._stream is None:
+            self.open()
+        events: List[ChangeEvent] = []
+        while len(events) < LIVE_ANALYTICS_BATCH_SIZE:
+            change = self._stream.try_next()
+            if change is None:
+                break
+            events.append((change["ns"]["coll"], change["fullDocument"]))
+        self.resume_token = self._stream.resume_token
+        return events
+
+    def position(self) -> Dict[str, Any]:
+        return {"resume_token": self.resume_token}
+
+    def close(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+
+class PollingSource:
+    """
+    Oplog-like stand-in for servers without change streams (a standalone mongod, a local test
+    database): tails each collection by (createdAt, _id) from the last position it saw.
+    """
+
+    name = "poll"
+
+    def __init__(self, db, since: datetime, positions: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.db = db
+        self.positions = positions or {c: {"createdAt": since, "_id": None} for c in LIVE_COLLECTIONS}
+
+    def poll(self) -> List[ChangeEvent]:
+        events: List[ChangeEvent] = []
+        for collection in LIVE_COLLECTIONS:
+            last = self.positions[collection]
+            if last["_id"] is None:
+                query = {"createdAt": {"$gte": last["createdAt"]}}
+            else:
+                query = {"$or": [{"createdAt": {"$gt": last["createdAt"]}}, {"createdAt": last["createdAt"], "_id": {"$gt": last["_id"]}}]}
+            docs = list(self.db[collection].find(query).sort([("createdAt", 1), ("_id", 1)]).limit(LIVE_ANALYTICS_BATCH_SIZE))
+            if docs:
+                self.positions[collection] = {"createdAt": docs[-1]["createdAt"], "_id": docs[-1]["_id"]}
+                events.extend((collection, doc) for doc in docs)
+        return events
+
+    def position(self) -> Dict[str, Any]:
+        return {"positions": self.positions}
+
+    def close(self) -> None:
+        pass
+
+
+class LiveAnalytics:
+    """
+    Keeps RollingAggregates current from inserts on aireports, reports and studentcheckins and
+    checkpoints them, together with the source position, into a single live document in
+    analyticssnapshots, so a restart resumes where it stopped instead of re-reading the window.
+    """
+
+    def __init__(self, db=None, mode: str = LIVE_ANALYTICS_SOURCE):
+        self.db = db if db is not None else get_db()
+        self.mode = mode
+        self.aggregates = RollingAggregates()
+        # The loop applies events and serves reads while startup and checkpoints run on worker
+        # threads; every access to the aggregates holds this lock.
+        self._lock = threading.Lock()
+        self.source = None
+        self.last_checkpoint: Optional[datetime] = None
+        # Stream events for documents older than this were already counted by the bootstrap query.
+        self._stream_opened_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @property
+    def collection(self):
+        return self.db["analyticssnapshots"]
+
+    def _restore(self) -> Optional[Dict[str, Any]]:
+        doc = self.collection.find_one({"snapshotType": LIVE_SNAPSHOT_TYPE})
+        if not doc or not doc.get("liveState"):
+            return None
+        state = doc["liveState"]
+        with self._lock:
+            self.aggregates.load_state(state.get("buckets", []))
+        logger.info(f"LiveAnalytics: restored {len(state.get('buckets', []))} buckets from the checkpoint of {doc.get('snapshotTimestamp')}.")
+        return state.get("position") or {}
+
+    def _bootstrap(self, until: Optional[datetime] = None) -> None:
+        """Fills an empty window with a range query, for documents created before `until`."""
+        query: Dict[str, Any] = {"$gte": _now() - self.aggregates.window}
+        if until is not None:
+            query["$lt"] = until
+        for collection in LIVE_COLLECTIONS:
+            for doc in self.db[collection].find({"createdAt": query}):
+                with self._lock:
+                    self.aggregates.apply(collection, doc)
+        logger.info(f"LiveAnalytics: bootstrapped the window with {self.aggregates.events_applied} documents.")
+
+    def _open_source(self, position: Optional[Dict[str, Any]]) -> None:
+        """Picks the source and, without a checkpoint, seeds the window from a range query."""
+        since = _now() - self.aggregates.window
+        if self.mode in ("change_stream", "auto") and (position is None or "resume_token" in position):
+            source = ChangeStreamSource(self.db, (position or {}).get("resume_token"))
+            try:
+                opened_at = _now()
+                source.open()
+                self.source = source
+                if position is None:
+                    # Inserts from here on arrive on the stream; everything older comes from the range query.
+                    self._bootstrap(until=opened_at)
+                    self._stream_opened_at = opened_at
+                return
+            except (OperationFailure, NotImplementedError) as e:
+                # OperationFailure: standalone mongod; NotImplementedError: in-process stand-ins without watch().
+                if self.mode == "change_stream":
+                    raise
+                logger.warning(f"LiveAnalytics: change streams unavailable ({e}); tailing by createdAt instead.")
+                if position and "resume_token" in position:
+                    # The restored buckets belong to that position; polling re-reads the whole window.
+                    logger.warning("LiveAnalytics: discarding the checkpointed resume token and its counters.")
+                    position = None
+                    with self._lock:
+                        self.aggregates.reset()
+        self.source = PollingSource(self.db, since, (position or {}).get("positions"))
+
+    def apply_events(self, events: Iterable[ChangeEvent]) -> int:
+        now, opened_at = _now(), self._stream_opened_at
+        applied = 0
+        for collection, doc in events:
+            if opened_at is not None and (_utc_naive(doc.get("createdAt")) or now) < opened_at:
+                continue
+            with self._lock:
+                applied += self.aggregates.apply(collection, doc, now)
+        return applied
+
+    def checkpoint(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self.aggregates.snapshot().dict(by_alias=True, exclude_none=True)
+            snapshot["liveState"] = {"buckets": self.aggregates.to_state(), "position": self.source.position() if self.source else {}}
+        self.collection.replace_one({"snapshotType": LIVE_SNAPSHOT_TYPE}, snapshot, upsert=True)
+        self.last_checkpoint = _now()
+        return snapshot
+
+    def current(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self.aggregates.snapshot().dict(by_alias=True, exclude_none=True)
+            snapshot["source"] = getattr(self.source, "name", None)
+            snapshot["eventsApplied"] = self.aggregates.events_applied
+        snapshot["lastCheckpoint"] = self.last_checkpoint
+        return snapshot
+
+    async def _run(self) -> None:
+        position = await asyncio.to_thread(self._restore)
+        await asyncio.to_thread(self._open_source, position)
+        logger.info(f"LiveAnalytics: following {', '.join(LIVE_COLLECTIONS)} via {self.source.name}.")
+        next_checkpoint = time.monotonic() + LIVE_ANALYTICS_CHECKPOINT_SECONDS
+        while True:
+            try:
+                events = await asyncio.to_thread(self.source.poll)
+                if events:
+                    self.apply_events(events)
+                    if ANALYTICS_RISK_TRAJECTORIES:
+                        # New check-ins and AI reports also extend their students' risk trajectories.
+                        await asyncio.to_thread(risk_trajectories.catch_up)
+                if time.monotonic() >= next_checkpoint:
+                    await asyncio.to_thread(self.checkpoint)
+                    next_checkpoint = time.monotonic() + LIVE_ANALYTICS_CHECKPOINT_SECONDS
+                if not events and self.source.name == "poll":
+                    await asyncio.sleep(LIVE_ANALYTICS_POLL_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                # Reopen from the last position on the next pass (resume token or createdAt cursor).
+                logger.error(f"LiveAnalytics: source error, reopening: {e}", exc_info=True)
+                self.source.close()
+                await asyncio.sleep(LIVE_ANALYTICS_POLL_SECONDS)
+            except Exception as e:
+                # A bad document or a bug in one pass must not stop the live counters for good.
+                logger.error(f"LiveAnalytics: error in the update loop, continuing: {e}", exc_info=True)
+                await asyncio.sleep(LIVE_ANALYTICS_POLL_SECONDS)
+
+    def _log_exit(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"LiveAnalytics: stopped: {task.exception()}", exc_info=task.exception())
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            self._task.add_done_callback(self._log_exit)
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+        try:
+            if self.source is not None:
+                await asyncio.to_thread(self.checkpoint)
+                self.source.close()
+        except PyMongoError as e:
+            logger.warning(f"LiveAnalytics: final checkpoint failed: {e}")
+
+
+live_analytics = LiveAnalytics()
@@ -0,0 +1,200 @@
+# agentic-server/app/services/llm_gateway.py
+
+import os
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from collections import deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from app.services.fixtures import fixture_store
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "250000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1.0"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "30.0"))
+# Structured outputs here are small; this is what each call reserves on top of its prompt.
+LLM_EXPECTED_OUTPUT_TOKENS = int(os.getenv("LLM_EXPECTED_OUTPUT_TOKENS", "1024"))
+
+_RETRYABLE_MARKERS = ("429", "resourceexhausted", "resource_exhausted", "rate limit", "quota", "503", "unavailable", "deadline", "timeout")
+
+
+class Priority(IntEnum):
+    """Lower value is admitted first."""
+    INTERACTIVE = 0   # /generate-report, /generate-pathway: a user is waiting
+    BACKGROUND = 10   # analytics snapshots
+
+
+class TokenBucket:
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (amounts above capacity are clamped to it)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+
+def estimate_tokens(payload: Any) -> int:
+    """Rough prompt size (~4 characters per token) plus the expected completion."""
+    return len(str(payload)) // 4 + LLM_EXPECTED_OUTPUT_TOKENS
+
+
+def _is_retryable(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return isinstance(error, asyncio.TimeoutError) or any(marker in text for marker in _RETRYABLE_MARKERS)
+
+
+class LLMGateway:
+    """
+    Process-wide admission control for outbound LLM calls.
+
+    Calls wait in a priority queue (interactive before background, FIFO within a priority) and
+    are admitted only when a concurrency slot is free and both the requests/min and tokens/min
+    buckets can cover them. Rate-limit and availability errors are retried with exponential
+    backoff and full jitter, re-entering the queue each time.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.max_attempts = max_attempts
+        self._in_flight = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+        self._counters: Dict[str, int] = {"admitted": 0, "retries": 0, "failures": 0, "max_queue_depth": 0}
+
+    def _cond(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def _admit(self, priority: Priority, tokens: int) -> float:
+        cond = self._cond()
+        entry = (int(priority), next(self._sequence))
+        enqueued = time.monotonic()
+        async with cond:
+            heapq.heappush(self._waiting, entry)
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], len(self._waiting))
+            try:
+                while True:
+                    delay = None
+                    if self._waiting[0] == entry and self._in_flight < self.max_concurrency:
+                        delay = max(self.request_bucket.wait_time(1), self.token_bucket.wait_time(tokens))
+                        if delay == 0:
+                            break
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                # Cancelled while queued: leave the queue and let the next waiter re-check.
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self.request_bucket.take(1)
+            self.token_bucket.take(tokens)
+            self._in_flight += 1
+            self._counters["admitted"] += 1
+            cond.notify_all()
+        waited = time.monotonic() - enqueued
+        self._wait_times.append(waited)
+        return waited
+
+    async def _release(self) -> None:
+        cond = self._cond()
+        async with cond:
+            self._in_flight -= 1
+            cond.notify_all()
+
+    async def run(self, call: Callable[[], Awaitable[T]], priority: Priority = Priority.INTERACTIVE, tokens: int = LLM_EXPECTED_OUTPUT_TOKENS, name: str = "llm") -> T:
+        """Runs `call` under admission control, retrying retryable provider errors."""
+        for attempt in range(1, self.max_attempts + 1):
+            waited = await self._admit(priority, tokens)
+            if waited > 1.0:
+                logger.info(f"LLM gateway: '{name}' waited {waited:.2f}s for admission ({priority.name}).")
+            try:
+                return await call()
+            except Exception as e:
+                if attempt == self.max_attempts or not _is_retryable(e):
+                    self._counters["failures"] += 1
+                    raise
+                self._counters["retries"] += 1
+                backoff = random.uniform(0, min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+                logger.warning(f"LLM gateway: '{name}' attempt {attempt} failed ({type(e).__name__}); retrying in {backoff:.2f}s.")
+            finally:
+                await self._release()
+            await asyncio.sleep(backoff)
+        raise RuntimeError("unreachable")
+
+    async def ainvoke(self, runnable: Any, inputs: Any, priority: Priority = Priority.INTERACTIVE, name: Optional[str] = None) -> Any:
+        """`runnable.ainvoke(inputs)` through the gateway, sized by the inputs."""
+        name = name or type(runnable).__name__
+        return await self.run(
+            lambda: fixture_store.call("llm", name, inputs, lambda: runnable.ainvoke(inputs)),
+            priority=priority, tokens=estimate_tokens(inputs), name=name,
+        )
+
+    def metrics(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+
+        def pct(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "queue_depth": len(self._waiting),
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency,
+            "wait_seconds": {"p50": pct(0.50), "p95": pct(0.95), "max": round(waits[-1], 4) if waits else 0.0, "samples": len(waits)},
+            "request_tokens_available": round(self.request_bucket.tokens, 2),
+            "llm_tokens_available": round(self.token_bucket.tokens, 2),
+            **self._counters,
+        }
+
+
+llm_gateway = LLMGateway()
+
+_llm: Optional[ChatGoogleGenerativeAI] = None
+
+def get_llm() -> ChatGoogleGenerativeAI:
+    """The shared chat model. Provider-side retries are kept to one; the gateway owns backoff."""
+    global _llm
+    if _llm is None:
+        _llm = ChatGoogleGenerativeAI(model=os.getenv("LLM_MODEL"), max_retries=1)
+    return _llm
@@ -0,0 +1,171 @@
+# agentic-server/app/services/pathway_cache.py
+
+import os
+import copy
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.services.label_canonicalizer import normalize_label
+from app.services.single_flight import content_key
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PATHWAY_CACHE_TTL_SECONDS = float(os.getenv("PATHWAY_CACHE_TTL_SECONDS", "86400"))
+PATHWAY_CACHE_MAX_ENTRIES = int(os.getenv("PATHWAY_CACHE_MAX_ENTRIES", "512"))
+# How often a changed cache is written to PATHWAY_CACHE_PATH; it is also written at shutdown.
+PATHWAY_CACHE_SAVE_SECONDS = float(os.getenv("PATHWAY_CACHE_SAVE_SECONDS", "60"))
+
+
+def pathway_key(stressors: List[str], topics: List[str], language: str) -> str:
+    """Same key for inputs that differ only in order, case, spacing or plural forms."""
+    def _normalized(labels: List[str]) -> List[str]:
+        return sorted({normalize_label(label) for label in labels if isinstance(label, str) and label.strip()})
+    return content_key("pathway", _normalized(stressors), _normalized(topics), (language or "en").strip().lower())
+
+
+def _fresh(pathway: Dict[str, Any]) -> Dict[str, Any]:
+    """A per-student copy: nothing in a shared pathway has been completed yet."""
+    pathway = copy.deepcopy(pathway)
+    for step in pathway.get("steps", []):
+        step["completed"] = False
+        step.pop("completedAt", None)
+    return pathway
+
+
+class PathwayCache:
+    """
+    Memoised LearningPathwayOutput dicts keyed by pathway_key, so students whose reports name the
+    same stressors and topics get a stored pathway instead of a fresh LLM call. Entries expire
+    after PATHWAY_CACHE_TTL_SECONDS and the least recently used are evicted beyond
+    PATHWAY_CACHE_MAX_ENTRIES. With PATHWAY_CACHE_PATH set the cache is persisted there (in-memory
+    only when unset) every PATHWAY_CACHE_SAVE_SECONDS and at shutdown, and survives restarts.
+
+    Each entry remembers how long its generation took, so hits can report the latency they saved.
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, ttl: float = PATHWAY_CACHE_TTL_SECONDS, max_entries: int = PATHWAY_CACHE_MAX_ENTRIES):
+        self.cache_path = cache_path if cache_path is not None else os.getenv("PATHWAY_CACHE_PATH", "")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Held for a whole save, so two saves never interleave their writes.
+        self._save_lock = threading.Lock()
+        # Bumped on every change; the cache is dirty while it differs from the last saved one.
+        self._changes = 0
+        self._saved_changes = 0
+        self._task: Optional[asyncio.Task] = None
+        # key -> {"expires_at": epoch seconds, "generation_seconds": float, "pathway": dict}
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = self._load()
+        self._counters: Dict[str, float] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "saved_seconds": 0.0}
+
+    def _load(self) -> "OrderedDict[str, Dict[str, Any]]":
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return OrderedDict()
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", {})
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"PathwayCache: ignoring unreadable cache at {self.cache_path}: {e}")
+            return OrderedDict()
+        now = time.time()
+        live = OrderedDict((key, entry) for key, entry in entries.items() if entry.get("expires_at", 0) > now)
+        logger.info(f"PathwayCache: loaded {len(live)} pathways from {self.cache_path}.")
+        return live
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["expires_at"] <= time.time():
+                del self._entries[key]
+                self._changes += 1
+                self._counters["expired"] += 1
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            self._counters["saved_seconds"] += entry["generation_seconds"]
+            pathway = entry["pathway"]
+        return _fresh(pathway)
+
+    def put(self, key: str, pathway: Dict[str, Any], generation_seconds: float) -> None:
+        if not pathway.get("steps"):
+            return  # empty pathways mean the backend had nothing; ask again next time
+        with self._lock:
+            self._entries[key] = {
+                "expires_at": time.time() + self.ttl,
+                "generation_seconds": round(generation_seconds, 3),
+                "pathway": _fresh(pathway),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+            self._changes += 1
+
+    def save(self) -> None:
+        """Persists the cache if it changed since the last save."""
+        if not self.cache_path:
+            return
+        with self._save_lock:
+            with self._lock:
+                if self._changes == self._saved_changes:
+                    return
+                changes = self._changes
+                payload = json.dumps({"version": 1, "entries": self._entries}, default=str)
+            directory = os.path.dirname(self.cache_path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pathway-cache-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, self.cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            self._saved_changes = changes
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(PATHWAY_CACHE_SAVE_SECONDS)
+            try:
+                await asyncio.to_thread(self.save)
+            except OSError as e:
+                logger.warning(f"PathwayCache: failed to persist the cache: {e}")
+
+    def start(self) -> None:
+        if self.cache_path and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the periodic saves and writes whatever changed since the last one."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        try:
+            await asyncio.to_thread(self.save)
+        except OSError as e:
+            logger.warning(f"PathwayCache: failed to persist the cache: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self._counters["hits"] + self._counters["misses"]
+        return {
+            "entries": len(self._entries),
+            **{name: int(value) for name, value in self._counters.items() if name != "saved_seconds"},
+            "hit_rate": round(self._counters["hits"] / lookups, 3) if lookups else None,
+            "saved_latency_seconds": round(self._counters["saved_seconds"], 3),
+        }
+
+
+pathway_cache = PathwayCache()
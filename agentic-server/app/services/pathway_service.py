@@ -1,23 +1,41 @@
 # agentic-server/app/services/pathway_service.py
+import time
 from typing import List, Dict, Any
 from ..agents.pathway_generator import learning_path_generator_agent
 from ..utils.logger import get_logger
+from .single_flight import SingleFlight
+from .pathway_cache import pathway_cache, pathway_key
 
 logger = get_logger(__name__)
 
+# Retries and double submits of the same stressors/topics share one generation
+pathway_flight = SingleFlight("pathway")
+
 async def generate_learning_pathway(stressors: List[str], topics: List[str], language: str) -> Dict[str, Any]:
     """
     Service to orchestrate the generation of a learning pathway.
+    Pathways for equivalent inputs are served from the pathway cache when present.
     """
     logger.info("Pathway service initiated.")
+    key = pathway_key(stressors, topics, language)
+    cached = pathway_cache.get(key)
+    if cached is not None:
+        logger.info(f"Pathway served from cache ({key[:12]}).")
+        return cached
     try:
-        pathway = await learning_path_generator_agent(
-            stressors=stressors,
-            topics=topics,
-            language=language
-        )
-        
+        pathway = await pathway_flight.do(key, lambda: _generate_and_store(key, stressors, topics, language))
+
         return pathway
     except Exception as e:
         logger.error(f"Error in pathway service: {e}", exc_info=True)
-        raise
\ No newline at end of file
+        raise
+
+async def _generate_and_store(key: str, stressors: List[str], topics: List[str], language: str) -> Dict[str, Any]:
+    started = time.perf_counter()
+    pathway = await learning_path_generator_agent(
+        stressors=stressors,
+        topics=topics,
+        language=language
+    )
+    pathway_cache.put(key, pathway, time.perf_counter() - started)
+    return pathway
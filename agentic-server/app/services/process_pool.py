@@ -0,0 +1,99 @@
+# agentic-server/app/services/process_pool.py
+
+import os
+import json
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import pandas as pd
+import pyarrow as pa
+
+from app.services.frame_cache import to_arrow_table
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# Worker processes for CPU-bound analytics stages; 0 runs them on a thread of this process instead.
+ANALYTICS_PROCESS_POOL_WORKERS = int(os.getenv("ANALYTICS_PROCESS_POOL_WORKERS", "2"))
+
+_JSON_COLUMNS_KEY = b"json_columns"
+
+
+def frame_to_ipc(df: pd.DataFrame) -> bytes:
+    """Arrow IPC stream of a frame; categoricals, nullable ints and list columns survive the round trip."""
+    table, json_columns = to_arrow_table(df)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _JSON_COLUMNS_KEY: json.dumps(json_columns).encode()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def frame_from_ipc(payload: bytes) -> pd.DataFrame:
+    table = pa.ipc.open_stream(payload).read_all()
+    df = table.to_pandas()
+    for field in table.schema:
+        if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+            df[field.name] = df[field.name].map(lambda v: v.tolist() if hasattr(v, "tolist") else v)
+    for col in json.loads((table.schema.metadata or {}).get(_JSON_COLUMNS_KEY, b"[]")):
+        if col in df.columns:
+            df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+    return df
+
+
+def frames_to_ipc(frames: Dict[str, pd.DataFrame]) -> Dict[str, bytes]:
+    return {name: frame_to_ipc(df) for name, df in frames.items()}
+
+
+def frames_from_ipc(payloads: Dict[str, bytes]) -> Dict[str, pd.DataFrame]:
+    return {name: frame_from_ipc(payload) for name, payload in payloads.items()}
+
+
+class AnalyticsProcessPool:
+    """
+    Runs CPU-bound analytics stages off the event loop. Workers are spawned (not forked, since the
+    server process holds Mongo and logging threads) on first use and reused. Functions must be
+    module-level in side-effect-free modules, and should exchange frames as Arrow IPC bytes
+    (frames_to_ipc / frames_from_ipc) rather than pickled lists of dicts.
+    """
+
+    def __init__(self, workers: int = ANALYTICS_PROCESS_POOL_WORKERS):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            logger.info(f"Analytics process pool started with {self.workers} worker(s).")
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        call = functools.partial(fn, *args, **kwargs)
+        if not self.enabled:
+            return await asyncio.to_thread(call)
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(self._get_executor(), call)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); drop the pool so the next call starts a fresh one.
+            logger.error(f"Analytics process pool broke while running {getattr(fn, '__name__', fn)}; it will be restarted.")
+            self.shutdown(wait=False)
+            raise
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+analytics_pool = AnalyticsProcessPool()
@@ -0,0 +1,187 @@
+# agentic-server/app/services/profiling.py
+
+import io
+import os
+import sys
+import pstats
+import asyncio
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Everything here is unreachable unless PROFILING_ENABLED is set and PROFILING_ADMIN_TOKEN is non-empty.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "60"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+# Per-request profiles kept for retrieval, and how many requests may be profiled at once.
+PROFILING_KEEP_REQUESTS = int(os.getenv("PROFILING_KEEP_REQUESTS", "20"))
+PROFILING_MAX_CONCURRENT_REQUESTS = int(os.getenv("PROFILING_MAX_CONCURRENT_REQUESTS", "2"))
+
+# Source files whose allocations make up the analytics DataFrames.
+ANALYTICS_ALLOCATION_FILES = (
+    f"{os.sep}pandas{os.sep}", f"{os.sep}numpy{os.sep}", f"{os.sep}pyarrow{os.sep}",
+    "analytic_supervisor.py", "report_frames.py", "frame_cache.py", "data_fetcher.py",
+)
+
+_PREFIXES = sorted({p for p in sys.path if p and os.path.isdir(p)}, key=len, reverse=True)
+
+
+def _short_path(filename: str) -> str:
+    for prefix in _PREFIXES:
+        if filename.startswith(prefix):
+            return filename[len(prefix):].lstrip(os.sep)
+    return filename
+
+
+def _frame_label(code) -> str:
+    # Folded stacks separate frames with ';' (the count follows the last space, so spaces are fine).
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread (the event loop, to_thread workers, ...) from a
+    background thread every `interval` seconds and counts identical stacks. The result is in
+    collapsed/folded form ("thread;outer;...;inner <count>" per line), which flamegraph.pl,
+    speedscope and inferno read directly. Costs nothing until started.
+    """
+
+    def __init__(self, interval: float = PROFILING_INTERVAL_MS / 1000):
+        self.interval = interval
+        self.samples = 0
+        self._counts: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(";", ","))
+                self._counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> "StackSampler":
+        self._thread = threading.Thread(target=self._run, name="profiling-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.folded()
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._counts.most_common())
+
+
+async def sample_for(seconds: float, interval: float = PROFILING_INTERVAL_MS / 1000) -> str:
+    """Folded stacks of all threads over the next `seconds`."""
+    sampler = StackSampler(interval).start()
+    try:
+        await asyncio.sleep(min(seconds, PROFILING_MAX_SECONDS))
+    finally:
+        folded = sampler.stop()
+    logger.info(f"Profiling: sampled {sampler.samples} times over {seconds:g}s.")
+    return folded
+
+
+async def cprofile_for(seconds: float, sort: str = "cumulative", limit: int = 60) -> str:
+    """
+    Deterministic profile of the event-loop thread over the next `seconds`, as pstats text.
+    Work handed to other threads shows up only as the time spent awaiting it; use sampling for that.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(min(seconds, PROFILING_MAX_SECONDS))
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+class RequestProfiles:
+    """Folded-stack profiles of individual requests (opted in by header), kept for later retrieval."""
+
+    def __init__(self, keep: int = PROFILING_KEEP_REQUESTS, max_concurrent: int = PROFILING_MAX_CONCURRENT_REQUESTS):
+        self.keep = keep
+        self.max_concurrent = max_concurrent
+        self.active = 0
+        self._profiles: "OrderedDict[str, Dict[str, object]]" = OrderedDict()
+
+    def begin(self) -> Optional[StackSampler]:
+        """A running sampler, or None when too many requests are already being profiled."""
+        if self.active >= self.max_concurrent:
+            return None
+        self.active += 1
+        return StackSampler().start()
+
+    def end(self, profile_id: str, path: str, sampler: StackSampler, elapsed: float) -> None:
+        self.active -= 1
+        self._profiles[profile_id] = {"path": path, "elapsed_seconds": round(elapsed, 4), "samples": sampler.samples, "folded": sampler.stop()}
+        while len(self._profiles) > self.keep:
+            self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[Dict[str, object]]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[Dict[str, object]]:
+        return [{"id": pid, **{k: v for k, v in p.items() if k != "folded"}} for pid, p in reversed(self._profiles.items())]
+
+
+def tracemalloc_start(frames: int = 10) -> Dict[str, object]:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return tracemalloc_status()
+
+
+def tracemalloc_stop() -> Dict[str, object]:
+    tracemalloc.stop()
+    return tracemalloc_status()
+
+
+def tracemalloc_status() -> Dict[str, object]:
+    current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+    return {"tracing": tracemalloc.is_tracing(), "frames": tracemalloc.get_traceback_limit(), "current_bytes": current, "peak_bytes": peak}
+
+
+def tracemalloc_top(limit: int = 25, scope: str = "analytics", group_by: str = "traceback") -> Dict[str, object]:
+    """
+    Largest live allocations since tracemalloc_start. scope="analytics" keeps allocations with a
+    pandas/numpy/pyarrow or analytics-pipeline frame in their traceback, i.e. the DataFrames.
+    """
+    if not tracemalloc.is_tracing():
+        raise RuntimeError("tracemalloc is not running; start it first.")
+    snapshot = tracemalloc.take_snapshot()
+    if scope == "analytics":
+        snapshot = snapshot.filter_traces([tracemalloc.Filter(True, f"*{pattern}*", all_frames=True) for pattern in ANALYTICS_ALLOCATION_FILES])
+    stats = snapshot.statistics(group_by)
+    return {
+        **tracemalloc_status(),
+        "scope": scope,
+        "scoped_bytes": sum(stat.size for stat in stats),
+        "top": [
+            {"size_bytes": stat.size, "count": stat.count, "traceback": [f"{_short_path(f.filename)}:{f.lineno}" for f in stat.traceback]}
+            for stat in stats[:limit]
+        ],
+    }
+
+
+request_profiles = RequestProfiles()
@@ -0,0 +1,80 @@
+# agentic-server/app/services/recommended_resources.py
+
+import os
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+
+from app.services.single_flight import SingleFlight, content_key
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:5000/api")
+# /resources/recommended sits behind the backend's `protect` middleware.
+BACKEND_API_TOKEN = os.getenv("BACKEND_API_TOKEN", "")
+PATHWAY_RESOURCE_CACHE_TTL_SECONDS = float(os.getenv("PATHWAY_RESOURCE_CACHE_TTL_SECONDS", "900"))
+PATHWAY_RESOURCE_CACHE_MAX_TOPICS = int(os.getenv("PATHWAY_RESOURCE_CACHE_MAX_TOPICS", "1024"))
+PATHWAY_RESOURCE_FETCH_TIMEOUT = float(os.getenv("PATHWAY_RESOURCE_FETCH_TIMEOUT", "10"))
+
+
+def _topic_key(topic: str, language: str) -> str:
+    return content_key("recommended", topic.strip().lower(), language)
+
+
+class RecommendedResources:
+    """
+    Per-topic snapshot of the backend's GET /resources/recommended. Each (topic, language) is
+    fetched once and kept for PATHWAY_RESOURCE_CACHE_TTL_SECONDS; concurrent requests for the
+    same topic share one fetch. Topics are cached separately so a pathway for "exam stress,
+    sleep" reuses what an earlier "sleep" pathway (or a report's prefetch) already pulled.
+    """
+
+    def __init__(self, ttl: float = PATHWAY_RESOURCE_CACHE_TTL_SECONDS, max_topics: int = PATHWAY_RESOURCE_CACHE_MAX_TOPICS):
+        self._flight = SingleFlight("recommended-resources", ttl=ttl, max_entries=max_topics)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._prefetches: Set["asyncio.Task[Any]"] = set()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            headers = {"Authorization": f"Bearer {BACKEND_API_TOKEN}"} if BACKEND_API_TOKEN else {}
+            self._client = httpx.AsyncClient(base_url=BACKEND_API_URL, headers=headers, timeout=PATHWAY_RESOURCE_FETCH_TIMEOUT)
+        return self._client
+
+    async def _fetch(self, topic: str, language: str) -> List[Dict[str, Any]]:
+        response = await self._get_client().get("/resources/recommended", params={"topics": topic, "language": language})
+        response.raise_for_status()
+        return response.json().get("data", [])
+
+    async def for_topic(self, topic: str, language: str) -> List[Dict[str, Any]]:
+        """Backend resources for one topic; [] (not cached) when the backend call fails."""
+        try:
+            return await self._flight.do(_topic_key(topic, language), lambda: self._fetch(topic, language))
+        except (httpx.HTTPError, ValueError) as e:
+            logger.error(f"RecommendedResources: fetching '{topic}' ({language}) failed: {e}")
+            return []
+
+    async def for_topics(self, topics: List[str], language: str) -> Dict[str, List[Dict[str, Any]]]:
+        unique = list(dict.fromkeys(t.strip() for t in topics if t and t.strip()))
+        results = await asyncio.gather(*(self.for_topic(topic, language) for topic in unique))
+        return dict(zip(unique, results))
+
+    def prefetch(self, topics: List[str], language: str) -> None:
+        """Warms the cache in the background, e.g. from a report's stressors before its pathway is requested."""
+        if not topics:
+            return
+        task = asyncio.ensure_future(self.for_topics(topics, language))
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetches.discard)
+
+    def metrics(self) -> Dict[str, Any]:
+        return self._flight.metrics()
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+recommended_resources = RecommendedResources()
@@ -0,0 +1,241 @@
+# agentic-server/app/services/report_frames.py
+
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+import pandas as pd
+from pydantic import TypeAdapter
+
+from app.schemas.analytics import AIReportFull
+from app.services.process_pool import frames_to_ipc
+from app.utils.frames import nested_get, as_list, compact_frame, frame_memory_bytes, log_memory_report
+from app.utils.logger import get_logger
+
+# Runs inside analytics worker processes as well as the server, so importing it must stay free of
+# side effects (no DB connection, no LLM clients) until a function is actually called.
+
+logger = get_logger(__name__)
+
+# Lean schema for the report frames produced by data preprocessing.
+REPORT_CATEGORICAL_COLUMNS = ['sentiment', 'risk_level', 'status', 'report_type', 'priority', 'category']
+REPORT_ID_COLUMNS = ['owner_id', 'assigned_to_id']
+SCORE_COLUMNS = ['phq_9_score', 'gad_7_score']
+
+# How AI report documents are parsed: "light" (default), "bulk" or "model"; see build_ai_reports_frame.
+AI_REPORT_PARSER = os.getenv("ANALYTICS_AI_REPORT_PARSER", "light")
+
+_ai_reports_adapter = TypeAdapter(List[AIReportFull])
+
+
+def _id_or_none(value: Any) -> Optional[str]:
+    """Stringifies an ObjectId reference without turning a missing one into the literal 'None'."""
+    return str(value) if value is not None and pd.notna(value) else None
+
+
+def build_reports_frame(raw_reports: List[Dict[str, Any]], baseline: Optional[Dict[str, pd.DataFrame]] = None) -> pd.DataFrame:
+    if not raw_reports:
+        logger.warning("No raw manual reports to preprocess.")
+        return pd.DataFrame()
+    reports_df = pd.DataFrame(raw_reports)
+    reports_df['createdAt'] = pd.to_datetime(reports_df['createdAt'])
+    reports_df['report_type'] = 'manual'
+    reports_df['owner_id'] = reports_df['owner'].map(_id_or_none)
+    reports_df['assigned_to_id'] = reports_df['assignedTo'].map(_id_or_none) if 'assignedTo' in reports_df.columns else None
+    reports_df = reports_df.drop(columns=['owner', 'assignedTo'], errors='ignore')
+    if baseline is not None:
+        baseline["reports_df"] = reports_df.copy()
+    logger.info(f"Processed {len(reports_df)} manual reports into DataFrame.")
+    return compact_frame(reports_df, categorical_columns=REPORT_CATEGORICAL_COLUMNS, id_columns=REPORT_ID_COLUMNS)
+
+
+def embedded_json(blob: Any, content_key: str) -> Any:
+    """The report body Mongo stores as a JSON string under `content_key`; same rules as AIReportFull.parse_json_content."""
+    if isinstance(blob, dict) and isinstance(blob.get(content_key), str):
+        try:
+            return orjson.loads(blob[content_key])
+        except orjson.JSONDecodeError:
+            return {}
+    return blob
+
+
+def _light_rows(raw_ai_reports: List[Dict[str, Any]]) -> Iterator[Tuple[Any, Any, Any, Any, Any]]:
+    for doc in raw_ai_reports:
+        yield (
+            doc.get('createdAt'), doc.get('updatedAt'), doc.get('student'),
+            embedded_json(doc.get('standard_report'), 'standard_content'),
+            embedded_json(doc.get('demo_report'), 'demo_content'),
+        )
+
+
+def _validated_rows(raw_ai_reports: List[Dict[str, Any]]) -> Iterator[Tuple[Any, Any, Any, Any, Any]]:
+    # One validation pass for the whole batch; fields are read off the models, never dumped back to dicts.
+    for report in _ai_reports_adapter.validate_python(raw_ai_reports):
+        yield report.createdAt, report.updatedAt, report.student, report.standard_report, report.demo_report
+
+
+def _ai_report_columns(rows: Iterable[Tuple[Any, Any, Any, Any, Any]]) -> pd.DataFrame:
+    """Builds only the columns the analytics read, in one pass, from (createdAt, updatedAt, student, standard, demo) rows."""
+    columns: Dict[str, List[Any]] = {name: [] for name in (
+        'createdAt', 'updatedAt', 'owner_id', 'sentiment', 'risk_level', 'red_flags', 'phq_9_score',
+        'gad_7_score', 'key_stressors', 'student_concerns', 'suggested_resource_topics',
+    )}
+    for created_at, updated_at, student, standard, demo in rows:
+        columns['createdAt'].append(created_at)
+        columns['updatedAt'].append(updated_at)
+        columns['owner_id'].append(str(student))
+        columns['sentiment'].append(nested_get(standard, 'risk_assessment', 'sentiment'))
+        columns['risk_level'].append(nested_get(standard, 'risk_assessment', 'risk_level'))
+        columns['red_flags'].append(as_list(nested_get(standard, 'risk_assessment', 'red_flags')))
+        columns['phq_9_score'].append(nested_get(standard, 'screening_scores', 'phq_9_score'))
+        columns['gad_7_score'].append(nested_get(standard, 'screening_scores', 'gad_7_score'))
+        columns['key_stressors'].append(as_list(nested_get(standard, 'analytics', 'key_stressors_identified')))
+        columns['student_concerns'].append(
+            as_list(nested_get(standard, 'summary', 'student_expressed_concerns')) + as_list(nested_get(demo, 'student_expressed_concerns'))
+        )
+        columns['suggested_resource_topics'].append(as_list(nested_get(demo, 'suggested_resource_topics')))
+
+    df = pd.DataFrame(columns)
+    df['createdAt'] = pd.to_datetime(df['createdAt'])
+    df['updatedAt'] = pd.to_datetime(df['updatedAt'])
+    df.insert(2, 'report_type', 'ai')
+    return df
+
+
+def _model_ai_reports_frame(raw_ai_reports: List[Dict[str, Any]], baseline: Optional[Dict[str, pd.DataFrame]] = None) -> pd.DataFrame:
+    """The original path: one AIReportFull per document, dumped back to dicts, flattened column by column."""
+    ai_reports_list = [AIReportFull(**raw_report).dict(by_alias=True, exclude_none=True) for raw_report in raw_ai_reports]
+    ai_reports_df = pd.DataFrame(ai_reports_list)
+    ai_reports_df['createdAt'] = pd.to_datetime(ai_reports_df['createdAt'])
+    ai_reports_df['report_type'] = 'ai'
+    ai_reports_df['owner_id'] = ai_reports_df['student'].astype(str)
+    ai_reports_df = ai_reports_df.drop(columns=['student'], errors='ignore')
+
+    standard = ai_reports_df['standard_report'] if 'standard_report' in ai_reports_df.columns else pd.Series([None] * len(ai_reports_df))
+    demo = ai_reports_df['demo_report'] if 'demo_report' in ai_reports_df.columns else pd.Series([None] * len(ai_reports_df))
+    ai_reports_df['sentiment'] = standard.map(lambda x: nested_get(x, 'risk_assessment', 'sentiment'))
+    ai_reports_df['risk_level'] = standard.map(lambda x: nested_get(x, 'risk_assessment', 'risk_level'))
+    ai_reports_df['red_flags'] = standard.map(lambda x: as_list(nested_get(x, 'risk_assessment', 'red_flags')))
+    ai_reports_df['phq_9_score'] = standard.map(lambda x: nested_get(x, 'screening_scores', 'phq_9_score'))
+    ai_reports_df['gad_7_score'] = standard.map(lambda x: nested_get(x, 'screening_scores', 'gad_7_score'))
+    if baseline is not None:
+        # What the pipeline used to carry: the nested blobs plus the five extracted fields.
+        baseline["ai_reports_df"] = ai_reports_df.copy()
+
+    ai_reports_df['key_stressors'] = standard.map(lambda x: as_list(nested_get(x, 'analytics', 'key_stressors_identified')))
+    ai_reports_df['student_concerns'] = [
+        as_list(nested_get(s, 'summary', 'student_expressed_concerns')) + as_list(nested_get(d, 'student_expressed_concerns'))
+        for s, d in zip(standard, demo)
+    ]
+    ai_reports_df['suggested_resource_topics'] = demo.map(lambda x: as_list(nested_get(x, 'suggested_resource_topics')))
+    return ai_reports_df.drop(columns=['standard_report', 'demo_report'], errors='ignore')
+
+
+def build_ai_reports_frame(raw_ai_reports: List[Dict[str, Any]], baseline: Optional[Dict[str, pd.DataFrame]] = None, parser: Optional[str] = None) -> pd.DataFrame:
+    """
+    Flattens AI reports into the handful of columns the analytics nodes read, downcast to a
+    compact typed schema. `parser` (default ANALYTICS_AI_REPORT_PARSER):
+    - "light": single-pass extraction with orjson, no model construction; documents are not schema-validated,
+    - "bulk": one TypeAdapter(List[AIReportFull]) validation pass, then the same single-pass extraction,
+    - "model": the original per-document AIReportFull loop with dict re-serialisation.
+    The memory report needs the blob-carrying frame, so it always takes the "model" path.
+    """
+    if not raw_ai_reports:
+        logger.warning("No raw AI reports to preprocess.")
+        return pd.DataFrame()
+    parser = (parser or AI_REPORT_PARSER).lower()
+    if parser == "model" or baseline is not None:
+        ai_reports_df = _model_ai_reports_frame(raw_ai_reports, baseline)
+    elif parser == "bulk":
+        ai_reports_df = _ai_report_columns(_validated_rows(raw_ai_reports))
+    else:
+        ai_reports_df = _ai_report_columns(_light_rows(raw_ai_reports))
+    logger.info(f"Processed {len(ai_reports_df)} AI reports into DataFrame.")
+    return compact_frame(
+        ai_reports_df,
+        categorical_columns=REPORT_CATEGORICAL_COLUMNS,
+        id_columns=REPORT_ID_COLUMNS,
+        small_int_columns=SCORE_COLUMNS,
+    )
+
+
+def build_checkins_frame(raw_checkins: List[Dict[str, Any]], baseline: Optional[Dict[str, pd.DataFrame]] = None) -> pd.DataFrame:
+    if not raw_checkins:
+        logger.warning("No raw check-in data to preprocess.")
+        return pd.DataFrame()
+    checkins_df = pd.DataFrame(raw_checkins)
+    checkins_df['createdAt'] = pd.to_datetime(checkins_df['createdAt'])
+    checkins_df['student_id'] = checkins_df['student'].astype(str)
+    checkins_df = checkins_df.drop(columns=['student'], errors='ignore')
+    if baseline is not None:
+        baseline["checkins_df"] = checkins_df.copy()
+    logger.info(f"Processed {len(checkins_df)} check-ins into DataFrame.")
+    return compact_frame(checkins_df, id_columns=['student_id'], small_int_columns=['moodScore', 'stressLevel'])
+
+
+def combine_report_frames(reports_df: pd.DataFrame, ai_reports_df: pd.DataFrame) -> pd.DataFrame:
+    if reports_df.empty and ai_reports_df.empty:
+        logger.warning("No reports to combine.")
+        return pd.DataFrame()
+    combined = pd.concat([reports_df, ai_reports_df], ignore_index=True)
+    # Categoricals with differing categories concat back to object; re-apply the lean schema.
+    return compact_frame(
+        combined,
+        categorical_columns=REPORT_CATEGORICAL_COLUMNS,
+        id_columns=REPORT_ID_COLUMNS,
+        small_int_columns=SCORE_COLUMNS,
+    )
+
+
+def build_frames(
+    raw_reports: List[Dict[str, Any]],
+    raw_ai_reports: List[Dict[str, Any]],
+    raw_checkins: List[Dict[str, Any]],
+    memory_report: bool = False,
+) -> Dict[str, pd.DataFrame]:
+    """Raw documents -> the compact reports_df / ai_reports_df / checkins_df frames."""
+    # Measuring the baseline means materialising the old blob-carrying frames and their concat, so it is opt-in.
+    baseline: Optional[Dict[str, pd.DataFrame]] = {} if memory_report else None
+    frames = {
+        "reports_df": build_reports_frame(raw_reports, baseline),
+        "ai_reports_df": build_ai_reports_frame(raw_ai_reports, baseline),
+        "checkins_df": build_checkins_frame(raw_checkins, baseline),
+    }
+    if baseline:
+        baseline["combined_reports_df"] = pd.concat(
+            [baseline.get("reports_df", pd.DataFrame()), baseline.get("ai_reports_df", pd.DataFrame())],
+            ignore_index=True,
+        )
+        after = dict(frames, combined_reports_df=combine_report_frames(frames["reports_df"], frames["ai_reports_df"]))
+        log_memory_report(
+            {name: frame_memory_bytes(df) for name, df in baseline.items()},
+            {name: frame_memory_bytes(after[name]) for name in baseline},
+        )
+    return frames
+
+
+_fetcher = None
+
+def fetch_and_build_frames(
+    period_start: Optional[datetime],
+    period_end: Optional[datetime],
+    memory_report: bool = False,
+    cohort: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> Dict[str, bytes]:
+    """
+    Process-pool entry point: fetches the period's reports and check-ins (restricted by the
+    DataFetcher.cohort_predicates in `cohort`, if any) with this worker's own Mongo connection, builds the frames, and returns them
+    as Arrow IPC bytes, so neither the raw documents nor pickled row dicts cross the process boundary.
+    """
+    global _fetcher
+    if _fetcher is None:
+        from app.services.data_fetcher import DataFetcher
+        _fetcher = DataFetcher()
+    frames = build_frames(
+        _fetcher.fetch_all_reports(start_date=period_start, end_date=period_end, cohort=cohort),
+        _fetcher.fetch_all_ai_reports(start_date=period_start, end_date=period_end, cohort=cohort),
+        _fetcher.fetch_all_checkins(start_date=period_start, end_date=period_end, cohort=cohort),
+        memory_report=memory_report,
+    )
+    return frames_to_ipc(frames)
@@ -2,15 +2,27 @@
 
 from ..agents.supervisor import graph_app, AgentState
 from ..utils.logger import get_logger
+from .single_flight import SingleFlight, content_key
+from .recommended_resources import recommended_resources
 from typing import Dict, Any
 
 logger = get_logger(__name__)
 
+# Retries and double submits of the same conversation share one pipeline run
+report_flight = SingleFlight("report")
+
 async def generate_student_report(conversation_history: str) -> Dict[str, Any]:
     """
     Runs the full agentic workflow to generate student and admin reports.
     Returns a dict containing both demo_report and standard_report.
+    Identical concurrent requests are coalesced into a single run.
     """
+    return await report_flight.do(
+        content_key("report", conversation_history),
+        lambda: _run_report_workflow(conversation_history),
+    )
+
+async def _run_report_workflow(conversation_history: str) -> Dict[str, Any]:
     logger.info("Starting report generation service...")
 
     # Initialize agent state
@@ -23,6 +35,9 @@ async def generate_student_report(conversation_history: str) -> Dict[str, Any]:
         # Ensure final_report exists
         if final_state and final_state.get("final_report"):
             logger.info("Successfully generated final report.")
+            # The backend builds the pathway from these stressors; fetch its resources ahead of the request.
+            analytics = final_state["final_report"]["standard_report"].get("analytics") or {}
+            recommended_resources.prefetch(analytics.get("key_stressors_identified") or [], "en")
             return final_state["final_report"]
         else:
             logger.error("Report generation returned an empty final state.")
@@ -0,0 +1,297 @@
+# agentic-server/app/services/resource_index.py
+
+import os
+import re
+import math
+import time
+import asyncio
+import threading
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from app.db.connect import get_db
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BACKEND_API_URL = os.getenv("BACKEND_API_URL", "http://localhost:5000/api")
+
+RESOURCE_INDEX_ENABLED = os.getenv("RESOURCE_INDEX", "true").lower() in ("1", "true", "yes")
+RESOURCE_INDEX_SYNC_SECONDS = float(os.getenv("RESOURCE_INDEX_SYNC_SECONDS", "300"))
+# A topic is answered from the index alone when it has at least this many good matches...
+RESOURCE_INDEX_MIN_HITS = int(os.getenv("RESOURCE_INDEX_MIN_HITS", "3"))
+# ...where a good match contains at least this share of the topic's terms.
+RESOURCE_INDEX_MIN_COVERAGE = float(os.getenv("RESOURCE_INDEX_MIN_COVERAGE", "0.5"))
+RESOURCE_INDEX_TOP_K = int(os.getenv("RESOURCE_INDEX_TOP_K", "5"))
+# Web search results enter the index once they have been returned for this many report topics.
+RESOURCE_INDEX_VETTED_MIN_HITS = int(os.getenv("RESOURCE_INDEX_VETTED_MIN_HITS", "1"))
+
+CATALOG_COLLECTION = "psychoeducationalresources"
+VETTED_COLLECTION = "vettedresources"
+
+# BM25 parameters and per-field term weights (title and tags count more than the description).
+BM25_K1 = 1.2
+BM25_B = 0.75
+FIELD_WEIGHTS = {"title": 2, "tags": 2, "description": 1}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an and are as at be by for from how in into is it of on or the to with your you for about over students student
+""".split())
+
+
+def tokenize(text: Any) -> List[str]:
+    """Lowercased word tokens without stopwords, with plurals folded ("strategies" -> "strategy")."""
+    tokens = []
+    for token in _TOKEN_RE.findall(str(text or "").lower()):
+        if token in _STOPWORDS or len(token) < 2:
+            continue
+        if len(token) > 4 and token.endswith("ies"):
+            token = token[:-3] + "y"
+        elif len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def to_retriever_resource(item: Dict[str, Any], topic: str) -> Optional[Dict[str, Any]]:
+    """Maps a backend PsychoeducationalResource to the retriever's resource shape; None without a URL."""
+    resource_url = item.get("url")
+    file_public_url = None
+    if item.get("file") and item["file"].get("url"):
+        # Construct full public URL for locally uploaded files
+        file_public_url = f"{BACKEND_API_URL.replace('/api', '')}{item['file']['url']}"
+        resource_url = file_public_url  # Use file_url as primary if present
+    if not resource_url:
+        return None
+
+    # Map backend resource types to types expected by report generator
+    mapped_type = "video" if item.get("type") in ["video", "audio"] else "article"
+    return {
+        "title": item.get("title") or "Untitled Internal Resource",
+        "url": resource_url,
+        "file_url": file_public_url,
+        "description": item.get("description") or "",
+        "type": mapped_type,
+        "source_tool": "internal_vetted_db",
+        "source_topic": item.get("category", [])[0] if item.get("category") else topic,
+    }
+
+
+class _Catalog:
+    """Immutable BM25 index over a resource list; rebuilt whole on every sync and swapped in."""
+
+    def __init__(self, resources: List[Dict[str, Any]], fields: List[Dict[str, List[str]]]):
+        self.resources = resources
+        self.postings: Dict[str, List[Tuple[int, float]]] = defaultdict(list)
+        self.lengths: List[float] = []
+        for doc_id, doc_fields in enumerate(fields):
+            tf: Counter = Counter()
+            for field, tokens in doc_fields.items():
+                for token in tokens:
+                    tf[token] += FIELD_WEIGHTS[field]
+            for token, count in tf.items():
+                self.postings[token].append((doc_id, count))
+            self.lengths.append(float(sum(tf.values())))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.norms = [BM25_K1 * (1 - BM25_B + BM25_B * length / self.avg_length) for length in self.lengths]
+        n = len(resources)
+        self.idf = {t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()}
+
+    def search(self, terms: List[str], language: Optional[str], limit: int) -> List[Tuple[Dict[str, Any], float, float]]:
+        """(resource, bm25 score, share of query terms matched), best first."""
+        terms = list(dict.fromkeys(terms))
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Counter = Counter()
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + self.norms[doc_id])
+                matched[doc_id] += 1
+        hits = []
+        for doc_id, score in scores.items():
+            resource = self.resources[doc_id]
+            if language and resource.get("language") not in (None, language):
+                continue
+            hits.append((resource, score, matched[doc_id] / len(terms)))
+        hits.sort(key=lambda h: (-h[1], h[0]["url"]))
+        return hits[:limit]
+
+
+class ResourceIndex:
+    """
+    In-memory BM25 index over the backend's approved PsychoeducationalResource documents plus web
+    search results the retriever has returned before (`vettedresources`), so common topics are
+    answered locally and live web search is only needed for topics with too few good matches.
+
+    The catalog is read straight from Mongo (the same database the backend writes) and rebuilt every
+    RESOURCE_INDEX_SYNC_SECONDS; searches read the last complete build, never a partial one.
+    """
+
+    def __init__(self, db=None):
+        self._db = db
+        self._catalog: Optional[_Catalog] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.synced_at: Optional[datetime] = None
+        self._topics = 0
+        self._covered = 0
+
+    @property
+    def db(self):
+        if self._db is None:
+            self._db = get_db()
+        return self._db
+
+    @property
+    def ready(self) -> bool:
+        return self._catalog is not None
+
+    @property
+    def size(self) -> int:
+        return len(self._catalog.resources) if self._catalog is not None else 0
+
+    # ---------------- Sync ---------------- #
+
+    def _catalog_resources(self) -> Iterable[Tuple[Dict[str, Any], Dict[str, List[str]]]]:
+        projection = {"title": 1, "description": 1, "url": 1, "file": 1, "type": 1, "language": 1, "category": 1}
+        for item in self.db[CATALOG_COLLECTION].find({"isApproved": {"$ne": False}}, projection):
+            resource = to_retriever_resource(item, "")
+            if resource is None:
+                continue
+            resource["language"] = item.get("language")
+            yield resource, {
+                "title": tokenize(item.get("title")),
+                "tags": [t for c in item.get("category") or [] for t in tokenize(c)],
+                "description": tokenize(item.get("description")),
+            }
+
+    def _vetted_resources(self) -> Iterable[Tuple[Dict[str, Any], Dict[str, List[str]]]]:
+        query = {"hits": {"$gte": RESOURCE_INDEX_VETTED_MIN_HITS}}
+        for item in self.db[VETTED_COLLECTION].find(query):
+            topics = item.get("topics") or []
+            resource = {
+                "title": item.get("title") or "Untitled",
+                "url": item["_id"],
+                "file_url": None,
+                "description": item.get("description") or "",
+                "type": item.get("type") or "article",
+                "source_tool": item.get("source_tool") or "vetted_search",
+                "source_topic": topics[0] if topics else "",
+                "language": item.get("language"),
+            }
+            yield resource, {
+                "title": tokenize(resource["title"]),
+                "tags": [t for topic in topics for t in tokenize(topic)],
+                "description": tokenize(resource["description"]),
+            }
+
+    def sync(self) -> int:
+        """Rebuilds the index from Mongo; returns the number of indexed resources. Blocking."""
+        with self._lock:
+            started = time.perf_counter()
+            resources: List[Dict[str, Any]] = []
+            fields: List[Dict[str, List[str]]] = []
+            seen = set()
+            # Catalog first, so a URL that is both vetted by an admin and found by search keeps the catalog entry.
+            for source in (self._catalog_resources(), self._vetted_resources()):
+                for resource, doc_fields in source:
+                    if resource["url"] in seen:
+                        continue
+                    seen.add(resource["url"])
+                    resources.append(resource)
+                    fields.append(doc_fields)
+            self._catalog = _Catalog(resources, fields)
+            self.synced_at = datetime.now(timezone.utc)
+            logger.info(f"ResourceIndex: indexed {len(resources)} resources in {(time.perf_counter() - started) * 1000:.0f}ms.")
+            return len(resources)
+
+    def remember(self, topic: str, resources: List[Dict[str, Any]], language: Optional[str] = None) -> None:
+        """Records web search results returned for a topic so later syncs can serve them locally. Blocking."""
+        now = datetime.now(timezone.utc)
+        ops = []
+        for r in resources:
+            url = (r.get("url") or "").strip()
+            if not url or r.get("source_tool") == "internal_vetted_db":
+                continue
+            ops.append(UpdateOne(
+                {"_id": url},
+                {
+                    "$set": {"title": r.get("title"), "description": r.get("description"), "type": r.get("type"),
+                             "source_tool": r.get("source_tool"), "language": language, "lastSeenAt": now},
+                    "$addToSet": {"topics": topic},
+                    "$inc": {"hits": 1},
+                    "$setOnInsert": {"firstSeenAt": now},
+                },
+                upsert=True,
+            ))
+        if ops:
+            self.db[VETTED_COLLECTION].bulk_write(ops, ordered=False)
+
+    # ---------------- Search ---------------- #
+
+    def search(self, topic: str, language: Optional[str] = None, limit: int = RESOURCE_INDEX_TOP_K) -> List[Dict[str, Any]]:
+        """Good matches for a topic, best first, as retriever resources tagged with the topic."""
+        catalog = self._catalog
+        terms = tokenize(topic)
+        if catalog is None or not terms:
+            return []
+        results = []
+        for resource, score, coverage in catalog.search(terms, language, limit):
+            if coverage < RESOURCE_INDEX_MIN_COVERAGE:
+                continue
+            hit = {k: v for k, v in resource.items() if k != "language"}
+            hit["source_topic"] = topic
+            hit["index_score"] = round(score, 3)
+            results.append(hit)
+        return results
+
+    def covers(self, hits: List[Dict[str, Any]]) -> bool:
+        """True when the hits for a topic are enough to skip live web search for it."""
+        covered = len(hits) >= RESOURCE_INDEX_MIN_HITS
+        self._topics += 1
+        self._covered += covered
+        return covered
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "resources": self.size,
+            "synced_at": self.synced_at.isoformat() if self.synced_at else None,
+            "topics": self._topics,
+            "topics_answered_locally": self._covered,
+            "local_hit_rate": round(self._covered / self._topics, 3) if self._topics else None,
+        }
+
+    # ---------------- Lifecycle ---------------- #
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sync)
+            except PyMongoError as e:
+                logger.warning(f"ResourceIndex: sync failed, keeping the previous index: {e}")
+            await asyncio.sleep(RESOURCE_INDEX_SYNC_SECONDS)
+
+    def start(self) -> None:
+        if RESOURCE_INDEX_ENABLED and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except (asyncio.CancelledError, Exception):
+            pass
+        self._task = None
+
+
+resource_index = ResourceIndex()
@@ -0,0 +1,178 @@
+# agentic-server/app/services/risk_trajectories.py
+
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from pymongo import ASCENDING, UpdateOne
+
+from app.db.connect import get_db
+from app.services.report_frames import embedded_json
+from app.utils.frames import nested_get
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ANALYTICS_RISK_TRAJECTORIES = os.getenv("ANALYTICS_RISK_TRAJECTORIES", "true").lower() in ("1", "true", "yes")
+# Check-ins and AI report scores kept per student, and how many latest check-ins the rolling means cover.
+RISK_TRAJECTORY_CHECKINS = int(os.getenv("RISK_TRAJECTORY_CHECKINS", "10"))
+RISK_TRAJECTORY_REPORTS = int(os.getenv("RISK_TRAJECTORY_REPORTS", "5"))
+RISK_TRAJECTORY_MEAN_WINDOW = int(os.getenv("RISK_TRAJECTORY_MEAN_WINDOW", "3"))
+RISK_TRAJECTORY_BATCH_SIZE = int(os.getenv("RISK_TRAJECTORY_BATCH_SIZE", "1000"))
+# The index describes students as of now, so only snapshots ending at most this long ago read it.
+RISK_TRAJECTORY_MAX_LAG_HOURS = float(os.getenv("RISK_TRAJECTORY_MAX_LAG_HOURS", "24"))
+
+WATERMARK_ID = "_watermark"
+SOURCE_COLLECTIONS = ("studentcheckins", "aireports")
+
+
+def _mean(values: List[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 3) if values else None
+
+
+def _trend(values: List[Optional[int]]) -> Optional[int]:
+    """Latest minus earliest known score; positive means worsening."""
+    known = [v for v in values if v is not None]
+    return known[-1] - known[0] if len(known) >= 2 else None
+
+
+class RiskTrajectoryIndex:
+    """
+    One document per student in `studentrisktrajectories`: the last RISK_TRAJECTORY_CHECKINS
+    check-ins, the last RISK_TRAJECTORY_REPORTS AI report risk levels and PHQ-9/GAD-7 scores, and
+    fields derived from them (rolling mood/stress means, latest risk level, score trends), indexed
+    so outreach candidates are found with one query.
+
+    It is maintained incrementally: `catch_up` tails check-ins and AI reports from a stored
+    (createdAt, _id) watermark and folds only the new documents in, touching only their students.
+    """
+
+    def __init__(self, db=None):
+        self.db = db if db is not None else get_db()
+        self.collection = self.db["studentrisktrajectories"]
+        self._lock = threading.Lock()
+
+    def ensure_indexes(self) -> None:
+        self.collection.create_index([("moodMean", ASCENDING), ("meanWindow", ASCENDING)])
+        self.collection.create_index([("stressMean", ASCENDING), ("meanWindow", ASCENDING)])
+        self.collection.create_index([("latestRiskLevel", ASCENDING)])
+        for name in SOURCE_COLLECTIONS:
+            self.db[name].create_index([("createdAt", ASCENDING), ("_id", ASCENDING)])
+
+    # ---------------- Incremental maintenance ---------------- #
+
+    def _watermarks(self) -> Dict[str, Dict[str, Any]]:
+        doc = self.collection.find_one({"_id": WATERMARK_ID}) or {}
+        return doc.get("positions", {})
+
+    def _tail(self, name: str, position: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if not position:
+            query: Dict[str, Any] = {}
+        else:
+            query = {"$or": [
+                {"createdAt": {"$gt": position["createdAt"]}},
+                {"createdAt": position["createdAt"], "_id": {"$gt": position["_id"]}},
+            ]}
+        cursor = self.db[name].find(query).sort([("createdAt", ASCENDING), ("_id", ASCENDING)]).limit(RISK_TRAJECTORY_BATCH_SIZE)
+        return list(cursor)
+
+    def catch_up(self) -> int:
+        """Folds in every check-in and AI report created since the last call; returns how many. Blocking."""
+        with self._lock:
+            positions = self._watermarks()
+            applied = 0
+            for name in SOURCE_COLLECTIONS:
+                while True:
+                    docs = self._tail(name, positions.get(name))
+                    if not docs:
+                        break
+                    self.apply(name, docs)
+                    applied += len(docs)
+                    positions[name] = {"createdAt": docs[-1]["createdAt"], "_id": docs[-1]["_id"]}
+                    self.collection.update_one({"_id": WATERMARK_ID}, {"$set": {"positions": positions}}, upsert=True)
+                    if len(docs) < RISK_TRAJECTORY_BATCH_SIZE:
+                        break
+            if applied:
+                logger.info(f"RiskTrajectoryIndex: folded in {applied} new check-ins/AI reports.")
+            return applied
+
+    def apply(self, name: str, docs: Iterable[Dict[str, Any]]) -> Set[str]:
+        """Appends new check-ins or AI reports to their students' trajectories and refreshes the derived fields."""
+        by_student: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for doc in docs:
+            if name == "studentcheckins" and doc.get("student") is not None:
+                by_student[str(doc["student"])].append({
+                    "id": doc["_id"], "createdAt": doc.get("createdAt"),
+                    "moodScore": doc.get("moodScore"), "stressLevel": doc.get("stressLevel"),
+                })
+            elif name == "aireports" and doc.get("student") is not None:
+                standard = embedded_json(doc.get("standard_report"), "standard_content")
+                by_student[str(doc["student"])].append({
+                    "id": doc["_id"], "createdAt": doc.get("createdAt"),
+                    "riskLevel": nested_get(standard, "risk_assessment", "risk_level"),
+                    "phq9": nested_get(standard, "screening_scores", "phq_9_score"),
+                    "gad7": nested_get(standard, "screening_scores", "gad_7_score"),
+                })
+        if not by_student:
+            return set()
+
+        field, kept, counter = ("recentCheckins", RISK_TRAJECTORY_CHECKINS, "checkinCount") if name == "studentcheckins" \
+            else ("recentScores", RISK_TRAJECTORY_REPORTS, "reportCount")
+        ops = []
+        for student, entries in by_student.items():
+            ops.append(UpdateOne({"_id": student}, {"$setOnInsert": {"checkinCount": 0, "reportCount": 0}}, upsert=True))
+            # Skipped if any of these entries is already in the trajectory (a replayed batch).
+            ops.append(UpdateOne(
+                {"_id": student, f"{field}.id": {"$nin": [e["id"] for e in entries]}},
+                {
+                    "$push": {field: {"$each": entries, "$sort": {"createdAt": 1}, "$slice": -kept}},
+                    "$inc": {counter: len(entries)},
+                },
+            ))
+        self.collection.bulk_write(ops, ordered=True)
+        self._refresh(list(by_student))
+        return set(by_student)
+
+    def _refresh(self, students: List[str]) -> None:
+        ops = []
+        now = datetime.now(timezone.utc)
+        for doc in self.collection.find({"_id": {"$in": students}}):
+            checkins = doc.get("recentCheckins", [])
+            recent = checkins[-RISK_TRAJECTORY_MEAN_WINDOW:]
+            scores = doc.get("recentScores", [])
+            latest = scores[-1] if scores else {}
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {
+                "moodMean": _mean([c["moodScore"] for c in recent if c.get("moodScore") is not None]),
+                "stressMean": _mean([c["stressLevel"] for c in recent if c.get("stressLevel") is not None]),
+                "meanWindow": len(recent),
+                "lastCheckinAt": checkins[-1]["createdAt"] if checkins else None,
+                "latestRiskLevel": latest.get("riskLevel"),
+                "latestRiskAt": latest.get("createdAt"),
+                "phq9Trend": _trend([s.get("phq9") for s in scores]),
+                "gad7Trend": _trend([s.get("gad7") for s in scores]),
+                "updatedAt": now,
+            }}))
+        if ops:
+            self.collection.bulk_write(ops, ordered=False)
+
+    # ---------------- Reads ---------------- #
+
+    def get(self, student_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection.find_one({"_id": str(student_id)})
+
+    def outreach_candidates(self, student_ids: Optional[Iterable[str]] = None, mood_max: float = 2, stress_min: float = 4) -> List[Dict[str, Any]]:
+        """Students whose rolling mood or stress mean crosses the outreach thresholds, or whose latest AI risk is high."""
+        query: Dict[str, Any] = {"$or": [
+            {"moodMean": {"$lte": mood_max}, "meanWindow": {"$gte": RISK_TRAJECTORY_MEAN_WINDOW}},
+            {"stressMean": {"$gte": stress_min}, "meanWindow": {"$gte": RISK_TRAJECTORY_MEAN_WINDOW}},
+            {"latestRiskLevel": {"$in": ["High", "high"]}},
+        ]}
+        if student_ids is not None:
+            query["_id"] = {"$in": list(student_ids)}
+        projection = {"recentCheckins": 0, "recentScores": 0}
+        return list(self.collection.find(query, projection))
+
+
+risk_trajectories = RiskTrajectoryIndex()
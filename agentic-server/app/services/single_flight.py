@@ -0,0 +1,75 @@
+# agentic-server/app/services/single_flight.py
+
+import os
+import copy
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# How long a finished result keeps answering identical requests (0 disables retention).
+SINGLE_FLIGHT_TTL_SECONDS = float(os.getenv("SINGLE_FLIGHT_TTL_SECONDS", "10"))
+SINGLE_FLIGHT_MAX_ENTRIES = int(os.getenv("SINGLE_FLIGHT_MAX_ENTRIES", "256"))
+
+
+def content_key(*parts: Any) -> str:
+    """Stable SHA-256 over JSON-serialisable request parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls: the first caller for a key starts the work, later callers
+    await the same task. The work runs detached from any one caller, so a caller that disconnects
+    does not cancel it for the others. Successful results are optionally retained for `ttl`
+    seconds; failures are never retained. Every caller gets its own deep copy of the result.
+    """
+
+    def __init__(self, name: str, ttl: float = SINGLE_FLIGHT_TTL_SECONDS, max_entries: int = SINGLE_FLIGHT_MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._in_flight: Dict[str, "asyncio.Task[Any]"] = {}
+        self._recent: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._counters: Dict[str, int] = {"runs": 0, "joined": 0, "recent_hits": 0, "failures": 0}
+
+    def _remember(self, key: str, task: "asyncio.Task[Any]") -> None:
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            self._counters["failures"] += 1
+            return
+        if self.ttl > 0:
+            self._recent[key] = (time.monotonic() + self.ttl, task.result())
+            self._recent.move_to_end(key)
+            while len(self._recent) > self.max_entries:
+                self._recent.popitem(last=False)
+
+    async def do(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        recent = self._recent.get(key)
+        if recent is not None:
+            if recent[0] > time.monotonic():
+                self._counters["recent_hits"] += 1
+                logger.info(f"SingleFlight[{self.name}]: served {key[:12]} from a result finished moments ago.")
+                return copy.deepcopy(recent[1])
+            del self._recent[key]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self._counters["runs"] += 1
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t: self._remember(key, t))
+        else:
+            self._counters["joined"] += 1
+            logger.info(f"SingleFlight[{self.name}]: joined in-flight run for {key[:12]}.")
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._in_flight), "retained": len(self._recent), **self._counters}
@@ -0,0 +1,176 @@
+# agentic-server/app/services/theme_clustering.py
+
+import os
+import re
+import zlib
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+THEME_CLUSTERS = int(os.getenv("ANALYTICS_THEME_CLUSTERS", "12"))
+EXEMPLARS_PER_CLUSTER = int(os.getenv("ANALYTICS_THEME_EXEMPLARS", "3"))
+HASH_FEATURES = 2 ** 12
+BATCH_SIZE = 1024
+EXEMPLAR_CHARS = 400
+
+_TOKEN_RE = re.compile(r"[a-z][a-z']+")
+_STOPWORDS = frozenset("""
+a about above after again all am an and any are as at be because been before being below between both but by
+can could did do does doing down during each few for from further had has have having he her here hers him his
+how i if in into is it its just me more most my no nor not now of off on once only or other our out over own
+same she should so some such than that the their them then there these they this those through to too under
+until up very was we were what when where which while who whom why will with would you your yours im ive dont
+cant feel feeling really like also get got even much many still
+""".split())
+
+
+class ThemeCluster(BaseModel):
+    size: int
+    share: float
+    keywords: List[str] = Field(default_factory=list)
+    exemplars: List[str] = Field(default_factory=list)
+
+
+def _tokens(text: str) -> List[str]:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def _bucket(term: str) -> int:
+    # crc32 rather than hash(): stable across processes, so clusters are reproducible.
+    return zlib.crc32(term.encode("utf-8")) % HASH_FEATURES
+
+
+def _hashed_ngrams(texts: Iterable[str]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sparse (CSR arrays) unigram+bigram counts per text, hashed into HASH_FEATURES buckets."""
+    indptr, indices, counts = [0], [], []
+    for text in texts:
+        tokens = _tokens(text)
+        grams = Counter(_bucket(t) for t in tokens)
+        grams.update(_bucket(f"{a} {b}") for a, b in zip(tokens, tokens[1:]))
+        indices.extend(grams.keys())
+        counts.extend(grams.values())
+        indptr.append(len(indices))
+    return np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int32), np.asarray(counts, dtype=np.float32)
+
+
+class _TfidfRows:
+    """Hashed TF-IDF matrix kept sparse; dense row batches are materialised on demand."""
+
+    def __init__(self, texts: List[str]):
+        self.indptr, self.indices, counts = _hashed_ngrams(texts)
+        self.n_rows = len(texts)
+        df = np.bincount(self.indices, minlength=HASH_FEATURES)
+        idf = np.log((1 + self.n_rows) / (1 + df)).astype(np.float32) + 1.0
+        self.data = (1.0 + np.log(counts)) * idf[self.indices]  # sublinear tf
+        row_ids = np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+        norms = np.sqrt(np.bincount(row_ids, weights=self.data ** 2, minlength=self.n_rows)).astype(np.float32)
+        norms[norms == 0] = 1.0
+        self.data /= norms[row_ids]
+
+    def dense(self, rows: np.ndarray) -> np.ndarray:
+        out = np.zeros((len(rows), HASH_FEATURES), dtype=np.float32)
+        for i, row in enumerate(rows):
+            lo, hi = self.indptr[row], self.indptr[row + 1]
+            out[i, self.indices[lo:hi]] = self.data[lo:hi]
+        return out
+
+    def batches(self, size: int = BATCH_SIZE):
+        for start in range(0, self.n_rows, size):
+            rows = np.arange(start, min(start + size, self.n_rows))
+            yield rows, self.dense(rows)
+
+
+def _mini_batch_kmeans(matrix: _TfidfRows, k: int, rng: np.random.Generator, iterations: int = 30) -> np.ndarray:
+    """
+    Spherical mini-batch k-means (Sculley, 2010) on L2-normalised rows, seeded with k-means++
+    on a sample. Returns the (k, HASH_FEATURES) unit-norm centroids.
+    """
+    seed_rows = rng.choice(matrix.n_rows, size=min(matrix.n_rows, max(BATCH_SIZE, 10 * k)), replace=False)
+    sample = matrix.dense(seed_rows)
+    centroids = [sample[rng.integers(len(sample))]]
+    closest = 1.0 - sample @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(closest, 0, None)
+        total = weights.sum()
+        pick = rng.choice(len(sample), p=weights / total) if total > 0 else rng.integers(len(sample))
+        centroids.append(sample[pick])
+        closest = np.minimum(closest, 1.0 - sample @ sample[pick])
+    centroids = np.vstack(centroids)
+
+    seen = np.zeros(k, dtype=np.int64)
+    for _ in range(iterations):
+        rows = rng.choice(matrix.n_rows, size=min(BATCH_SIZE, matrix.n_rows), replace=False)
+        batch = matrix.dense(rows)
+        labels = np.argmax(batch @ centroids.T, axis=1)
+        for c in np.unique(labels):
+            members = batch[labels == c]
+            seen[c] += len(members)
+            rate = len(members) / seen[c]
+            centroids[c] = (1 - rate) * centroids[c] + rate * members.mean(axis=0)
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1.0, norms)
+    return centroids
+
+
+def cluster_themes(texts: List[str], n_clusters: Optional[int] = None, exemplars_per_cluster: int = EXEMPLARS_PER_CLUSTER, seed: int = 0) -> List[ThemeCluster]:
+    """
+    Groups report texts into clusters and returns them largest first, each with its size,
+    share of all texts, top keywords and the exemplars closest to its centroid. Runs in
+    O(n) memory over the sparse matrix, so the whole period can be clustered on CPU.
+    """
+    texts = [t.strip() for t in texts if isinstance(t, str) and t.strip()]
+    if not texts:
+        return []
+    k = max(1, min(n_clusters or THEME_CLUSTERS, len(texts)))
+    rng = np.random.default_rng(seed)
+
+    matrix = _TfidfRows(texts)
+    centroids = _mini_batch_kmeans(matrix, k, rng)
+
+    labels = np.empty(matrix.n_rows, dtype=np.int64)
+    similarity = np.empty(matrix.n_rows, dtype=np.float32)
+    for rows, batch in matrix.batches():
+        scores = batch @ centroids.T
+        labels[rows] = np.argmax(scores, axis=1)
+        similarity[rows] = scores[np.arange(len(rows)), labels[rows]]
+
+    clusters: List[ThemeCluster] = []
+    for c in range(k):
+        members = np.flatnonzero(labels == c)
+        if len(members) == 0:
+            continue
+        closest = members[np.argsort(-similarity[members], kind="stable")]
+        seen_texts, exemplars = set(), []
+        for row in closest:
+            text = texts[row][:EXEMPLAR_CHARS]
+            if text not in seen_texts:
+                seen_texts.add(text)
+                exemplars.append(text)
+            if len(exemplars) == exemplars_per_cluster:
+                break
+        words = Counter(t for row in closest[:500] for t in set(_tokens(texts[row])))
+        clusters.append(ThemeCluster(
+            size=int(len(members)),
+            share=len(members) / len(texts),
+            keywords=[w for w, _ in words.most_common(6)],
+            exemplars=exemplars,
+        ))
+    clusters.sort(key=lambda cl: cl.size, reverse=True)
+    logger.info(f"Clustered {len(texts)} report texts into {len(clusters)} theme clusters.")
+    return clusters
+
+
+def format_theme_digest(clusters: List[ThemeCluster]) -> str:
+    """Compact, stratified prompt text: one block per cluster, rare clusters included."""
+    blocks = []
+    for i, cl in enumerate(clusters, 1):
+        lines = [f"Cluster {i}: {cl.size} reports ({cl.share:.1%}); keywords: {', '.join(cl.keywords) or 'n/a'}"]
+        lines.extend(f"- {text}" for text in cl.exemplars)
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
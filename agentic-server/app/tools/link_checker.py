@@ -0,0 +1,190 @@
+# app/tools/link_checker.py
+
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from ..services.single_flight import SingleFlight
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+LINK_CHECK_ENABLED = os.getenv("LINK_CHECK", "true").lower() in ("1", "true", "yes")
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "8"))
+LINK_CHECK_TIMEOUT_SECONDS = float(os.getenv("LINK_CHECK_TIMEOUT_SECONDS", "3"))
+# Wall-clock cap for one batch; links still unchecked when it runs out are kept.
+LINK_CHECK_BUDGET_SECONDS = float(os.getenv("LINK_CHECK_BUDGET_SECONDS", "5"))
+LINK_CHECK_ALIVE_TTL_SECONDS = float(os.getenv("LINK_CHECK_ALIVE_TTL_SECONDS", "21600"))
+LINK_CHECK_DEAD_TTL_SECONDS = float(os.getenv("LINK_CHECK_DEAD_TTL_SECONDS", "900"))
+LINK_CHECK_MAX_ENTRIES = int(os.getenv("LINK_CHECK_MAX_ENTRIES", "10000"))
+
+_TRAILING_PUNCTUATION = ".,;:!?'\"*"
+_TRACKING_PARAMS = frozenset({"fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid", "ref", "ref_src", "si", "feature", "_hsenc", "_hsmi"})
+_YOUTUBE_HOSTS = frozenset({"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com", "youtube-nocookie.com", "www.youtube-nocookie.com"})
+_YOUTUBE_PATH_PREFIXES = ("/shorts/", "/embed/", "/live/", "/v/")
+# Servers that reject HEAD (or answer it differently from GET) get a GET before being called dead.
+_RETRY_WITH_GET = frozenset({400, 403, 404, 405, 406, 429, 500, 501, 503})
+# Only these say the resource is gone. 401/403 (bot walls), 429 and 5xx say nothing about the
+# link itself, so they give no verdict.
+_DEAD_STATUSES = frozenset({404, 410})
+
+
+def canonical_url(url: str) -> str:
+    """
+    One spelling per resource: lowercase scheme/host, no default port, fragment or tracking
+    parameters, sorted query, and every YouTube video form as https://www.youtube.com/watch?v=ID.
+    Unparseable input is returned stripped.
+    """
+    url = (url or "").strip().rstrip(_TRAILING_PUNCTUATION)
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not host:
+        return url
+
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.lower().startswith("utm_") and k.lower() not in _TRACKING_PARAMS]
+    path = parts.path or "/"
+
+    video_id = None
+    if host == "youtu.be":
+        video_id = path.strip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS:
+        if path.rstrip("/") == "/watch":
+            video_id = dict(query).get("v")
+        elif path.startswith(_YOUTUBE_PATH_PREFIXES):
+            video_id = path.split("/")[2]
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    netloc = host if port is None or (scheme, port) in (("http", 80), ("https", 443)) else f"{host}:{port}"
+    if len(path) > 1:
+        path = path.rstrip("/")
+    return urlunsplit((scheme, netloc, path, urlencode(sorted(query)), ""))
+
+
+class LinkChecker:
+    """
+    Checks that links are reachable before they reach a report. Each URL gets a HEAD (and a GET
+    when the HEAD is refused) under a per-request timeout, at most LINK_CHECK_CONCURRENCY at a
+    time. A link is dead on 404/410 or when it cannot be connected to (DNS, refused, TLS). Verdicts
+    are cached per canonical URL: live links for LINK_CHECK_ALIVE_TTL_SECONDS, dead ones for the
+    shorter LINK_CHECK_DEAD_TTL_SECONDS. Timeouts and other error statuses (bot walls, rate
+    limits, server errors) give no verdict and are not cached; the link is kept, so a slow or
+    unfriendly site does not empty the report.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None, concurrency: int = LINK_CHECK_CONCURRENCY,
+                 timeout: float = LINK_CHECK_TIMEOUT_SECONDS, max_entries: int = LINK_CHECK_MAX_ENTRIES):
+        self.transport = transport
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._flight = SingleFlight("link-check", ttl=0)
+        # canonical url -> (expires at, alive, status)
+        self._verdicts: "OrderedDict[str, Tuple[float, bool, Optional[int]]]" = OrderedDict()
+        self._counters: Dict[str, int] = {"checks": 0, "cache_hits": 0, "alive": 0, "dead": 0, "unknown": 0}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self.transport,
+                follow_redirects=True,
+                timeout=self.timeout,
+                headers={"User-Agent": "Mozilla/5.0 (compatible; wellness-link-check/1.0)"},
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    def cached(self, url: str) -> Optional[bool]:
+        entry = self._verdicts.get(url)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._verdicts[url]
+            return None
+        self._verdicts.move_to_end(url)
+        return entry[1]
+
+    def _store(self, url: str, alive: bool, status: Optional[int]) -> None:
+        ttl = LINK_CHECK_ALIVE_TTL_SECONDS if alive else LINK_CHECK_DEAD_TTL_SECONDS
+        self._verdicts[url] = (time.monotonic() + ttl, alive, status)
+        self._verdicts.move_to_end(url)
+        while len(self._verdicts) > self.max_entries:
+            self._verdicts.popitem(last=False)
+
+    async def _probe(self, url: str) -> Optional[bool]:
+        client = self._get_client()
+        async with self._semaphore:
+            self._counters["checks"] += 1
+            try:
+                response = await client.head(url)
+                if response.status_code in _RETRY_WITH_GET:
+                    async with client.stream("GET", url) as streamed:
+                        response = streamed
+            except httpx.TimeoutException:
+                self._counters["unknown"] += 1
+                logger.debug(f"[link_check] timeout: {url}")
+                return None
+            except httpx.HTTPError as e:
+                # DNS failures, refused connections, TLS errors, redirect loops.
+                self._counters["dead"] += 1
+                self._store(url, False, None)
+                logger.debug(f"[link_check] dead ({type(e).__name__}): {url}")
+                return False
+        if response.status_code >= 400 and response.status_code not in _DEAD_STATUSES:
+            self._counters["unknown"] += 1
+            logger.debug(f"[link_check] undecided ({response.status_code}): {url}")
+            return None
+        alive = response.status_code < 400
+        self._counters["alive" if alive else "dead"] += 1
+        self._store(url, alive, response.status_code)
+        if not alive:
+            logger.debug(f"[link_check] dead ({response.status_code}): {url}")
+        return alive
+
+    async def check(self, url: str) -> Optional[bool]:
+        """True/False for a reachable/dead canonical URL, None when it could not be decided in time."""
+        verdict = self.cached(url)
+        if verdict is not None:
+            self._counters["cache_hits"] += 1
+            return verdict
+        return await self._flight.do(url, lambda: self._probe(url))
+
+    async def filter_alive(self, resources: List[Dict[str, Any]], budget: float = LINK_CHECK_BUDGET_SECONDS) -> List[Dict[str, Any]]:
+        """The resources whose `url` is not known to be dead, in their original order."""
+        if not LINK_CHECK_ENABLED or not resources:
+            return resources
+        urls = list(dict.fromkeys(r["url"] for r in resources if r.get("url")))
+        tasks = {url: asyncio.ensure_future(self.check(url)) for url in urls}
+        done, pending = await asyncio.wait(tasks.values(), timeout=budget)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(f"[link_check] budget of {budget:g}s exhausted; keeping {len(pending)}/{len(tasks)} unchecked link(s).")
+        dead = {url for url, task in tasks.items() if task in done and not task.cancelled() and task.exception() is None and task.result() is False}
+        if dead:
+            logger.info(f"[link_check] dropped {len(dead)}/{len(urls)} dead link(s).")
+        return [r for r in resources if r.get("url") not in dead]
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"cached_verdicts": len(self._verdicts), **self._counters}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+link_checker = LinkChecker()
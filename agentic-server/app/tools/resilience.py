@@ -0,0 +1,140 @@
+# app/tools/resilience.py
+
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+from ..services.fixtures import fixture_store
+from ..utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TOOL_CALL_TIMEOUT_SECONDS = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "8"))
+TOOL_BREAKER_WINDOW_SECONDS = float(os.getenv("TOOL_BREAKER_WINDOW_SECONDS", "120"))
+TOOL_BREAKER_MIN_CALLS = int(os.getenv("TOOL_BREAKER_MIN_CALLS", "4"))
+TOOL_BREAKER_ERROR_RATE = float(os.getenv("TOOL_BREAKER_ERROR_RATE", "0.5"))
+TOOL_BREAKER_COOLDOWN_SECONDS = float(os.getenv("TOOL_BREAKER_COOLDOWN_SECONDS", "60"))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a tool whose circuit is open."""
+
+
+class ToolTimeoutError(TimeoutError):
+    """Raised when a tool call exceeds its deadline."""
+
+
+class CircuitBreaker:
+    """
+    Rolling error-rate breaker. Opens once at least `min_calls` outcomes in the last `window`
+    seconds show an error rate at or above `error_rate`; while open, calls are refused for
+    `cooldown` seconds. After that a single trial call is let through (half-open): success
+    closes the circuit, failure re-opens it for another cool-down.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = TOOL_BREAKER_WINDOW_SECONDS,
+        min_calls: int = TOOL_BREAKER_MIN_CALLS,
+        error_rate: float = TOOL_BREAKER_ERROR_RATE,
+        cooldown: float = TOOL_BREAKER_COOLDOWN_SECONDS,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+
+    def _prune(self, now: float) -> None:
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def current_error_rate(self) -> float:
+        self._prune(time.monotonic())
+        if not self._outcomes:
+            return 0.0
+        return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes)
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+            self._trial_in_flight = False
+        if self.state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def _open(self, now: float) -> None:
+        self.state = "open"
+        self.opened_at = now
+        self._trial_in_flight = False
+        logger.warning(f"Circuit for tool '{self.name}' opened for {self.cooldown:g}s (error rate {self.current_error_rate():.0%}).")
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        if self.state == "half_open":
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+                logger.info(f"Circuit for tool '{self.name}' closed after a successful trial call.")
+            else:
+                self._open(now)
+            return
+        self._outcomes.append((now, ok))
+        self._prune(now)
+        if not ok and len(self._outcomes) >= self.min_calls and self.current_error_rate() >= self.error_rate:
+            self._open(now)
+
+    def abandon(self) -> None:
+        """A call was cancelled before it finished; free the half-open trial slot without recording an outcome."""
+        if self.state == "half_open":
+            self._trial_in_flight = False
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "error_rate": round(self.current_error_rate(), 3), "recent_calls": len(self._outcomes)}
+
+
+class ResilientTool:
+    """Wraps a LangChain tool with a per-call deadline and a circuit breaker."""
+
+    def __init__(self, tool: Any, timeout: float = TOOL_CALL_TIMEOUT_SECONDS, breaker: Optional[CircuitBreaker] = None):
+        self.tool = tool
+        self.name = tool.name
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(tool.name)
+
+    async def ainvoke(self, tool_input: Any) -> Any:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Tool '{self.name}' is temporarily disabled (circuit open).")
+        try:
+            result = await asyncio.wait_for(
+                fixture_store.call("tool", self.name, tool_input, lambda: self.tool.ainvoke(tool_input)),
+                timeout=self.timeout,
+            )
+        except asyncio.TimeoutError:
+            self.breaker.record(False)
+            raise ToolTimeoutError(f"Tool '{self.name}' exceeded its {self.timeout:.1f}s deadline.")
+        except asyncio.CancelledError:
+            # Cancelled by the caller's overall budget; says nothing about the tool's health.
+            self.breaker.abandon()
+            raise
+        except Exception:
+            self.breaker.record(False)
+            raise
+        self.breaker.record(True)
+        return result
+
+
+def wrap_tools(tools: Iterable[Any], timeouts: Optional[Dict[str, float]] = None) -> Dict[str, ResilientTool]:
+    """Name -> ResilientTool for each tool, with optional per-tool deadlines."""
+    timeouts = timeouts or {}
+    return {tool.name: ResilientTool(tool, timeout=timeouts.get(tool.name, TOOL_CALL_TIMEOUT_SECONDS)) for tool in tools}
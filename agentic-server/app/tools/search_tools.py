@@ -9,6 +9,7 @@ from langchain_community.utilities import GoogleSerperAPIWrapper
 from langchain_core.tools import Tool
 
 from ..config import TAVILY_API_KEY, SERPER_API_KEY , JINA_API_KEY,PUBMED_API_KEY
+from .resilience import wrap_tools
 
 
 # 1. Tavily Search
@@ -58,4 +59,7 @@ all_tools = [
     serper_search_tool,
     wikipedia_tool,
     pubmed_tool,
-]
\ No newline at end of file
+]
+
+# Same tools behind per-call deadlines and circuit breakers; use these from request paths.
+resilient_tools = wrap_tools(all_tools)
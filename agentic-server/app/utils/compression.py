@@ -0,0 +1,168 @@
+# agentic-server/app/utils/compression.py
+
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+# Bodies smaller than this are sent as they are; compression does not pay off for them.
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+# Brotli quality 0-11; the top levels are far too slow for per-request compression.
+RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    The encoding to use for an Accept-Encoding header: the available one with the highest
+    q-value, brotli winning ties. "*" covers encodings not listed; q=0 refuses one.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in available_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class _CompressingSender:
+    """Wraps `send` for one response: buffers until the body is known to be large enough, then encodes."""
+
+    def __init__(self, send: Send, encoding: str, minimum_size: int, gzip_level: int, brotli_quality: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.start: Optional[Message] = None
+        self.passthrough = False
+        self.buffer = bytearray()
+        self.encoder = None
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or not content_type.startswith(_COMPRESSIBLE_TYPES):
+                self.passthrough = True
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if self.passthrough:
+            await self.send(message)
+            return
+        if message["type"] != "http.response.body":
+            # Trailers, pathsend, ...: not something to compress, send whatever is pending as is.
+            self.passthrough = True
+            await self._send_start()
+            if self.buffer:
+                await self.send({"type": "http.response.body", "body": bytes(self.buffer), "more_body": True})
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.encoder is None:
+            self.buffer += body
+            if len(self.buffer) < self.minimum_size:
+                if not more_body:
+                    await self._send_start()
+                    await self.send({"type": "http.response.body", "body": bytes(self.buffer)})
+                return
+            self.encoder = _BrotliEncoder(self.brotli_quality) if self.encoding == "br" else _GzipEncoder(self.gzip_level)
+            body, self.buffer = bytes(self.buffer), bytearray()
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.encoding
+            del headers["Content-Length"]
+            chunk = self.encoder.compress(body)
+            if not more_body:
+                chunk += self.encoder.finish()
+                headers["Content-Length"] = str(len(chunk))
+            await self._send_start()
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+            return
+
+        chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    async def _send_start(self) -> None:
+        MutableHeaders(raw=self.start["headers"]).add_vary_header("Accept-Encoding")
+        await self.send(self.start)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON and text responses of at least `minimum_size` bytes with brotli or gzip,
+    whichever the client prefers (brotli only when the package is installed). Responses that
+    are already encoded, binary, or small are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = RESPONSE_COMPRESSION_MIN_BYTES,
+                 gzip_level: int = RESPONSE_GZIP_LEVEL, brotli_quality: int = RESPONSE_BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        sender = _CompressingSender(send, encoding, self.minimum_size, self.gzip_level, self.brotli_quality)
+        await self.app(scope, receive, sender)
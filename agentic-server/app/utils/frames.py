@@ -0,0 +1,87 @@
+# app/utils/frames.py
+
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def nested_get(data: Any, *path: str, default: Any = None) -> Any:
+    """Walks a nested dict path, returning `default` if any level is missing or not a dict."""
+    for key in path:
+        if not isinstance(data, dict):
+            return default
+        data = data.get(key)
+    return default if data is None else data
+
+
+def as_list(value: Any) -> List[Any]:
+    """Coerces an LLM-produced field that should be a list of labels; scalars and nulls become []."""
+    return value if isinstance(value, list) else []
+
+
+def _smallest_int_dtype(values: pd.Series) -> str:
+    if values.dropna().empty:
+        return "Int8"
+    low, high = values.min(), values.max()
+    for dtype, (lo, hi) in (("Int8", (-2**7, 2**7 - 1)), ("Int16", (-2**15, 2**15 - 1)), ("Int32", (-2**31, 2**31 - 1))):
+        if lo <= low and high <= hi:
+            return dtype
+    return "Int64"
+
+
+def compact_frame(
+    df: pd.DataFrame,
+    categorical_columns: Iterable[str] = (),
+    id_columns: Iterable[str] = (),
+    small_int_columns: Iterable[str] = (),
+) -> pd.DataFrame:
+    """
+    Downcasts a preprocessed frame's object columns. Mutates `df` and returns it.
+    - low-cardinality labels become categoricals,
+    - repeated ObjectId strings become categoricals too (each distinct ID is stored once),
+    - bounded scores become nullable Int8; a column holding values outside Int8 is widened
+      rather than clamped, and non-numeric values (coerced to NA) are counted in the log.
+    Columns that are absent are skipped.
+    """
+    for col in categorical_columns:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in id_columns:
+        if col in df.columns:
+            df[col] = df[col].where(df[col].notna(), None).astype("category")
+    for col in small_int_columns:
+        if col not in df.columns:
+            continue
+        numeric = pd.to_numeric(df[col], errors="coerce")
+        coerced = int((numeric.isna() & df[col].notna()).sum())
+        if coerced:
+            logger.warning(f"compact_frame: {coerced} non-numeric value(s) in '{col}' set to NA.")
+        numeric = numeric.round()
+        dtype = _smallest_int_dtype(numeric)
+        if dtype != "Int8":
+            logger.warning(f"compact_frame: '{col}' has values outside Int8 (min {numeric.min()}, max {numeric.max()}); stored as {dtype}.")
+        df[col] = numeric.astype(dtype)
+    return df
+
+
+def frame_memory_bytes(df: Optional[pd.DataFrame]) -> int:
+    """Deep memory usage of a frame, counting the Python objects behind object columns."""
+    if df is None or df.empty:
+        return 0
+    return int(df.memory_usage(deep=True).sum())
+
+
+def log_memory_report(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, Dict[str, int]]:
+    """Logs and returns a per-frame before/after footprint in bytes."""
+    report = {name: {"before": before.get(name, 0), "after": after.get(name, 0)} for name in before}
+    lines: List[str] = []
+    for name, sizes in report.items():
+        saved = sizes["before"] - sizes["after"]
+        pct = (saved / sizes["before"] * 100) if sizes["before"] else 0.0
+        lines.append(f"{name}: {sizes['before'] / 1024:.1f} KiB -> {sizes['after'] / 1024:.1f} KiB ({pct:.0f}% smaller)")
+    logger.info("Frame memory footprint: " + "; ".join(lines))
+    return report
@@ -1,15 +1,138 @@
 # app/utils/logger.py
 
+import os
+import sys
+import json
+import queue
+import atexit
+import random
 import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Optional
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Correlates every record emitted while serving one HTTP request; set by the middleware in app/main.py.
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" or "text"
+# Per-module overrides, e.g. "app.agents.supervisor=DEBUG,httpx=WARNING".
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_PAYLOAD_CHARS = int(os.getenv("LOG_PAYLOAD_CHARS", "500"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1.0"))
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and goes into the JSON record.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps the current request ID on the record in the calling task, before it crosses the queue."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread. The message is merged and the traceback rendered here,
+    but the record is otherwise left unformatted so the listener's formatter decides the layout.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(spec: str):
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if name and level:
+            yield name.strip(), level.strip().upper()
+
+
+def configure_logging() -> logging.handlers.QueueListener:
+    """
+    Routes all records through a queue so the actual writes to stdout happen on a background
+    thread instead of the event loop.
+    """
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "text":
+        stream_handler.setFormatter(logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        ))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    for name, level in _parse_levels(LOG_LEVELS):
+        logging.getLogger(name).setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+_listener = configure_logging()
 
 logger = logging.getLogger("mental_health_agent")
 
 def get_logger(name: str):
     """Returns a logger instance for a specific module."""
-    return logging.getLogger(name)
\ No newline at end of file
+    return logging.getLogger(name)
+
+
+def truncate(value: Any, limit: Optional[int] = None) -> str:
+    """String form of a payload cut to `limit` characters, noting how much was dropped."""
+    limit = LOG_PAYLOAD_CHARS if limit is None else limit
+    text = value if isinstance(value, str) else repr(value)
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... (+{len(text) - limit} chars)"
+
+
+def log_payload(log: logging.Logger, label: str, payload: Any) -> None:
+    """
+    Debug dump of a large payload (raw tool output, parsed objects). Costs nothing unless DEBUG is
+    enabled for `log`, is sampled at LOG_PAYLOAD_SAMPLE_RATE, and is truncated to LOG_PAYLOAD_CHARS.
+    """
+    if not log.isEnabledFor(logging.DEBUG):
+        return
+    if LOG_PAYLOAD_SAMPLE_RATE < 1.0 and random.random() >= LOG_PAYLOAD_SAMPLE_RATE:
+        return
+    log.debug(f"{label}: {truncate(payload)}", stacklevel=2)
@@ -0,0 +1,48 @@
+# agentic-server/app/utils/responses.py
+
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def _default(value: Any) -> Any:
+    """Types neither orjson nor pydantic-core encode natively, as found in MongoDB documents."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json", by_alias=True)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "isoformat"):  # pandas Timestamp and other datetime look-alikes
+        return value.isoformat()
+    if hasattr(value, "tolist"):  # numpy scalars and arrays pydantic-core does not know about
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_bytes(content: Any) -> bytes:
+    """
+    JSON for a response body. Pydantic models are serialized straight to bytes by pydantic-core
+    (by alias, like FastAPI's response_model path) without being dumped to a dict first; anything
+    else (Mongo documents, dicts of models) goes through orjson.
+    """
+    if isinstance(content, BaseModel):
+        return to_json(content, by_alias=True, fallback=_default)
+    return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by json_bytes. Returning one from an endpoint bypasses FastAPI's
+    response_model validation and jsonable_encoder pass, which dominate on large snapshots;
+    keep response_model on the route for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return json_bytes(content)
@@ -0,0 +1,181 @@
+# app/utils/sketches.py
+"""
+Fixed-memory, mergeable summaries for the analytics counters.
+
+SpaceSaving (Metwally et al., 2005) keeps at most `capacity` counters. After N updates
+every reported count over-estimates the true count by at most `error(item)` <= N / capacity,
+and any item with true frequency > N / capacity is guaranteed to be tracked. Counts are exact
+while the number of distinct items stays within capacity.
+
+HyperLogLog (Flajolet et al., 2007) with precision p uses 2**p one-byte registers and
+estimates a distinct count with a relative standard error of about 1.04 / sqrt(2**p)
+(p=12: 4 KiB, ~1.6%). Small cardinalities fall back to linear counting, which is near exact.
+
+Both merge losslessly with respect to their bounds (per-day or per-shard partials can be
+combined) and round-trip through plain dicts for storage in MongoDB.
+"""
+
+import base64
+import hashlib
+import math
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_TOPK_CAPACITY = 1000
+DEFAULT_HLL_PRECISION = 12
+
+
+class SpaceSaving:
+    """Approximate heavy hitters / top-k over a stream of hashable items."""
+
+    def __init__(self, capacity: int = DEFAULT_TOPK_CAPACITY):
+        if capacity < 1:
+            raise ValueError("SpaceSaving capacity must be at least 1.")
+        self.capacity = capacity
+        self.total = 0
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+
+    def _min_item(self) -> Hashable:
+        return min(self._counts, key=self._counts.__getitem__)
+
+    def update(self, item: Hashable, count: int = 1) -> None:
+        self.total += count
+        if item in self._counts:
+            self._counts[item] += count
+        elif len(self._counts) < self.capacity:
+            self._counts[item] = count
+            self._errors[item] = 0
+        else:
+            # Evict the smallest counter; the newcomer inherits its count as possible over-estimate.
+            evicted = self._min_item()
+            floor = self._counts.pop(evicted)
+            self._errors.pop(evicted)
+            self._counts[item] = floor + count
+            self._errors[item] = floor
+
+    def update_many(self, items: Iterable[Hashable]) -> None:
+        for item in items:
+            self.update(item)
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combines two summaries (Agarwal et al., 2012); the result keeps this sketch's capacity."""
+        floor_self = min(self._counts.values()) if len(self._counts) >= self.capacity else 0
+        floor_other = min(other._counts.values()) if len(other._counts) >= other.capacity else 0
+        counts: Dict[Hashable, int] = {}
+        errors: Dict[Hashable, int] = {}
+        for item in set(self._counts) | set(other._counts):
+            # An item missing from a full summary may still have occurred up to that summary's minimum count.
+            a = self._counts.get(item, floor_self)
+            b = other._counts.get(item, floor_other)
+            counts[item] = a + b
+            errors[item] = self._errors.get(item, floor_self) + other._errors.get(item, floor_other)
+        kept = sorted(counts, key=counts.__getitem__, reverse=True)[:self.capacity]
+        self._counts = {item: counts[item] for item in kept}
+        self._errors = {item: errors[item] for item in kept}
+        self.total += other.total
+        return self
+
+    def copy(self) -> "SpaceSaving":
+        return SpaceSaving.from_dict(self.to_dict())
+
+    def error(self, item: Hashable) -> int:
+        return self._errors.get(item, 0)
+
+    @property
+    def error_bound(self) -> float:
+        """Maximum over-estimate of any reported count."""
+        return self.total / self.capacity
+
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int]]:
+        return sorted(self._counts.items(), key=lambda kv: (-kv[1], str(kv[0])))[:n]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "space_saving",
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[item, count, self._errors[item]] for item, count in self._counts.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SpaceSaving":
+        sketch = cls(capacity=int(data["capacity"]))
+        sketch.total = int(data["total"])
+        for item, count, error in data["items"]:
+            sketch._counts[item] = int(count)
+            sketch._errors[item] = int(error)
+        return sketch
+
+
+def _hash64(value: Any) -> int:
+    # blake2b rather than hash(): stable across processes, so sketches from different workers merge.
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Approximate distinct counter."""
+
+    def __init__(self, precision: int = DEFAULT_HLL_PRECISION):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16.")
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, value: Any) -> None:
+        h = _hash64(value)
+        index = h >> (64 - self.precision)
+        remainder = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add_many(self, values: Iterable[Any]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision.")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def copy(self) -> "HyperLogLog":
+        sketch = HyperLogLog(self.precision)
+        sketch.registers = self.registers.copy()
+        return sketch
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "type": "hyperloglog",
+            "precision": self.precision,
+            "registers": base64.b64encode(self.registers.tobytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        sketch = cls(precision=int(data["precision"]))
+        sketch.registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return sketch
+
+
+def merge_all(sketches: Iterable[Any]) -> Optional[Any]:
+    """Folds an iterable of same-typed sketches into the first one; None when empty."""
+    merged = None
+    for sketch in sketches:
+        merged = sketch if merged is None else merged.merge(sketch)
+    return merged
@@ -0,0 +1,91 @@
+# agentic-server/scripts/bench_ai_report_parsing.py
+"""
+Benchmarks the AI report preprocessing paths on synthetic documents shaped like the `aireports`
+collection and checks that they produce the same frame.
+
+    python scripts/bench_ai_report_parsing.py --docs 20000 --repeat 3
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.report_frames import build_ai_reports_frame  # noqa: E402
+
+SENTIMENTS = ["Anxious", "Depressed", "Stressed", "Overwhelmed", "Calm"]
+FLAGS = ["hopelessness", "isolation", "panic attacks", "insomnia", "worthlessness"]
+STRESSORS = ["Exam stress", "Family pressure", "Loneliness", "Financial worries", "Roommate conflict"]
+TOPICS = ["sleep hygiene", "time management", "mindfulness", "study skills", "social connection"]
+
+
+def make_documents(count: int, seed: int = 0):
+    rnd = random.Random(seed)
+    now = datetime(2025, 3, 10)
+    docs = []
+    for i in range(count):
+        standard = {
+            "student_id": f"s{i % 500}",
+            "chat_summary": "The student described ongoing pressure around coursework and sleep. " * 4,
+            "risk_assessment": {"sentiment": rnd.choice(SENTIMENTS), "emotional_intensity": "High", "risk_level": rnd.choice(["Low", "Medium", "High"]), "red_flags": rnd.sample(FLAGS, 2)},
+            "screening_scores": {"phq_9_score": rnd.randint(0, 27), "gad_7_score": rnd.randint(0, 21), "interpretation": "Moderate symptoms of anxiety."},
+            "counselor_recommendations": {"recommended_resources": [{"title": "Guide", "url": "https://example.org/guide", "type": "article"}] * 3, "suggested_next_steps": ["Follow up in a week"]},
+            "analytics": {"key_stressors_identified": rnd.sample(STRESSORS, 2), "potential_underlying_issues": ["Perfectionism"]},
+        }
+        demo = {
+            "student_summary": "You have been carrying a lot lately. " * 3,
+            "student_expressed_concerns": rnd.sample(STRESSORS, 1),
+            "suggested_resource_topics": rnd.sample(TOPICS, 2),
+            "helpful_resources": {"videos": [{"title": "Calm", "url": "https://example.org/v"}] * 3, "articles": []},
+        }
+        docs.append({
+            "_id": f"{i:024x}",
+            "student": f"{i % 500:024x}",
+            "demo_report": {"demo_content": json.dumps(demo)},
+            "standard_report": {"standard_content": json.dumps(standard)},
+            "createdAt": now - timedelta(minutes=i),
+            "updatedAt": now,
+        })
+    return docs
+
+
+def best_of(repeat: int, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    docs = make_documents(args.docs)
+    results = {}
+    for name in ("model", "bulk", "light"):
+        results[name] = best_of(args.repeat, lambda: build_ai_reports_frame(docs, parser=name))
+
+    reference = results["model"][1]
+    baseline = results["model"][0]
+    print(f"{args.docs} documents, best of {args.repeat}")
+    for name, (seconds, frame) in results.items():
+        pd.testing.assert_frame_equal(reference, frame)
+        print(f"  {name:<6} {seconds:8.3f}s  {args.docs / seconds:10.0f} docs/s  {baseline / seconds:5.1f}x")
+    print("All paths produced identical frames.")
+
+
+if __name__ == "__main__":
+    main()
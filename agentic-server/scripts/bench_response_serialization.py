@@ -0,0 +1,128 @@
+# agentic-server/scripts/bench_response_serialization.py
+"""
+Benchmarks serializing a large analytics snapshot response and the size of the body with and
+without compression, and checks that every path produces the same JSON.
+
+    python scripts/bench_response_serialization.py --days 730 --outreach 5000 --repeat 5
+"""
+
+import os
+import gc
+import sys
+import json
+import time
+import zlib
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.analytics import AnalyticsResponse, AnalyticsSnapshot  # noqa: E402
+from app.utils.compression import RESPONSE_BROTLI_QUALITY, RESPONSE_GZIP_LEVEL, brotli  # noqa: E402
+from app.utils.responses import json_bytes  # noqa: E402
+
+SENTIMENTS = ["Anxious", "Depressed", "Stressed", "Overwhelmed", "Calm", "Hopeful"]
+RISK_LEVELS = ["Low", "Medium", "High", "Critical"]
+STRESSORS = ["Exam stress", "Family pressure", "Loneliness", "Financial worries", "Roommate conflict", "Sleep problems"]
+DEPARTMENTS = ["CSE", "ECE", "ME", "CE", "BBA", "Law"]
+
+
+def make_response(days: int, outreach: int, seed: int = 0) -> AnalyticsResponse:
+    """A multi-year snapshot with daily series and a long outreach list, like a campus-wide run."""
+    rnd = random.Random(seed)
+    end = datetime(2025, 3, 10, tzinfo=timezone.utc)
+    dates = [(end - timedelta(days=days - 1 - i)).date().isoformat() for i in range(days)]
+    weeks = dates[::7]
+    months = sorted({d[:7] for d in dates})
+    # TopItem validates by its alias.
+    top = lambda labels: [{"flag": label, "count": rnd.randint(5, 500)} for label in labels]
+    snapshot = AnalyticsSnapshot(
+        snapshotVersion="Daily-bench",
+        periodStart=end - timedelta(days=days),
+        periodEnd=end,
+        totalReports=rnd.randint(10_000, 50_000),
+        totalAIReports=rnd.randint(5_000, 20_000),
+        totalStudentsEngaged=rnd.randint(2_000, 8_000),
+        sentimentDistribution={s: rnd.randint(0, 5_000) for s in SENTIMENTS},
+        riskLevelDistribution={r: rnd.randint(0, 5_000) for r in RISK_LEVELS},
+        topRedFlags=top(["hopelessness", "isolation", "panic attacks", "insomnia", "worthlessness"]),
+        topStressors=top(STRESSORS),
+        avgPHQ9=9.4, avgGAD7=7.1, avgGHQ=12.8,
+        activeStudentsDaily={d: rnd.randint(0, 400) for d in dates},
+        activeStudentsWeekly={d: rnd.randint(0, 1_500) for d in weeks},
+        activeStudentsMonthly={m: rnd.randint(0, 4_000) for m in months},
+        sentimentOverTime=[{"date": f"{d}T00:00:00Z", "averageSentimentScore": round(rnd.uniform(-1, 1), 4)} for d in dates],
+        sentimentTimeSeries={"bucket": "D", "dates": dates, "series": {s: [rnd.randint(0, 60) for _ in dates] for s in SENTIMENTS}},
+        riskLevelTimeSeries={"bucket": "D", "dates": dates, "series": {r: [rnd.randint(0, 60) for _ in dates] for r in RISK_LEVELS}},
+        filtersUsed={"department": DEPARTMENTS[:3]},
+        proactiveOutreachSuggestions=[
+            {
+                "studentId": f"{i:024x}",
+                "name": f"Student {i}",
+                "department": rnd.choice(DEPARTMENTS),
+                "academicYear": rnd.randint(1, 4),
+                "reason": "Sustained high risk across recent check-ins and reports.",
+                "riskLevel": rnd.choice(RISK_LEVELS),
+                "recentScores": {"phq9": rnd.randint(0, 27), "gad7": rnd.randint(0, 21)},
+                "keyStressors": rnd.sample(STRESSORS, 2),
+                "lastReportAt": (end - timedelta(hours=rnd.randint(1, 2_000))).isoformat(),
+            }
+            for i in range(outreach)
+        ],
+    )
+    return AnalyticsResponse(success=True, message="Latest analytics snapshot retrieved.", data=snapshot, snapshot_id="bench", snapshot_version=snapshot.snapshotVersion)
+
+
+def best_of(repeat: int, fn):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--outreach", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    response = make_response(args.days, args.outreach)
+    paths = {
+        # What FastAPI does for endpoints returning dicts, and did for models before serializing in pydantic-core.
+        "jsonable_encoder": lambda: json.dumps(jsonable_encoder(response), ensure_ascii=False, separators=(",", ":")).encode(),
+        "model_dump+json": lambda: json.dumps(response.model_dump(mode="json", by_alias=True), ensure_ascii=False, separators=(",", ":")).encode(),
+        "model_dump+orjson": lambda: orjson.dumps(response.model_dump(mode="json", by_alias=True)),
+        "json_bytes": lambda: json_bytes(response),
+    }
+    results = {name: best_of(args.repeat, fn) for name, fn in paths.items()}
+
+    reference = orjson.loads(results["jsonable_encoder"][1])
+    baseline = results["jsonable_encoder"][0]
+    print(f"Snapshot with {args.days} days and {args.outreach} outreach entries, best of {args.repeat}")
+    for name, (seconds, body) in results.items():
+        assert orjson.loads(body) == reference, f"{name} produced different JSON"
+        print(f"  {name:<18} {seconds * 1000:8.1f} ms  {baseline / seconds:5.1f}x")
+    print("All paths produced the same JSON.")
+
+    body = results["json_bytes"][1]
+    encodings = {"identity": lambda: body, f"gzip-{RESPONSE_GZIP_LEVEL}": lambda: zlib.compress(body, RESPONSE_GZIP_LEVEL, wbits=16 + zlib.MAX_WBITS)}
+    if brotli is not None:
+        encodings[f"br-{RESPONSE_BROTLI_QUALITY}"] = lambda: brotli.compress(body, quality=RESPONSE_BROTLI_QUALITY)
+    else:
+        print("brotli is not installed; only gzip is measured.")
+    print("Body size")
+    for name, fn in encodings.items():
+        seconds, encoded = best_of(min(args.repeat, 3), fn)
+        print(f"  {name:<18} {len(encoded) / 1024:10.1f} KiB  {len(body) / len(encoded):5.1f}x  {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
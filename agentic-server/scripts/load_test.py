@@ -0,0 +1,164 @@
+# agentic-server/scripts/load_test.py
+"""
+Load generator for the report, pathway and analytics endpoints. Prints p50/p95/p99 latency,
+throughput and error counts per endpoint.
+
+Run it against a server started with recorded fixtures, so no provider quota is spent:
+
+    FIXTURES_MODE=record uvicorn app.main:app            # once, with real keys, to capture fixtures
+    FIXTURES_MODE=replay uvicorn app.main:app            # then, offline
+    python scripts/load_test.py --url http://localhost:8000 --concurrency 8 --requests 200
+
+or in-process (no uvicorn; FIXTURES_* are read from the environment):
+
+    FIXTURES_MODE=replay FIXTURES_ERROR_RATE=0.05 python scripts/load_test.py --in-process --endpoints report,pathway
+
+Payloads default to the small built-in samples below. --payloads takes a JSON file mapping
+endpoint name to a list of request bodies, which are cycled through. Replay only answers
+requests that were recorded, so record with the same payloads. Repeated payloads are answered
+by the coalescing and pathway caches; set SINGLE_FLIGHT_TTL_SECONDS=0 and
+PATHWAY_CACHE_MAX_ENTRIES=0 on the server to measure full pipeline runs instead.
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import itertools
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ENDPOINTS = {
+    "report": "/generate-report",
+    "pathway": "/generate-pathway",
+    "analytics": "/generate-analytics",
+}
+
+SAMPLE_PAYLOADS: Dict[str, List[Dict[str, Any]]] = {
+    "report": [
+        {"conversation_history": "Student: I can't sleep before exams and I keep thinking I'll fail.\nAssistant: That sounds exhausting. How long has this been going on?\nStudent: Since midterms. I skip meals and avoid my friends."},
+        {"conversation_history": "Student: My parents expect top grades and I feel like a disappointment.\nAssistant: That is a lot of pressure to carry.\nStudent: I get headaches and can't focus in class anymore."},
+    ],
+    "pathway": [
+        {"key_stressors": ["Exam stress", "Sleep problems"], "suggested_resource_topics": ["exam anxiety", "sleep"], "student_language": "en"},
+        {"key_stressors": ["Family pressure"], "suggested_resource_topics": ["stress"], "student_language": "en"},
+    ],
+    "analytics": [{"rolling_window_days": [7]}],
+}
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+async def _worker(client: httpx.AsyncClient, jobs: "asyncio.Queue[Any]", results: Dict[str, Dict[str, Any]]) -> None:
+    while True:
+        item = await jobs.get()
+        if item is None:
+            return
+        name, body = item
+        started = time.perf_counter()
+        try:
+            response = await client.post(ENDPOINTS[name], json=body)
+            outcome = str(response.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        elapsed = time.perf_counter() - started
+        results[name]["latencies"].append(elapsed)
+        results[name]["outcomes"][outcome] += 1
+
+
+async def run_load(client: httpx.AsyncClient, endpoints: List[str], payloads: Dict[str, List[Dict[str, Any]]], requests: int, concurrency: int) -> Dict[str, Dict[str, Any]]:
+    """Sends `requests` requests per endpoint, interleaved, from `concurrency` workers."""
+    results = {name: {"latencies": [], "outcomes": Counter()} for name in endpoints}
+    jobs: "asyncio.Queue[Any]" = asyncio.Queue()
+    cycles = {name: itertools.cycle(payloads[name]) for name in endpoints}
+    for _ in range(requests):
+        for name in endpoints:
+            jobs.put_nowait((name, next(cycles[name])))
+    for _ in range(concurrency):
+        jobs.put_nowait(None)
+    started = time.perf_counter()
+    await asyncio.gather(*(_worker(client, jobs, results) for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    for stats in results.values():
+        stats["wall_seconds"] = wall
+    return results
+
+
+def summarize(results: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    summary = {}
+    for name, stats in results.items():
+        latencies = sorted(stats["latencies"])
+        ok = sum(count for outcome, count in stats["outcomes"].items() if outcome.startswith("2"))
+        summary[name] = {
+            "requests": len(latencies),
+            "ok": ok,
+            "errors": dict(sorted((k, v) for k, v in stats["outcomes"].items() if not k.startswith("2"))),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            # Endpoints share the run, so this is each endpoint's share of the combined throughput.
+            "throughput_rps": round(len(latencies) / stats["wall_seconds"], 2) if stats["wall_seconds"] else 0.0,
+        }
+    return summary
+
+
+def _print_table(summary: Dict[str, Dict[str, Any]]) -> None:
+    header = f"{'endpoint':<10} {'reqs':>6} {'ok':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'req/s':>8}  errors"
+    print(header)
+    print("-" * len(header))
+    for name, row in summary.items():
+        print(f"{name:<10} {row['requests']:>6} {row['ok']:>6} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row['max_ms']:>9} {row['throughput_rps']:>8}  {row['errors'] or '-'}")
+
+
+def _client(args: argparse.Namespace) -> httpx.AsyncClient:
+    if args.in_process:
+        from app.main import app  # noqa: E402  (imported late: reads FIXTURES_* and other settings at import)
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test", timeout=args.timeout)
+    return httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=httpx.Limits(max_connections=args.concurrency))
+
+
+async def main(args: argparse.Namespace) -> Optional[Dict[str, Dict[str, Any]]]:
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = [e for e in endpoints if e not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoint(s): {', '.join(unknown)}; choose from {', '.join(ENDPOINTS)}.")
+    payloads = dict(SAMPLE_PAYLOADS)
+    if args.payloads:
+        with open(args.payloads, "r", encoding="utf-8") as f:
+            payloads.update(json.load(f))
+
+    async with _client(args) as client:
+        if args.warmup:
+            await run_load(client, endpoints, payloads, args.warmup, args.concurrency)
+        summary = summarize(await run_load(client, endpoints, payloads, args.requests, args.concurrency))
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        _print_table(summary)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of a running server.")
+    parser.add_argument("--in-process", action="store_true", help="Drive the app through an ASGI transport instead of HTTP.")
+    parser.add_argument("--endpoints", default="report,pathway", help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint.")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=0, help="Unmeasured requests per endpoint sent first.")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--payloads", help="JSON file: {endpoint: [request body, ...]}.")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON.")
+    asyncio.run(main(parser.parse_args()))